@@ -19,15 +19,34 @@
 """
 
 import os
+import io
 import pyperclip
 import sys
 from datetime import datetime
 import xml.etree.ElementTree as ET
-from dataclasses import dataclass
-from typing import List, Optional, Dict, Any, Tuple
+from dataclasses import dataclass, field, asdict
+from typing import List, Optional, Dict, Any, Tuple, Iterable
 import shutil
 import re
 import codecs
+import sqlite3
+import zlib
+import hashlib
+import time
+import threading
+import random
+import math
+import json
+import platform
+import statistics
+import tempfile
+import contextlib
+import mmap
+from array import array
+from bisect import bisect_left, bisect_right
+from difflib import SequenceMatcher
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, Future
+from collections import deque
 
 # 🔧 Configuração de encoding para evitar problemas com caracteres especiais
 try:
@@ -51,11 +70,85 @@ PADROES_BACKUP = [
     r"\.old$",                 # arquivo.ext.old
 ]
 
+# 🆕 PASTAS QUE NUNCA SÃO PERCORRIDAS (v2.2.0) - podadas antes de listar o conteúdo
+DIRETORIOS_NEGADOS = {
+    ".git", ".hg", ".svn", "node_modules", "__pycache__", ".venv", "venv", "env",
+    ".tox", ".nox", ".mypy_cache", ".pytest_cache", ".ruff_cache", ".idea", ".vs",
+    "build", "dist", "Backup",  # Backup = pasta criada pelo próprio PASTE
+}
+
+# 🆕 ARQUIVOS NO ESTILO .gitignore LIDOS EM CADA PASTA (v2.2.0)
+USAR_ARQUIVOS_IGNORE = True
+ARQUIVOS_IGNORE = (".gitignore", ".pastesearchignore")
+
 LIMITE_SIMILARIDADE_TIPO5 = 10.0  # 🎯 AJUSTE AQUI: Similaridade mínima para TIPO 5 (0.0 a 100.0)
 
 # 🆕 CONTROLE DE QUALIDADE DE RESULTADOS (v2.1.1)
 LIMITE_PROBABILIDADE_MELHOR_RESULTADO = 80.0  # 🎯 AJUSTE AQUI: Só mostra como "melhor resultado" se >= 80% de probabilidade
 
+# 🆕 SESSÃO EM SQLITE COM OS RESULTADOS DAS ÚLTIMAS BUSCAS (v2.2.0) - lida pelo PASTE
+ARQUIVO_SESSAO_DB = "sessionlinner.db"
+LIMITE_SESSOES_GUARDADAS = 10     # 🎯 AJUSTE AQUI: sessões mantidas no banco (a mais recente é a usada)
+LIMITE_ARQUIVOS_LISTADOS = 20     # Arquivos listados quando o PASTE não acha o arquivo pedido
+
+# 🆕 EXPORTAÇÃO XML DA SESSÃO - "export" grava sob demanda; True = grava também a cada busca
+ARQUIVO_SESSAO = "sessionlinner.xml"
+EXPORTAR_XML_SESSAO = False
+VERSAO_FORMATO_SESSAO = "2.1.6-CORRECAO-COMPLETA"
+
+# 🆕 TEXTOS DA SESSÃO SEM REPETIÇÃO (v2.2.0) - texto copiado gravado uma vez por sessão, resultados só com o hash
+LIMITE_CONTEXTO_SESSAO = 200  # 🎯 AJUSTE AQUI: caracteres de contexto gravados por resultado (início + fim)
+ORDENACAO_SESSAO = "score_confiabilidade DESC, similaridade DESC, nome ASC"
+
+# 🆕 CACHE PERSISTENTE DE CONTEÚDO E ENCODING (v2.2.0) - salvo ao lado do sessionlinner.xml
+USAR_CACHE_CONTEUDO = True
+ARQUIVO_CACHE_CONTEUDO = "sessionlinner_cache.db"
+LIMITE_CACHE_CONTEUDO_BYTES = 512 * 1024 * 1024     # 🎯 AJUSTE AQUI: tamanho máximo do cache (LRU)
+LIMITE_CACHE_TEXTO_POR_ARQUIVO = 4 * 1024 * 1024    # Acima disso guarda só o encoding (sem o texto)
+
+# 🆕 TODAS AS OCORRÊNCIAS (v2.2.0) - também via "--todas": cada trecho repetido vira um resultado
+BUSCAR_TODAS_OCORRENCIAS = False
+
+# 🆕 PLANEJADOR DE BUSCA (v2.2.0) - TIPOS baratos primeiro, para quando já há resultados confiáveis
+USAR_PLANEJADOR_BUSCA = True
+BUSCA_EXAUSTIVA = False                  # Também via "--exaustiva" / "--exhaustive": roda todos os TIPOS
+RESULTADOS_CONFIAVEIS_SUFICIENTES = 1    # 🎯 AJUSTE AQUI: quantos resultados confiáveis bastam
+MEMORIA_SNAPSHOTS_PLANEJADOR = 256 * 1024 * 1024  # Bytes de texto lido guardados entre as fases (0 = relê)
+
+# 🆕 BUSCA EM VÁRIOS NÚCLEOS (v2.2.0) - também via "--workers N"
+NUMERO_WORKERS = 1  # 🎯 AJUSTE AQUI: 1 = um só processo
+
+# 🆕 BUSCA EM BYTES COM MMAP PARA TIPO 1 E TIPO 2 (v2.2.0) - evita decodificar o arquivo inteiro
+USAR_BUSCA_BYTES_MMAP = True
+
+# 🆕 ÍNDICE INVERTIDO DE TRIGRAMAS PARA PODAR CANDIDATOS (v2.2.0) - "index build|stats|drop"
+USAR_INDICE_TRIGRAMAS = True  # Usa o índice se ele existir; sem índice, varredura completa
+ARQUIVO_INDICE_TRIGRAMAS = "sessionlinner_indice.db"
+INTERVALO_INDICE_WATCH = 2.0  # Segundos entre as varreduras de "index watch"
+
+# 🆕 ARQUIVOS BINÁRIOS E GRANDES DEMAIS SÃO PULADOS ANTES DE DECODIFICAR (v2.2.0)
+IGNORAR_ARQUIVOS_BINARIOS = True               # NUL ou muitos bytes de controle no primeiro bloco
+TAMANHO_MAXIMO_ARQUIVO = 64 * 1024 * 1024      # 🎯 AJUSTE AQUI: 0 = sem limite
+
+# 🆕 BUSCA EM FLUXO (v2.2.0) - arquivos acima de TAMANHO_MAXIMO_ARQUIVO são lidos em blocos, não pulados
+USAR_BUSCA_STREAMING = True                    # TIPOS 1-4 e 6 com memória fixa; False = pula o arquivo
+TAMANHO_BLOCO_STREAMING = 4 * 1024 * 1024      # Caracteres por bloco (teto de memória da busca)
+
+# 🆕 LEITURA ANTECIPADA (v2.2.0) - threads leem os próximos arquivos enquanto os TIPOS rodam
+LEITURA_ANTECIPADA_THREADS = 4                     # 🎯 AJUSTE AQUI: 0 = lê um arquivo por vez
+LEITURA_ANTECIPADA_PROFUNDIDADE = 16               # Arquivos lidos à frente do consumidor
+LEITURA_ANTECIPADA_MAX_BYTES = 64 * 1024 * 1024    # Bytes em leitura/aguardando ao mesmo tempo
+
+# 🆕 PASTE EM LOTE (v2.2.0) - "paste --all": backup e gravação de vários arquivos ao mesmo tempo
+THREADS_PASTE_LOTE = 8  # 🎯 AJUSTE AQUI: arquivos preparados/gravados em paralelo
+
+# 🆕 MÉTRICAS DE DESEMPENHO (v2.2.0) - também via "--metricas": tabela no final e <metricas> no XML
+COLETAR_METRICAS = False
+
+# 🆕 NÍVEIS DE LOG (v2.2.0) - também via "-q", "-v" e "-vv"
+NIVEL_LOG = 1                        # 🎯 AJUSTE AQUI: 0 = só ranking e erros, 1 = resumo, 2 = detalhes, 3 = diagnóstico por arquivo
+TAMANHO_BUFFER_SAIDA = 256 * 1024    # Bytes acumulados antes de escrever no terminal
+
 # 🆕 SISTEMA DE SCORES POR TIPO DE BUSCA (v2.1.0)
 SCORES_TIPOS = {
     1: 500,  # TIPO 1: 100% literal - máxima confiabilidade
@@ -66,6 +159,46 @@ SCORES_TIPOS = {
     6: 350   # 🆕 TIPO 6: ignorando U+000D completamente
 }
 
+# ═══════════════════════════════════════════════════════════════════════════════
+# 🆕 NÍVEIS DE LOG E SAÍDA BUFFERIZADA (v2.2.0)
+# ═══════════════════════════════════════════════════════════════════════════════
+
+NIVEL_LOG_SILENCIOSO = 0  # -q: ranking, melhor resultado e erros
+NIVEL_LOG_NORMAL = 1      # padrão: + resumo da varredura
+NIVEL_LOG_DETALHADO = 2   # -v: + regras dos TIPOS, planejador, índice, cache e texto copiado
+NIVEL_LOG_DEBUG = 3       # -vv: + diagnóstico de cada arquivo (posições, estratégias, scores)
+
+def log_info(*args, **kwargs):
+    """🆕 Resumo da busca: aparece no nível padrão, some com -q (v2.2.0)"""
+    if NIVEL_LOG >= NIVEL_LOG_NORMAL:
+        print(*args, **kwargs)
+
+def log_detalhe(*args, **kwargs):
+    """🆕 Detalhes da busca como um todo: só com -v (v2.2.0)"""
+    if NIVEL_LOG >= NIVEL_LOG_DETALHADO:
+        print(*args, **kwargs)
+
+def log_debug(*args, **kwargs):
+    """🆕 Diagnóstico por arquivo, chamado nos laços quentes: só com -vv (v2.2.0)"""
+    if NIVEL_LOG >= NIVEL_LOG_DEBUG:
+        print(*args, **kwargs)
+
+def configurar_saida_bufferizada():
+    """🆕 Troca o stdout por um escritor com buffer de TAMANHO_BUFFER_SAIDA bytes (v2.2.0)
+    
+    O terminal recebe blocos grandes em vez de uma escrita por linha. input()
+    esvazia o buffer antes do prompt; main() esvazia no final.
+    """
+    try:
+        descritor = sys.stdout.fileno()
+    except (AttributeError, OSError, ValueError):
+        return  # stdout substituído (IDE, testes): mantém como está
+    
+    sys.stdout.flush()
+    escritor = open(descritor, 'wb', buffering=TAMANHO_BUFFER_SAIDA, closefd=False)
+    sys.stdout = io.TextIOWrapper(escritor, encoding=sys.stdout.encoding,
+                                  errors=sys.stdout.errors, write_through=False)
+
 # ═══════════════════════════════════════════════════════════════════════════════
 # 🆕 ESTRUTURAS DE DADOS (v2.1.0)
 # ═══════════════════════════════════════════════════════════════════════════════
@@ -101,7 +234,7 @@ def limpar_resultados_globais():
     """🆕 Limpa a lista de resultados globais para nova busca"""
     global resultados_globais
     resultados_globais.clear()
-    print("🧹 Resultados globais limpos para nova busca")
+    log_detalhe("🧹 Resultados globais limpos para nova busca")
 
 def adicionar_resultado_global(tipo: int, arquivo_info: Dict[str, Any]):
     """🆕 Adiciona resultado ao coletor global (v2.1.0)"""
@@ -123,7 +256,7 @@ def adicionar_resultado_global(tipo: int, arquivo_info: Dict[str, Any]):
     )
     
     resultados_globais.append(resultado)
-    print(f"➕ Resultado TIPO{tipo} adicionado: {arquivo_info['nome']} (score: {resultado.score_confiabilidade:.1f})")
+    log_debug(f"➕ Resultado TIPO{tipo} adicionado: {arquivo_info['nome']} (score: {resultado.score_confiabilidade:.1f})")
 
 # ═══════════════════════════════════════════════════════════════════════════════
 # 🆕 FUNÇÕES PARA TRATAMENTO DE U+000D (v2.1.2)
@@ -142,9 +275,9 @@ def detectar_problemas_carriage_return(texto):
         problemas.append(f"📝 {count_crlf} sequências CRLF (\\r\\n)")
     
     if problemas:
-        print(f"🔍 ANÁLISE DE QUEBRAS DE LINHA:")
+        log_detalhe(f"🔍 ANÁLISE DE QUEBRAS DE LINHA:")
         for problema in problemas:
-            print(f"   {problema}")
+            log_detalhe(f"   {problema}")
     
     return count_cr_isolado > 0
 
@@ -166,142 +299,196 @@ def normalizar_quebras_avancado(texto):
 # 🔧 FUNÇÕES AUXILIARES ATUALIZADAS
 # ═══════════════════════════════════════════════════════════════════════════════
 
+# 🆕 Todos os PADROES_BACKUP em um único regex pré-compilado (v2.2.0)
+REGEX_BACKUP = re.compile("|".join(f"(?:{padrao})" for padrao in PADROES_BACKUP))
+
 def eh_arquivo_backup(nome_arquivo):
     """🆕 Verifica se o arquivo é um backup usando padrões regex (v2.1.4)"""
-    for padrao in PADROES_BACKUP:
-        if re.search(padrao, nome_arquivo):
-            return True
-    return False
+    return REGEX_BACKUP.search(nome_arquivo) is not None
 
 def detectar_bom_e_encoding(caminho_arquivo: str) -> Dict[str, Any]:
     """🆕 Detecta BOM e encoding automaticamente"""
+    # 🆕 Reaproveita o encoding do cache se o arquivo não mudou (v2.2.0)
+    if cache_conteudo_ativo is not None:
+        info_cache = cache_conteudo_ativo.obter_info_encoding(caminho_arquivo)
+        if info_cache is not None:
+            return info_cache
+    
+    contar_metrica('chamadas_deteccao_encoding')
     try:
         with open(caminho_arquivo, 'rb') as f:
-            raw_bytes = f.read(4)
-        
-        if raw_bytes.startswith(codecs.BOM_UTF8):
+            raw_bytes = f.read(TAMANHO_AMOSTRA_ENCODING + 1)
+    except Exception as e:
+        return {
+            'encoding': 'utf-8',
+            'bom_size': 0,
+            'has_bom': False,
+            'detected': 'UTF-8 (error fallback)'
+        }
+    
+    return detectar_bom_e_encoding_em_bytes(raw_bytes)
+
+# 🆕 Amostra usada na detecção (mesmo bloco que o modo texto decodifica na 1ª leitura)
+TAMANHO_AMOSTRA_ENCODING = 8192
+
+def detectar_bom_e_encoding_em_bytes(raw_bytes: bytes) -> Dict[str, Any]:
+    """🆕 Detecta BOM e encoding a partir dos primeiros bytes já lidos (v2.2.0)
+    
+    Passe até TAMANHO_AMOSTRA_ENCODING + 1 bytes: o byte a mais diz se a amostra
+    é o arquivo inteiro (então um byte inválido no fim também conta como erro).
+    """
+    if raw_bytes.startswith(codecs.BOM_UTF8):
+        return {
+            'encoding': 'utf-8-sig',
+            'bom_size': len(codecs.BOM_UTF8),
+            'has_bom': True,
+            'detected': 'UTF-8 with BOM'
+        }
+    elif raw_bytes.startswith(codecs.BOM_UTF16_LE):
+        return {
+            'encoding': 'utf-16-le',
+            'bom_size': len(codecs.BOM_UTF16_LE),
+            'has_bom': True,
+            'detected': 'UTF-16 LE with BOM'
+        }
+    else:
+        try:
+            # final=False só quando a amostra corta o arquivo: um caractere multibyte
+            # cortado no fim dela não é erro, mas no fim do arquivo é
+            amostra_e_o_arquivo = len(raw_bytes) <= TAMANHO_AMOSTRA_ENCODING
+            codecs.getincrementaldecoder('utf-8')().decode(raw_bytes[:TAMANHO_AMOSTRA_ENCODING], amostra_e_o_arquivo)
             return {
-                'encoding': 'utf-8-sig',
-                'bom_size': len(codecs.BOM_UTF8),
-                'has_bom': True,
-                'detected': 'UTF-8 with BOM'
+                'encoding': 'utf-8',
+                'bom_size': 0,
+                'has_bom': False,
+                'detected': 'UTF-8 without BOM'
             }
-        elif raw_bytes.startswith(codecs.BOM_UTF16_LE):
+        except UnicodeDecodeError:
             return {
-                'encoding': 'utf-16-le',
-                'bom_size': len(codecs.BOM_UTF16_LE),
-                'has_bom': True,
-                'detected': 'UTF-16 LE with BOM'
+                'encoding': 'latin-1',
+                'bom_size': 0,
+                'has_bom': False,
+                'detected': 'Latin-1 (fallback)'
             }
-        else:
-            try:
-                with open(caminho_arquivo, 'r', encoding='utf-8') as f:
-                    f.read(100)
-                return {
-                    'encoding': 'utf-8',
-                    'bom_size': 0,
-                    'has_bom': False,
-                    'detected': 'UTF-8 without BOM'
-                }
-            except UnicodeDecodeError:
-                return {
-                    'encoding': 'latin-1',
-                    'bom_size': 0,
-                    'has_bom': False,
-                    'detected': 'Latin-1 (fallback)'
-                }
-    except Exception as e:
+
+def utf8_valido_em_bytes(dados, inicio: int = 0) -> bool:
+    """🆕 Valida o arquivo inteiro como UTF-8 em blocos, sem montar a string toda (v2.2.0)"""
+    decodificador = codecs.getincrementaldecoder('utf-8')()
+    tamanho = len(dados)
+    try:
+        for pos in range(inicio, tamanho, BLOCO_VALIDACAO_UTF8):
+            decodificador.decode(dados[pos:min(tamanho, pos + BLOCO_VALIDACAO_UTF8)], False)
+        decodificador.decode(b'', True)
+    except UnicodeDecodeError:
+        return False
+    return True
+
+def detectar_encoding_arquivo_completo(dados) -> Dict[str, Any]:
+    """🆕 Como detectar_bom_e_encoding_em_bytes, mas sem BOM confirma UTF-8 no arquivo inteiro (v2.2.0)"""
+    contar_metrica('chamadas_deteccao_encoding')
+    info_encoding = detectar_bom_e_encoding_em_bytes(dados[:TAMANHO_AMOSTRA_ENCODING + 1])
+    if info_encoding['encoding'] == 'utf-8' and not utf8_valido_em_bytes(dados):
         return {
-            'encoding': 'utf-8',
+            'encoding': 'latin-1',
             'bom_size': 0,
             'has_bom': False,
-            'detected': 'UTF-8 (error fallback)'
+            'detected': 'Latin-1 (fallback)'
         }
+    return info_encoding
 
-def ler_arquivo_corrigido_bom(caminho):
-    """🔧 Versão corrigida que remove BOM corretamente"""
-    info_encoding = detectar_bom_e_encoding(caminho)
+BLOCO_VALIDACAO_UTF8 = 1024 * 1024
+
+def detectar_encoding_em_fluxo(f) -> Dict[str, Any]:
+    """🆕 detectar_encoding_arquivo_completo lendo de um arquivo binário aberto, bloco a bloco (v2.2.0)"""
+    contar_metrica('chamadas_deteccao_encoding')
+    amostra = f.read(TAMANHO_AMOSTRA_ENCODING + 1)
+    info_encoding = detectar_bom_e_encoding_em_bytes(amostra)
+    if info_encoding['encoding'] != 'utf-8':
+        return info_encoding
     
+    decodificador = codecs.getincrementaldecoder('utf-8')()
     try:
-        # Se tem BOM, usa utf-8-sig que remove automaticamente
-        if info_encoding['has_bom'] and 'utf-8' in info_encoding['detected'].lower():
-            with open(caminho, 'r', encoding='utf-8-sig', errors='replace') as f:
-                conteudo = f.read()
-            print(f"   🔧 BOM UTF-8 removido automaticamente ({info_encoding['bom_size']} bytes)")
-        else:
-            # Sem BOM ou outro encoding
-            with open(caminho, 'r', encoding=info_encoding['encoding'], errors='replace') as f:
-                conteudo = f.read()
-            if info_encoding['has_bom']:
-                print(f"   🔖 BOM detectado: {info_encoding['bom_size']} bytes")
-        
-        return conteudo
-        
-    except Exception as e:
-        print(f"❌ Erro ao ler {caminho}: {e}")
-        # Fallback
-        try:
-            with open(caminho, 'r', encoding='utf-8', errors='replace') as f:
-                return f.read()
-        except:
-            return ""
+        bloco = amostra
+        while bloco:
+            decodificador.decode(bloco, False)
+            bloco = f.read(BLOCO_VALIDACAO_UTF8)
+        decodificador.decode(b'', True)
+    except UnicodeDecodeError:
+        return {
+            'encoding': 'latin-1',
+            'bom_size': 0,
+            'has_bom': False,
+            'detected': 'Latin-1 (fallback)'
+        }
+    return info_encoding
+
+def ler_arquivo_corrigido_bom(caminho):
+    """🔧 Versão corrigida que remove BOM corretamente (uma única leitura via SnapshotArquivo v2.2.0)"""
+    snapshot = ler_snapshot_do_disco(caminho)
+    return snapshot.conteudo if snapshot is not None else ""
 
 def ler_arquivo_com_bom_detection(caminho: str) -> Tuple[str, Dict[str, Any]]:
-    """🆕 Lê arquivo com detecção automática de BOM"""
-    info_encoding = detectar_bom_e_encoding(caminho)
+    """🆕 Lê arquivo com detecção automática de BOM (uma única leitura via SnapshotArquivo v2.2.0)"""
+    snapshot = ler_snapshot_do_disco(caminho)
+    if snapshot is None:
+        return "", detectar_bom_e_encoding_em_bytes(b'')
+    return snapshot.conteudo, snapshot.info_encoding
+
+class MapaOffsetsQuebras:
+    """🆕 Mapa entre posições do texto normalizado e do original, montado uma vez por arquivo (v2.2.0)
     
-    try:
-        # 🚨 CORREÇÃO CRÍTICA: Usa utf-8-sig para remover BOM automaticamente
-        if info_encoding['has_bom'] and 'utf-8' in info_encoding['detected'].lower():
-            with open(caminho, 'r', encoding='utf-8-sig', errors='replace') as f:
-                conteudo = f.read()
-            print(f"   🔧 BOM UTF-8 removido automaticamente ({info_encoding['bom_size']} bytes)")
-        else:
-            with open(caminho, 'r', encoding=info_encoding['encoding'], errors='replace') as f:
-                conteudo = f.read()
-            if info_encoding['has_bom']:
-                print(f"   🔖 BOM detectado: {info_encoding['bom_size']} bytes")
-        
-        return conteudo, info_encoding
+    Guarda só os offsets dos \\r removidos pela normalização (array('l')) e converte
+    nos dois sentidos com bisect em O(log n). Por padrão segue a normalização
+    .replace('\\r\\n', '\\n').replace('\\r', '\\n') (só o \\r do CRLF some);
+    com remover_cr_isolado=True segue limpar_carriage_returns (todo \\r some).
+    """
+    
+    def __init__(self, conteudo_original: str, remover_cr_isolado: bool = False):
+        self.removidos = array('l')
+        pos = conteudo_original.find('\r')
+        while pos != -1:
+            if remover_cr_isolado or conteudo_original.startswith('\n', pos + 1):
+                self.removidos.append(pos)
+            pos = conteudo_original.find('\r', pos + 1)
         
-    except Exception as e:
-        print(f"❌ Erro ao ler {caminho}: {e}")
-        try:
-            with open(caminho, 'r', encoding='utf-8', errors='replace') as f:
-                return f.read(), info_encoding
-        except:
-            return "", info_encoding
+        # Posição, no normalizado, do caractere que vinha logo depois de cada \r removido
+        self.deslocados = array('l', (pos - k for k, pos in enumerate(self.removidos)))
+        self.tamanho_original = len(conteudo_original)
+        self.tamanho_normalizado = self.tamanho_original - len(self.removidos)
+    
+    def para_original_inicio(self, posicao_normalizada: int) -> int:
+        """Início de trecho: um \\n de CRLF no normalizado começa no \\r do original"""
+        return posicao_normalizada + bisect_left(self.deslocados, posicao_normalizada)
+    
+    def para_original_fim(self, posicao_normalizada: int) -> int:
+        """Fim exclusivo de trecho: fica logo depois do último caractere mapeado"""
+        if posicao_normalizada <= 0:
+            return 0
+        return posicao_normalizada + bisect_right(self.deslocados, posicao_normalizada - 1)
+    
+    def para_normalizado(self, posicao_original: int) -> int:
+        return posicao_original - bisect_left(self.removidos, posicao_original)
+    
+    def trecho_original(self, inicio_normalizado: int, tamanho_normalizado: int) -> Tuple[int, int]:
+        """Converte (início, tamanho) do normalizado em (início, fim) do original"""
+        inicio = self.para_original_inicio(inicio_normalizado)
+        if tamanho_normalizado <= 0:
+            return inicio, inicio
+        return inicio, self.para_original_fim(inicio_normalizado + tamanho_normalizado)
 
 def mapear_posicao_normalizada_para_original_melhorado(
     conteudo_original: str, 
     conteudo_normalizado: str, 
-    posicao_normalizada: int
+    posicao_normalizada: int,
+    mapa: Optional[MapaOffsetsQuebras] = None
 ) -> Optional[int]:
-    """🆕 Mapeamento preciso que conta diferenças de quebras"""
+    """🆕 Mapeamento preciso que conta diferenças de quebras (via MapaOffsetsQuebras v2.2.0)"""
     if posicao_normalizada >= len(conteudo_normalizado):
         return None
     
-    chars_contados = 0
-    pos_original = 0
-    
-    while chars_contados < posicao_normalizada and pos_original < len(conteudo_original):
-        char_original = conteudo_original[pos_original]
-        
-        if char_original == '\r':
-            if pos_original + 1 < len(conteudo_original) and conteudo_original[pos_original + 1] == '\n':
-                # CRLF: pula 2 chars no original, conta 1 no normalizado
-                pos_original += 2
-                chars_contados += 1
-            else:
-                # CR isolado: pula 1 char no original, conta 1 no normalizado
-                pos_original += 1
-                chars_contados += 1
-        else:
-            # Char normal: avança ambos
-            pos_original += 1
-            chars_contados += 1
-    
-    return pos_original
+    if mapa is None:
+        mapa = MapaOffsetsQuebras(conteudo_original)
+    return mapa.para_original_inicio(posicao_normalizada)
 
 def obter_texto_copiado():
     try:
@@ -310,56 +497,734 @@ def obter_texto_copiado():
     except:
         return ""
 
+# ═══════════════════════════════════════════════════════════════════════════════
+# 🆕 SNAPSHOT DE ARQUIVO: BYTES, TEXTO, ENCODING E STAT DE UMA ÚNICA LEITURA (v2.2.0)
+# ═══════════════════════════════════════════════════════════════════════════════
+
+TAMANHO_BLOCO_DETECCAO_BINARIO = 8192
+PROPORCAO_MAXIMA_NAO_TEXTO = 0.30
+BYTES_CONTROLE_NAO_TEXTO = bytes(sorted(set(range(0x20)) - set(b'\t\n\r\f\b\x1b') | {0x7f}))
+
+def eh_bloco_binario(bloco: bytes) -> bool:
+    """🆕 NUL ou proporção alta de bytes de controle no primeiro bloco = binário (v2.2.0)"""
+    if not bloco or bloco.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return False  # UTF-16 com BOM tem NUL em todo caractere ASCII
+    if b'\x00' in bloco:
+        return True
+    nao_texto = len(bloco) - len(bloco.translate(None, BYTES_CONTROLE_NAO_TEXTO))
+    return nao_texto / len(bloco) > PROPORCAO_MAXIMA_NAO_TEXTO
+
+def motivo_para_ignorar_arquivo(tamanho: int, bloco_inicial: Optional[bytes] = None) -> Optional[str]:
+    """🆕 'grande' / 'binario' se o arquivo deve ser pulado antes da leitura completa (v2.2.0)"""
+    if TAMANHO_MAXIMO_ARQUIVO and tamanho > TAMANHO_MAXIMO_ARQUIVO:
+        return 'grande'
+    if IGNORAR_ARQUIVOS_BINARIOS and bloco_inicial is not None and eh_bloco_binario(bloco_inicial):
+        return 'binario'
+    return None
+
+@dataclass
+class EstatisticasVarredura:
+    """🆕 Contadores da varredura: arquivos lidos e arquivos pulados antes da leitura (v2.2.0)"""
+    arquivos_lidos: int = 0
+    ignorados_binarios: int = 0
+    ignorados_grandes: int = 0
+    bytes_ignorados: int = 0
+    arquivos_em_fluxo: int = 0  # 🆕 Grandes demais para carregar, buscados em blocos
+    
+    def registrar_ignorado(self, motivo: str, tamanho: int):
+        if motivo == 'grande':
+            self.ignorados_grandes += 1
+        else:
+            self.ignorados_binarios += 1
+        self.bytes_ignorados += tamanho
+    
+    def somar(self, outra: 'EstatisticasVarredura'):
+        self.arquivos_lidos += outra.arquivos_lidos
+        self.ignorados_binarios += outra.ignorados_binarios
+        self.ignorados_grandes += outra.ignorados_grandes
+        self.bytes_ignorados += outra.bytes_ignorados
+        self.arquivos_em_fluxo += outra.arquivos_em_fluxo
+    
+    def imprimir(self):
+        log_info(f"📂 Arquivos lidos: {self.arquivos_lidos}")
+        if self.arquivos_em_fluxo:
+            log_info(f"🌊 Lidos em fluxo (blocos): {self.arquivos_em_fluxo}")
+        if self.ignorados_binarios or self.ignorados_grandes:
+            log_info(f"⏭️ Pulados antes da leitura: {self.ignorados_binarios} binário(s), "
+                  f"{self.ignorados_grandes} grande(s) demais - {self.bytes_ignorados / 1024 / 1024:.1f} MB não lidos")
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# 🆕 MÉTRICAS DE DESEMPENHO POR TIPO E POR EXECUÇÃO (v2.2.0)
+# ═══════════════════════════════════════════════════════════════════════════════
+
+@dataclass
+class MetricasBusca:
+    """🆕 Coletor opcional de tempos e contadores de uma busca (v2.2.0)
+    
+    Etapas: "TIPO n" (verificação no texto), "TIPOS 1,2 (bytes)" (mmap), "fluxo"
+    (arquivos grandes) e "leitura" (espera pelo snapshot). Tempo de CPU das etapas
+    é o da thread que roda os TIPOS; com --workers, as etapas somam todos os processos.
+    arquivos_percorridos conta cada passada pela pasta (planejador e índice incluídos).
+    """
+    tempo_parede: float = 0.0
+    tempo_cpu: float = 0.0
+    etapas: Dict[str, List[float]] = field(default_factory=dict)  # etapa -> [parede, cpu, chamadas]
+    arquivos_percorridos: int = 0
+    arquivos_pulados: int = 0
+    arquivos_lidos: int = 0
+    arquivos_decodificados: int = 0
+    arquivos_do_cache: int = 0
+    bytes_lidos: int = 0
+    chamadas_deteccao_encoding: int = 0
+    chamadas_mapeamento_posicoes: int = 0
+    
+    def registrar_etapa(self, etapa: str, parede: float, cpu: float, chamadas: int = 1):
+        acumulado = self.etapas.setdefault(etapa, [0.0, 0.0, 0])
+        acumulado[0] += parede
+        acumulado[1] += cpu
+        acumulado[2] += chamadas
+    
+    def somar_estatisticas(self, estatisticas: EstatisticasVarredura):
+        """Arquivos lidos/pulados vêm das estatísticas da varredura (já somadas entre workers)"""
+        self.arquivos_lidos += estatisticas.arquivos_lidos
+        self.arquivos_pulados += estatisticas.ignorados_binarios + estatisticas.ignorados_grandes
+    
+    def somar(self, outra: 'MetricasBusca'):
+        """Junta as métricas de um worker"""
+        for etapa, (parede, cpu, chamadas) in outra.etapas.items():
+            self.registrar_etapa(etapa, parede, cpu, chamadas)
+        self.arquivos_percorridos += outra.arquivos_percorridos
+        self.arquivos_decodificados += outra.arquivos_decodificados
+        self.arquivos_do_cache += outra.arquivos_do_cache
+        self.bytes_lidos += outra.bytes_lidos
+        self.chamadas_deteccao_encoding += outra.chamadas_deteccao_encoding
+        self.chamadas_mapeamento_posicoes += outra.chamadas_mapeamento_posicoes
+    
+    def contadores(self) -> Dict[str, int]:
+        return {
+            'arquivos_percorridos': self.arquivos_percorridos,
+            'arquivos_pulados': self.arquivos_pulados,
+            'arquivos_lidos': self.arquivos_lidos,
+            'arquivos_decodificados': self.arquivos_decodificados,
+            'arquivos_do_cache': self.arquivos_do_cache,
+            'bytes_lidos': self.bytes_lidos,
+            'chamadas_deteccao_encoding': self.chamadas_deteccao_encoding,
+            'chamadas_mapeamento_posicoes': self.chamadas_mapeamento_posicoes,
+        }
+    
+    def imprimir(self):
+        """Tabela de resumo (aparece mesmo com -q: as métricas foram pedidas explicitamente)"""
+        print(f"\n📈 MÉTRICAS DE DESEMPENHO:")
+        print(f"   {'Etapa':<22} {'Parede (s)':>11} {'CPU (s)':>10} {'Chamadas':>10}")
+        for etapa in sorted(self.etapas):
+            parede, cpu, chamadas = self.etapas[etapa]
+            print(f"   {etapa:<22} {parede:>11.3f} {cpu:>10.3f} {chamadas:>10}")
+        print(f"   {'Busca completa':<22} {self.tempo_parede:>11.3f} {self.tempo_cpu:>10.3f}")
+        print(f"   📂 Arquivos: {self.arquivos_percorridos} percorrido(s), {self.arquivos_pulados} pulado(s), "
+              f"{self.arquivos_lidos} lido(s), {self.arquivos_decodificados} decodificado(s), {self.arquivos_do_cache} do cache")
+        print(f"   💾 Bytes lidos: {self.bytes_lidos / 1024 / 1024:.1f} MB | "
+              f"🔤 Detecções de encoding: {self.chamadas_deteccao_encoding} | "
+              f"📍 Mapeamentos de posição: {self.chamadas_mapeamento_posicoes}")
+    
+    def adicionar_ao_xml(self, info):
+        """Grava as métricas dentro do bloco <info> da sessão"""
+        metricas = ET.SubElement(info, "metricas")
+        ET.SubElement(metricas, "tempo_parede_s").text = f"{self.tempo_parede:.6f}"
+        ET.SubElement(metricas, "tempo_cpu_s").text = f"{self.tempo_cpu:.6f}"
+        for nome, valor in self.contadores().items():
+            ET.SubElement(metricas, nome).text = str(valor)
+        etapas = ET.SubElement(metricas, "etapas")
+        for etapa in sorted(self.etapas):
+            parede, cpu, chamadas = self.etapas[etapa]
+            etapa_elem = ET.SubElement(etapas, "etapa")
+            ET.SubElement(etapa_elem, "nome").text = etapa
+            ET.SubElement(etapa_elem, "parede_s").text = f"{parede:.6f}"
+            ET.SubElement(etapa_elem, "cpu_s").text = f"{cpu:.6f}"
+            ET.SubElement(etapa_elem, "chamadas").text = str(chamadas)
+
+# 🆕 COLETOR ATIVO (None = desativado: cada ponto de medição custa só um "is None")
+metricas_ativas: Optional[MetricasBusca] = None
+trava_metricas = threading.Lock()  # A detecção de encoding também roda nas threads de leitura
+
+def contar_metrica(contador: str, quantidade: int = 1):
+    """🆕 Soma quantidade a um contador do coletor ativo (v2.2.0)"""
+    if metricas_ativas is not None:
+        with trava_metricas:
+            setattr(metricas_ativas, contador, getattr(metricas_ativas, contador) + quantidade)
+
+def iniciar_medicao() -> Optional[Tuple[float, float]]:
+    """🆕 Marca (parede, CPU da thread) para registrar_medicao; None sem coletor ativo (v2.2.0)"""
+    if metricas_ativas is None:
+        return None
+    return time.perf_counter(), time.thread_time()
+
+def registrar_medicao(etapa: str, inicio: Optional[Tuple[float, float]]):
+    """🆕 Soma à etapa o tempo decorrido desde iniciar_medicao (v2.2.0)"""
+    if inicio is None or metricas_ativas is None:
+        return
+    parede = time.perf_counter() - inicio[0]
+    cpu = time.thread_time() - inicio[1]
+    with trava_metricas:
+        metricas_ativas.registrar_etapa(etapa, parede, cpu)
+
+@dataclass
+class SnapshotArquivo:
+    """🆕 "FileSnapshot": tudo o que a busca precisa de um arquivo, lido com um único read() (v2.2.0)
+    
+    conteudo segue as regras do modo texto (BOM UTF-8 removido, quebras traduzidas
+    para \\n). dados fica None quando o texto veio do cache de conteúdo ou quando
+    o arquivo foi classificado como binário/grande demais (ignorado).
+    """
+    caminho: str
+    mtime_ns: int
+    tamanho: int
+    info_encoding: Dict[str, Any]
+    conteudo: str
+    dados: Optional[bytes] = None
+    ignorado: Optional[str] = None  # 🆕 'binario' / 'grande': não foi lido (conteudo vazio)
+    tabela_linhas: Optional['TabelaLinhas'] = None  # 🆕 Montada sob demanda (TIPO 5 / âncoras)
+    
+    @property
+    def offset_bom(self) -> int:
+        """Deslocamento usado nas coordenadas: só o BOM UTF-8 conta"""
+        if self.info_encoding['has_bom'] and 'utf-8' in self.info_encoding['detected'].lower():
+            return self.info_encoding['bom_size']
+        return 0
+
+def decodificar_como_modo_texto(dados: bytes, encoding: str) -> str:
+    """🆕 Mesmo resultado de open(..., 'r', encoding, errors='replace').read() (v2.2.0)"""
+    conteudo = dados.decode(encoding, errors='replace')
+    if '\r' in conteudo:
+        conteudo = conteudo.replace('\r\n', '\n').replace('\r', '\n')
+    return conteudo
+
+def ler_snapshot_do_disco(caminho: str, info_encoding: Optional[Dict[str, Any]] = None, classificar: bool = False) -> Optional[SnapshotArquivo]:
+    """🆕 Abre o arquivo uma vez: stat, bytes, encoding (arquivo inteiro) e texto (v2.2.0)
+    
+    classificar=True (varredura/índice): tamanho e primeiro bloco são checados antes
+    da leitura completa, e binários/grandes voltam como snapshot ignorado.
+    """
+    try:
+        with open(caminho, 'rb') as f:
+            stat_arquivo = os.fstat(f.fileno())
+            if classificar:
+                motivo = motivo_para_ignorar_arquivo(stat_arquivo.st_size)
+                if motivo is None:
+                    bloco_inicial = f.read(TAMANHO_BLOCO_DETECCAO_BINARIO)
+                    motivo = motivo_para_ignorar_arquivo(stat_arquivo.st_size, bloco_inicial)
+                if motivo is not None:
+                    return SnapshotArquivo(caminho, stat_arquivo.st_mtime_ns, stat_arquivo.st_size,
+                                           detectar_bom_e_encoding_em_bytes(b''), "", ignorado=motivo)
+                dados = bloco_inicial + f.read()
+            else:
+                dados = f.read()
+    except OSError as e:
+        print(f"❌ Erro ao ler {caminho}: {e}")
+        return None
+    
+    return snapshot_de_bytes(caminho, stat_arquivo, dados, info_encoding)
+
+def snapshot_de_bytes(caminho: str, stat_arquivo: os.stat_result, dados: bytes,
+                      info_encoding: Optional[Dict[str, Any]] = None) -> SnapshotArquivo:
+    """🆕 Snapshot de bytes já lidos: encoding (arquivo inteiro) e texto no modo texto (v2.2.0)"""
+    if info_encoding is None:
+        info_encoding = detectar_encoding_arquivo_completo(dados)
+    
+    conteudo = decodificar_como_modo_texto(dados, info_encoding['encoding'])
+    if info_encoding['has_bom'] and 'utf-8' in info_encoding['detected'].lower():
+        log_debug(f"   🔧 BOM UTF-8 removido automaticamente ({info_encoding['bom_size']} bytes)")
+    elif info_encoding['has_bom']:
+        log_debug(f"   🔖 BOM detectado: {info_encoding['bom_size']} bytes")
+    
+    return SnapshotArquivo(caminho, stat_arquivo.st_mtime_ns, stat_arquivo.st_size, info_encoding, conteudo, dados)
+
+def resolver_snapshot_pelo_cache(caminho: str, classificar: bool = False) -> Tuple[bool, Optional[SnapshotArquivo], Optional[Dict[str, Any]]]:
+    """🆕 Parte de carregar_snapshot que não lê o arquivo: stat + cache de conteúdo (v2.2.0)
+    
+    Retorna (resolvido, snapshot, info_encoding). resolvido=False: falta ler do disco,
+    com o info_encoding do cache quando a entrada é um ponteiro.
+    """
+    if memoria_snapshots_ativa is not None:
+        snapshot = memoria_snapshots_ativa.obter(caminho)
+        if snapshot is not None:
+            return True, snapshot, None
+    
+    if cache_conteudo_ativo is None:
+        return False, None, None
+    
+    try:
+        stat_arquivo = os.stat(caminho)
+    except OSError as e:
+        print(f"❌ Erro ao ler {caminho}: {e}")
+        return True, None, None
+    chave = (stat_arquivo.st_mtime_ns, stat_arquivo.st_size)
+    
+    if classificar and motivo_para_ignorar_arquivo(chave[1]) is not None:
+        snapshot = SnapshotArquivo(caminho, chave[0], chave[1], detectar_bom_e_encoding_em_bytes(b''), "", ignorado='grande')
+        return True, lembrar_snapshot(snapshot), None
+    
+    conteudo, info_encoding = cache_conteudo_ativo.obter(caminho, chave)
+    if conteudo is not None:
+        # Entradas gravadas antes da classificação: NUL no início ainda denuncia binário
+        if classificar and IGNORAR_ARQUIVOS_BINARIOS and '\x00' in conteudo[:TAMANHO_BLOCO_DETECCAO_BINARIO]:
+            return True, lembrar_snapshot(SnapshotArquivo(caminho, chave[0], chave[1], info_encoding, "", ignorado='binario')), None
+        return True, lembrar_snapshot(SnapshotArquivo(caminho, chave[0], chave[1], info_encoding, conteudo)), None
+    
+    # Entrada "ponteiro": encoding já conhecido, só falta ler o texto
+    return False, None, info_encoding
+
+def registrar_snapshot_no_cache(snapshot: Optional[SnapshotArquivo], info_encoding_cache: Optional[Dict[str, Any]]):
+    """🆕 Grava no cache um snapshot lido do disco que o cache ainda não conhecia (v2.2.0)"""
+    lembrar_snapshot(snapshot)
+    if cache_conteudo_ativo is None or snapshot is None or snapshot.ignorado is not None:
+        return
+    if info_encoding_cache is None:
+        cache_conteudo_ativo.guardar(snapshot.caminho, snapshot.conteudo, snapshot.info_encoding,
+                                     (snapshot.mtime_ns, snapshot.tamanho))
+
+def carregar_snapshot(caminho: str, classificar: bool = False) -> Optional[SnapshotArquivo]:
+    """🆕 Snapshot do arquivo, servido pelo cache de conteúdo quando o (mtime, tamanho) bate (v2.2.0)"""
+    resolvido, snapshot, info_encoding = resolver_snapshot_pelo_cache(caminho, classificar)
+    if resolvido:
+        return snapshot
+    
+    snapshot = ler_snapshot_do_disco(caminho, info_encoding, classificar)
+    registrar_snapshot_no_cache(snapshot, info_encoding)
+    return snapshot
+
+def obter_info_encoding_arquivo(caminho_arquivo: str, snapshot: Optional[SnapshotArquivo] = None) -> Dict[str, Any]:
+    """🆕 Encoding do snapshot já carregado; sem snapshot, cai na detecção pelo caminho (v2.2.0)"""
+    if snapshot is not None:
+        return snapshot.info_encoding
+    return detectar_bom_e_encoding(caminho_arquivo)
+
 def ler_arquivo(caminho):
-    """🔧 Função corrigida que usa o método corrigido para BOM"""
-    return ler_arquivo_corrigido_bom(caminho)
+    """🔧 Função corrigida que usa o método corrigido para BOM (via SnapshotArquivo v2.2.0)"""
+    snapshot = carregar_snapshot(caminho)
+    return snapshot.conteudo if snapshot is not None else ""
 
 def mostrar_debug_texto(texto, nome):
     """🆕 Mostra informações detalhadas do texto incluindo análise de \\r (v2.1.2)"""
-    print(f"📋 {nome}:")
-    print(f"   Tamanho: {len(texto)} caracteres")
-    print(f"   Repr: {repr(texto[:100])}")
-    print(f"   Hex: {' '.join(f'{ord(c):02x}' for c in texto[:20])}")
+    log_detalhe(f"📋 {nome}:")
+    log_detalhe(f"   Tamanho: {len(texto)} caracteres")
+    log_detalhe(f"   Repr: {repr(texto[:100])}")
+    log_detalhe(f"   Hex: {' '.join(f'{ord(c):02x}' for c in texto[:20])}")
     
     # 🆕 ANÁLISE ESPECÍFICA DE CARRIAGE RETURNS
     detectar_problemas_carriage_return(texto)
 
+# ═══════════════════════════════════════════════════════════════════════════════
+# 🆕 CACHE PERSISTENTE DE CONTEÚDO E ENCODING (v2.2.0)
+# ═══════════════════════════════════════════════════════════════════════════════
+
+class CacheConteudo:
+    """🆕 Cache em disco (SQLite) do texto decodificado e do encoding de cada arquivo (v2.2.0)
+    
+    Chave: (caminho, st_mtime_ns, st_size). Arquivos grandes guardam só o encoding
+    (ponteiro compacto); o texto é comprimido com zlib. Eviction LRU por tamanho.
+    """
+    
+    def __init__(self, caminho_db: str = ARQUIVO_CACHE_CONTEUDO, limite_bytes: int = LIMITE_CACHE_CONTEUDO_BYTES):
+        self.caminho_db = caminho_db
+        self.limite_bytes = limite_bytes
+        self.conexao = sqlite3.connect(caminho_db, timeout=30)
+        self.conexao.execute("""
+            CREATE TABLE IF NOT EXISTS cache_conteudo (
+                caminho TEXT PRIMARY KEY,
+                mtime_ns INTEGER NOT NULL,
+                tamanho INTEGER NOT NULL,
+                encoding TEXT NOT NULL,
+                bom_size INTEGER NOT NULL,
+                has_bom INTEGER NOT NULL,
+                detected TEXT NOT NULL,
+                conteudo BLOB,
+                bytes_cache INTEGER NOT NULL,
+                ultimo_acesso INTEGER NOT NULL
+            )
+        """)
+        self.conexao.execute("CREATE INDEX IF NOT EXISTS idx_cache_ultimo_acesso ON cache_conteudo (ultimo_acesso)")
+        # 🆕 Tabela de linhas (hash → linhas/offsets) de cada arquivo, mesma chave de validade
+        self.conexao.execute("""
+            CREATE TABLE IF NOT EXISTS cache_linhas (
+                caminho TEXT PRIMARY KEY,
+                mtime_ns INTEGER NOT NULL,
+                tamanho INTEGER NOT NULL,
+                tabela BLOB NOT NULL
+            )
+        """)
+        self.acessos_pendentes: Dict[str, int] = {}
+        self.gravacoes_pendentes: List[Tuple] = []
+        self.tabelas_pendentes: List[Tuple] = []
+        self.info_sessao: Dict[str, Tuple[int, int, Dict[str, Any]]] = {}
+        self.acertos = 0
+        self.falhas = 0
+    
+    @staticmethod
+    def _chave_stat(caminho: str) -> Optional[Tuple[int, int]]:
+        try:
+            stat_arquivo = os.stat(caminho)
+        except OSError:
+            return None
+        return stat_arquivo.st_mtime_ns, stat_arquivo.st_size
+    
+    def obter(self, caminho: str, chave: Optional[Tuple[int, int]] = None) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+        """Retorna (conteudo, info_encoding) se o arquivo não mudou; (None, info) para ponteiros"""
+        if chave is None:
+            chave = self._chave_stat(caminho)
+        if chave is None:
+            return None, None
+        
+        linha = self.conexao.execute(
+            "SELECT mtime_ns, tamanho, encoding, bom_size, has_bom, detected, conteudo "
+            "FROM cache_conteudo WHERE caminho = ?", (caminho,)
+        ).fetchone()
+        
+        if linha is None or (linha[0], linha[1]) != chave:
+            self.falhas += 1
+            return None, None
+        
+        info_encoding = {
+            'encoding': linha[2],
+            'bom_size': linha[3],
+            'has_bom': bool(linha[4]),
+            'detected': linha[5]
+        }
+        self.info_sessao[caminho] = (chave[0], chave[1], info_encoding)
+        self.acessos_pendentes[caminho] = time.time_ns()
+        self.acertos += 1
+        
+        if linha[6] is None:
+            return None, info_encoding
+        return zlib.decompress(linha[6]).decode('utf-8', errors='surrogatepass'), info_encoding
+    
+    def obter_info_encoding(self, caminho: str) -> Optional[Dict[str, Any]]:
+        """Encoding do arquivo sem reabrir/re-sniffar o BOM, se ainda válido"""
+        chave = self._chave_stat(caminho)
+        if chave is None:
+            return None
+        
+        em_memoria = self.info_sessao.get(caminho)
+        if em_memoria is not None and (em_memoria[0], em_memoria[1]) == chave:
+            return em_memoria[2]
+        
+        linha = self.conexao.execute(
+            "SELECT mtime_ns, tamanho, encoding, bom_size, has_bom, detected "
+            "FROM cache_conteudo WHERE caminho = ?", (caminho,)
+        ).fetchone()
+        if linha is None or (linha[0], linha[1]) != chave:
+            return None
+        
+        info_encoding = {'encoding': linha[2], 'bom_size': linha[3], 'has_bom': bool(linha[4]), 'detected': linha[5]}
+        self.info_sessao[caminho] = (chave[0], chave[1], info_encoding)
+        return info_encoding
+    
+    def guardar(self, caminho: str, conteudo: str, info_encoding: Dict[str, Any], chave: Optional[Tuple[int, int]] = None):
+        """Grava/atualiza a entrada do arquivo (texto comprimido ou só o encoding)"""
+        if chave is None:
+            chave = self._chave_stat(caminho)
+        if chave is None:
+            return
+        
+        if chave[1] <= LIMITE_CACHE_TEXTO_POR_ARQUIVO:
+            blob = zlib.compress(conteudo.encode('utf-8', errors='surrogatepass'), 1)
+            bytes_cache = len(blob)
+        else:
+            blob = None
+            bytes_cache = 0
+        
+        self.gravacoes_pendentes.append(
+            (caminho, chave[0], chave[1], info_encoding['encoding'], info_encoding['bom_size'],
+             int(info_encoding['has_bom']), info_encoding['detected'], blob, bytes_cache, time.time_ns())
+        )
+        self.info_sessao[caminho] = (chave[0], chave[1], info_encoding)
+        
+        if len(self.gravacoes_pendentes) >= 500:
+            self.gravar_pendentes()
+    
+    def obter_tabela_linhas(self, caminho: str, chave: Tuple[int, int]) -> Optional[bytes]:
+        """🆕 Tabela de linhas serializada, se gravada para o mesmo (mtime, tamanho)"""
+        linha = self.conexao.execute(
+            "SELECT mtime_ns, tamanho, tabela FROM cache_linhas WHERE caminho = ?", (caminho,)
+        ).fetchone()
+        if linha is None or (linha[0], linha[1]) != chave:
+            return None
+        return linha[2]
+    
+    def guardar_tabela_linhas(self, caminho: str, chave: Tuple[int, int], blob: bytes):
+        """🆕 Agenda a gravação da tabela de linhas do arquivo"""
+        self.tabelas_pendentes.append((caminho, chave[0], chave[1], blob))
+        if len(self.tabelas_pendentes) >= 500:
+            self.gravar_pendentes()
+    
+    def gravar_pendentes(self):
+        """Grava as entradas novas em lote (transação curta, segura com vários processos)"""
+        if not self.gravacoes_pendentes and not self.tabelas_pendentes:
+            return
+        self.conexao.executemany(
+            "INSERT OR REPLACE INTO cache_conteudo "
+            "(caminho, mtime_ns, tamanho, encoding, bom_size, has_bom, detected, conteudo, bytes_cache, ultimo_acesso) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            self.gravacoes_pendentes
+        )
+        self.conexao.executemany(
+            "INSERT OR REPLACE INTO cache_linhas (caminho, mtime_ns, tamanho, tabela) VALUES (?, ?, ?, ?)",
+            self.tabelas_pendentes
+        )
+        self.conexao.commit()
+        self.gravacoes_pendentes = []
+        self.tabelas_pendentes = []
+    
+    def aplicar_limite_lru(self):
+        """Remove as entradas menos usadas até o cache caber em limite_bytes"""
+        total = self.conexao.execute("SELECT COALESCE(SUM(bytes_cache), 0) FROM cache_conteudo").fetchone()[0]
+        total += self.conexao.execute("SELECT COALESCE(SUM(LENGTH(tabela)), 0) FROM cache_linhas").fetchone()[0]
+        if total <= self.limite_bytes:
+            return 0
+        
+        removidos = []
+        for caminho, bytes_cache in self.conexao.execute(
+            "SELECT c.caminho, c.bytes_cache + COALESCE(LENGTH(l.tabela), 0) "
+            "FROM cache_conteudo c LEFT JOIN cache_linhas l ON l.caminho = c.caminho "
+            "ORDER BY c.ultimo_acesso ASC"
+        ):
+            if total <= self.limite_bytes:
+                break
+            removidos.append((caminho,))
+            total -= bytes_cache
+        
+        self.conexao.executemany("DELETE FROM cache_conteudo WHERE caminho = ?", removidos)
+        self.conexao.executemany("DELETE FROM cache_linhas WHERE caminho = ?", removidos)
+        return len(removidos)
+    
+    def fechar(self):
+        """Grava os acessos (LRU), aplica o limite de tamanho e fecha o banco"""
+        try:
+            self.gravar_pendentes()
+            self.conexao.executemany(
+                "UPDATE cache_conteudo SET ultimo_acesso = ? WHERE caminho = ?",
+                [(acesso, caminho) for caminho, acesso in self.acessos_pendentes.items()]
+            )
+            removidos = self.aplicar_limite_lru()
+            self.conexao.commit()
+            log_detalhe(f"🗄️ CACHE DE CONTEÚDO: {self.acertos} acerto(s), {self.falhas} falha(s), {removidos} entrada(s) removida(s) por LRU")
+        finally:
+            self.conexao.close()
+
+# 🆕 CACHE ATIVO DURANTE A VARREDURA (None = desativado)
+cache_conteudo_ativo: Optional[CacheConteudo] = None
+
+def abrir_cache_conteudo():
+    """🆕 Abre o cache persistente para a varredura atual (v2.2.0)"""
+    global cache_conteudo_ativo
+    if not USAR_CACHE_CONTEUDO or cache_conteudo_ativo is not None:
+        return
+    try:
+        cache_conteudo_ativo = CacheConteudo()
+    except sqlite3.Error as e:
+        print(f"⚠️ Cache de conteúdo desativado: {e}")
+        cache_conteudo_ativo = None
+
+def fechar_cache_conteudo():
+    """🆕 Persiste e fecha o cache da varredura atual (v2.2.0)"""
+    global cache_conteudo_ativo
+    if cache_conteudo_ativo is None:
+        return
+    try:
+        cache_conteudo_ativo.fechar()
+    except sqlite3.Error as e:
+        print(f"⚠️ Erro ao gravar cache de conteúdo: {e}")
+    finally:
+        cache_conteudo_ativo = None
+
+class MemoriaSnapshots:
+    """🆕 Snapshots lidos por uma fase do planejador, reaproveitados pelas fases seguintes (v2.2.0)
+    
+    Limitada a MEMORIA_SNAPSHOTS_PLANEJADOR bytes; o que não couber volta a passar
+    pelo cache de conteúdo/disco. Só a thread que consome a varredura acessa a memória.
+    """
+    
+    def __init__(self, limite_bytes: int = MEMORIA_SNAPSHOTS_PLANEJADOR):
+        self.limite_bytes = limite_bytes
+        self.bytes_guardados = 0
+        self.snapshots: Dict[str, SnapshotArquivo] = {}
+    
+    def obter(self, caminho: str) -> Optional[SnapshotArquivo]:
+        snapshot = self.snapshots.get(caminho)
+        if snapshot is not None:
+            snapshot.dados = None  # Bytes já contados (e decodificados) na fase anterior
+        return snapshot
+    
+    def guardar(self, snapshot: SnapshotArquivo):
+        if snapshot.caminho in self.snapshots:
+            return
+        custo = len(snapshot.conteudo) + (len(snapshot.dados) if snapshot.dados is not None else 0)
+        if self.bytes_guardados + custo > self.limite_bytes:
+            return
+        self.snapshots[snapshot.caminho] = snapshot
+        self.bytes_guardados += custo
+
+# 🆕 MEMÓRIA ENTRE AS FASES DO PLANEJADOR (None = desativada)
+memoria_snapshots_ativa: Optional[MemoriaSnapshots] = None
+
+def lembrar_snapshot(snapshot: Optional[SnapshotArquivo]) -> Optional[SnapshotArquivo]:
+    """🆕 Guarda o snapshot na memória do planejador, se ativa, e o devolve (v2.2.0)"""
+    if memoria_snapshots_ativa is not None and snapshot is not None:
+        memoria_snapshots_ativa.guardar(snapshot)
+    return snapshot
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# 🆕 TABELA DE LINHAS POR ARQUIVO (HASH DA LINHA SEM ESPAÇOS NAS PONTAS) (v2.2.0)
+# ═══════════════════════════════════════════════════════════════════════════════
+
+VERSAO_TABELA_LINHAS = 1
+
+def hash_linha_stripped(linha: str) -> int:
+    """🆕 Hash estável de 8 bytes (blake2b) de uma linha já sem espaços nas pontas (v2.2.0)"""
+    digest = hashlib.blake2b(linha.encode('utf-8', errors='surrogatepass'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little')
+
+class TabelaLinhas:
+    """🆕 Linhas não vazias de um arquivo: hash, número da linha e offsets (v2.2.0)
+    
+    Arrays paralelos, um item por linha não vazia (compacto para o cache em disco).
+    inicio_linha inclui a indentação; inicio_texto/fim_texto delimitam a linha sem
+    espaços nas pontas. O dicionário hash → posições é montado sob demanda.
+    """
+    
+    def __init__(self, hashes=None, numeros=None, inicios_linha=None, inicios_texto=None, fins_texto=None):
+        self.hashes = hashes if hashes is not None else array('Q')
+        self.numeros = numeros if numeros is not None else array('q')  # Número da linha (1 = primeira)
+        self.inicios_linha = inicios_linha if inicios_linha is not None else array('q')
+        self.inicios_texto = inicios_texto if inicios_texto is not None else array('q')
+        self.fins_texto = fins_texto if fins_texto is not None else array('q')
+        self._posicoes_por_hash: Optional[Dict[int, List[int]]] = None
+    
+    def __len__(self):
+        return len(self.hashes)
+    
+    @staticmethod
+    def construir(conteudo: str) -> 'TabelaLinhas':
+        """Percorre o texto uma vez calculando hash e offsets de cada linha não vazia"""
+        tabela = TabelaLinhas()
+        posicao = 0
+        for numero, linha in enumerate(conteudo.split('\n'), 1):
+            linha_limpa = linha.strip()
+            if linha_limpa:
+                tabela.hashes.append(hash_linha_stripped(linha_limpa))
+                tabela.numeros.append(numero)
+                tabela.inicios_linha.append(posicao)
+                tabela.inicios_texto.append(posicao + len(linha) - len(linha.lstrip()))
+                tabela.fins_texto.append(posicao + len(linha.rstrip()))
+            posicao += len(linha) + 1
+        return tabela
+    
+    def posicoes(self, hash_linha: int) -> List[int]:
+        """Índices (na tabela) de todas as linhas com esse hash, em ordem"""
+        if self._posicoes_por_hash is None:
+            por_hash: Dict[int, List[int]] = {}
+            for indice, valor in enumerate(self.hashes):
+                por_hash.setdefault(valor, []).append(indice)
+            self._posicoes_por_hash = por_hash
+        return self._posicoes_por_hash.get(hash_linha, [])
+    
+    def ocorrencias(self, linha: str) -> List[int]:
+        """Índices de todas as ocorrências de uma linha (comparada sem espaços nas pontas)"""
+        return self.posicoes(hash_linha_stripped(linha.strip()))
+    
+    def localizar_bloco(self, hashes_bloco: List[int]) -> List[int]:
+        """Índices onde a sequência de linhas aparece em linhas não vazias consecutivas"""
+        if not hashes_bloco:
+            return []
+        tamanho = len(hashes_bloco)
+        bloco = array('Q', hashes_bloco)
+        return [indice for indice in self.posicoes(hashes_bloco[0])
+                if self.hashes[indice:indice + tamanho] == bloco]
+    
+    def serializar(self) -> bytes:
+        """Bytes para o cache: versão + arrays de 8 bytes comprimidos"""
+        dados = b''.join(parte.tobytes() for parte in
+                         (self.hashes, self.numeros, self.inicios_linha, self.inicios_texto, self.fins_texto))
+        return bytes([VERSAO_TABELA_LINHAS]) + zlib.compress(dados, 1)
+    
+    @staticmethod
+    def desserializar(blob: bytes) -> Optional['TabelaLinhas']:
+        """Reconstrói a tabela do cache; None se a versão ou o tamanho não batem"""
+        if not blob or blob[0] != VERSAO_TABELA_LINHAS:
+            return None
+        dados = zlib.decompress(blob[1:])
+        if len(dados) % 40:
+            return None
+        tamanho_parte = len(dados) // 5
+        partes = []
+        for indice, tipo in enumerate('Qqqqq'):
+            parte = array(tipo)
+            parte.frombytes(dados[indice * tamanho_parte:(indice + 1) * tamanho_parte])
+            partes.append(parte)
+        return TabelaLinhas(*partes)
+
+def obter_tabela_linhas(conteudo: str, snapshot: Optional[SnapshotArquivo] = None) -> TabelaLinhas:
+    """🆕 Tabela de linhas do conteúdo: do snapshot, do cache (mesmo mtime/tamanho) ou construída (v2.2.0)"""
+    if snapshot is None or snapshot.conteudo is not conteudo:
+        return TabelaLinhas.construir(conteudo)
+    if snapshot.tabela_linhas is not None:
+        return snapshot.tabela_linhas
+    
+    chave = (snapshot.mtime_ns, snapshot.tamanho)
+    tabela = None
+    if cache_conteudo_ativo is not None:
+        blob = cache_conteudo_ativo.obter_tabela_linhas(snapshot.caminho, chave)
+        if blob is not None:
+            tabela = TabelaLinhas.desserializar(blob)
+    
+    if tabela is None:
+        tabela = TabelaLinhas.construir(conteudo)
+        if cache_conteudo_ativo is not None:
+            cache_conteudo_ativo.guardar_tabela_linhas(snapshot.caminho, chave, tabela.serializar())
+    
+    snapshot.tabela_linhas = tabela
+    return tabela
+
 # ═══════════════════════════════════════════════════════════════════════════════
 # 🚨 FUNÇÃO CORRIGIDA PARA CÁLCULO PRECISO DE POSIÇÕES (CORREÇÃO COMPLETA)
 # ═══════════════════════════════════════════════════════════════════════════════
 
-def calcular_posicoes_precisas(conteudo_original: str, texto_procurado: str, debug_arquivo: str = "", caminho_arquivo: str = "") -> Optional[Dict[str, int]]:
+def calcular_posicoes_precisas(conteudo_original: str, texto_procurado: str, debug_arquivo: str = "", caminho_arquivo: str = "", snapshot: Optional[SnapshotArquivo] = None) -> Optional[Dict[str, int]]:
     """🔧 Versão CORRIGIDA v2.1.6 - Mapeamento preciso com quebras de linha diferentes"""
     if not texto_procurado or not conteudo_original:
         return None
+    contar_metrica('chamadas_mapeamento_posicoes')
     
     # 🚨 CRÍTICO: Detecta se arquivo original tinha BOM
     offset_bom = 0
-    if caminho_arquivo and os.path.exists(caminho_arquivo):
+    if snapshot is not None:
+        offset_bom = snapshot.offset_bom
+        if offset_bom and debug_arquivo:
+            log_debug(f"🔖 BOM detectado: ajustando posições em +{offset_bom} bytes")
+    elif caminho_arquivo and os.path.exists(caminho_arquivo):
         info_encoding = detectar_bom_e_encoding(caminho_arquivo)
         if info_encoding['has_bom'] and 'utf-8' in info_encoding['detected'].lower():
             offset_bom = info_encoding['bom_size']
             if debug_arquivo:
-                print(f"🔖 BOM detectado: ajustando posições em +{offset_bom} bytes")
+                log_debug(f"🔖 BOM detectado: ajustando posições em +{offset_bom} bytes")
     
     if debug_arquivo:
-        print(f"🔍 Iniciando busca precisa em {debug_arquivo} (offset BOM: {offset_bom})")
-        print(f"   📊 Conteúdo: {len(conteudo_original)} chars")
-        print(f"   📊 Procurado: {len(texto_procurado)} chars")
+        log_debug(f"🔍 Iniciando busca precisa em {debug_arquivo} (offset BOM: {offset_bom})")
+        log_debug(f"   📊 Conteúdo: {len(conteudo_original)} chars")
+        log_debug(f"   📊 Procurado: {len(texto_procurado)} chars")
     
     # ESTRATÉGIA 1: BUSCA DIRETA
     try:
         posicao_direta = conteudo_original.find(texto_procurado)
         if posicao_direta != -1:
             if debug_arquivo:
-                print(f"✅ ESTRATÉGIA 1: Busca direta OK (pos: {posicao_direta} + BOM: {offset_bom})")
+                log_debug(f"✅ ESTRATÉGIA 1: Busca direta OK (pos: {posicao_direta} + BOM: {offset_bom})")
             return {
                 'inicio': posicao_direta + offset_bom,  # 🚨 AJUSTE BOM
                 'fim': posicao_direta + len(texto_procurado) + offset_bom  # 🚨 AJUSTE BOM
             }
     except Exception as e:
         if debug_arquivo:
-            print(f"❌ ESTRATÉGIA 1: Erro na busca direta: {e}")
+            log_debug(f"❌ ESTRATÉGIA 1: Erro na busca direta: {e}")
     
     # ESTRATÉGIA 2: NORMALIZAÇÃO DE QUEBRAS (MELHORADA v2.1.6)
     try:
@@ -369,48 +1234,23 @@ def calcular_posicoes_precisas(conteudo_original: str, texto_procurado: str, deb
         posicao_norm = conteudo_norm.find(texto_norm)
         if posicao_norm != -1:
             if debug_arquivo:
-                print(f"🔧 ESTRATÉGIA 2: Normalização OK (pos normalizada: {posicao_norm})")
+                log_debug(f"🔧 ESTRATÉGIA 2: Normalização OK (pos normalizada: {posicao_norm})")
             
-            # 🆕 MAPEAMENTO PRECISO: Posição normalizada → original
-            contador = 0
-            pos_real = 0
-            
-            for i, char in enumerate(conteudo_original):
-                if contador >= posicao_norm:
-                    pos_real = i
-                    break
-                
-                if char == '\r':
-                    if i + 1 < len(conteudo_original) and conteudo_original[i + 1] == '\n':
-                        # CRLF: pula \r (será contado como \n no próximo)
-                        continue
-                    else:
-                        # CR isolado: conta como 1
-                        contador += 1
-                else:
-                    contador += 1
-            
-            # 🆕 CALCULA FIM BASEADO NO TAMANHO ORIGINAL DO TEXTO
-            chars_mapeados = 0
-            fim_real = pos_real
-            
-            for i in range(pos_real, len(conteudo_original)):
-                if chars_mapeados >= len(texto_procurado):
-                    break
-                fim_real = i + 1
-                chars_mapeados += 1
+            # 🆕 MAPEAMENTO PRECISO: Posição normalizada → original (O(log n) v2.2.0)
+            # O fim vem do trecho normalizado real, não de len(texto_procurado)
+            pos_real, fim_real = MapaOffsetsQuebras(conteudo_original).trecho_original(posicao_norm, len(texto_norm))
             
             if debug_arquivo:
-                print(f"   📍 Pos real mapeada: {pos_real} até {fim_real}")
-                print(f"   🔧 Ajuste BOM: +{offset_bom}")
+                log_debug(f"   📍 Pos real mapeada: {pos_real} até {fim_real}")
+                log_debug(f"   🔧 Ajuste BOM: +{offset_bom}")
                 
                 # Validação do mapeamento
                 texto_extraido = conteudo_original[pos_real:fim_real]
                 texto_extraido_norm = texto_extraido.replace('\r\n', '\n').replace('\r', '\n')
                 if texto_extraido_norm == texto_norm:
-                    print(f"   ✅ Mapeamento validado: textos idênticos após normalização")
+                    log_debug(f"   ✅ Mapeamento validado: textos idênticos após normalização")
                 else:
-                    print(f"   ⚠️ Mapeamento com diferenças pequenas")
+                    log_debug(f"   ⚠️ Mapeamento com diferenças pequenas")
             
             return {
                 'inicio': pos_real + offset_bom,  # 🚨 AJUSTE BOM
@@ -418,34 +1258,57 @@ def calcular_posicoes_precisas(conteudo_original: str, texto_procurado: str, deb
             }
     except Exception as e:
         if debug_arquivo:
-            print(f"❌ ESTRATÉGIA 2: Erro na normalização: {e}")
+            log_debug(f"❌ ESTRATÉGIA 2: Erro na normalização: {e}")
+    
+    # 🆕 ESTRATÉGIA 2B: SEM NENHUM \r (CR isolado removido, mesmo critério do TIPO 6 v2.2.0)
+    try:
+        texto_sem_cr = limpar_carriage_returns(texto_procurado)
+        conteudo_sem_cr = limpar_carriage_returns(conteudo_original)
+        posicao_sem_cr = conteudo_sem_cr.find(texto_sem_cr) if texto_sem_cr else -1
+        if posicao_sem_cr != -1:
+            mapa = MapaOffsetsQuebras(conteudo_original, remover_cr_isolado=True)
+            pos_real, fim_real = mapa.trecho_original(posicao_sem_cr, len(texto_sem_cr))
+            if debug_arquivo:
+                log_debug(f"🔧 ESTRATÉGIA 2B: Sem \\r OK (pos: {pos_real} até {fim_real} + BOM: {offset_bom})")
+            return {
+                'inicio': pos_real + offset_bom,  # 🚨 AJUSTE BOM
+                'fim': fim_real + offset_bom      # 🚨 AJUSTE BOM
+            }
+    except Exception as e:
+        if debug_arquivo:
+            log_debug(f"❌ ESTRATÉGIA 2B: Erro sem \\r: {e}")
     
     # ESTRATÉGIA 3: BUSCA POR ÂNCORAS (com ajuste BOM)
+    # 🆕 Tabela de linhas: acha todas as ocorrências da primeira linha por hash e confere
+    # as linhas seguintes sem espaços nas pontas, então tolera indentação diferente (v2.2.0)
     try:
         linhas = [l.strip() for l in texto_procurado.split('\n') if l.strip()]
         if len(linhas) >= 2:
-            primeira = linhas[0]
-            ultima = linhas[-1]
+            tabela = obter_tabela_linhas(conteudo_original, snapshot)
+            texto_strip = texto_procurado.strip()
+            melhor = None
+            for indice in tabela.localizar_bloco([hash_linha_stripped(linha) for linha in linhas]):
+                inicio = tabela.inicios_texto[indice]
+                fim = tabela.fins_texto[indice + len(linhas) - 1]
+                regiao = conteudo_original[inicio:fim]
+                if [l.strip() for l in regiao.split('\n') if l.strip()] != linhas:
+                    continue  # Colisão de hash
+                if melhor is None or regiao == texto_strip:
+                    melhor = (indice, inicio, fim)
+                if regiao == texto_strip:
+                    break  # Bloco com a mesma indentação do texto procurado tem preferência
             
-            pos_primeira = conteudo_original.find(primeira)
-            if pos_primeira != -1:
-                pos_ultima = conteudo_original.find(ultima, pos_primeira + len(primeira))
-                if pos_ultima != -1:
-                    inicio = max(0, pos_primeira - 50)
-                    fim = min(len(conteudo_original), pos_ultima + len(ultima) + 50)
-                    regiao = conteudo_original[inicio:fim]
-                    
-                    pos_regiao = regiao.find(texto_procurado)
-                    if pos_regiao != -1:
-                        if debug_arquivo:
-                            print(f"⚓ ESTRATÉGIA 3: Âncoras OK (+ BOM: {offset_bom})")
-                        return {
-                            'inicio': inicio + pos_regiao + offset_bom,  # 🚨 AJUSTE BOM
-                            'fim': inicio + pos_regiao + len(texto_procurado) + offset_bom  # 🚨 AJUSTE BOM
-                        }
+            if melhor is not None:
+                indice, inicio, fim = melhor
+                if debug_arquivo:
+                    log_debug(f"⚓ ESTRATÉGIA 3: Âncoras OK nas linhas {tabela.numeros[indice]}-{tabela.numeros[indice + len(linhas) - 1]} (+ BOM: {offset_bom})")
+                return {
+                    'inicio': inicio + offset_bom,  # 🚨 AJUSTE BOM
+                    'fim': fim + offset_bom  # 🚨 AJUSTE BOM
+                }
     except Exception as e:
         if debug_arquivo:
-            print(f"❌ ESTRATÉGIA 3: Erro nas âncoras: {e}")
+            log_debug(f"❌ ESTRATÉGIA 3: Erro nas âncoras: {e}")
     
     # ESTRATÉGIA 4: STRIP
     try:
@@ -454,25 +1317,27 @@ def calcular_posicoes_precisas(conteudo_original: str, texto_procurado: str, deb
             pos_strip = conteudo_original.find(texto_strip)
             if pos_strip != -1:
                 if debug_arquivo:
-                    print(f"✂️ ESTRATÉGIA 4: Strip OK (+ BOM: {offset_bom})")
+                    log_debug(f"✂️ ESTRATÉGIA 4: Strip OK (+ BOM: {offset_bom})")
                 return {
                     'inicio': pos_strip + offset_bom,  # 🚨 AJUSTE BOM
                     'fim': pos_strip + len(texto_strip) + offset_bom  # 🚨 AJUSTE BOM
                 }
     except Exception as e:
         if debug_arquivo:
-            print(f"❌ ESTRATÉGIA 4: Erro no strip: {e}")
+            log_debug(f"❌ ESTRATÉGIA 4: Erro no strip: {e}")
     
     if debug_arquivo:
-        print(f"❌ TODAS ESTRATÉGIAS FALHARAM para {debug_arquivo}")
+        log_debug(f"❌ TODAS ESTRATÉGIAS FALHARAM para {debug_arquivo}")
     
     return None
 
-def validar_posicoes_com_bom(conteudo_original: str, posicoes: Dict[str, int], texto_esperado: str, caminho_arquivo: str, debug_arquivo: str = "") -> bool:
+def validar_posicoes_com_bom(conteudo_original: str, posicoes: Dict[str, int], texto_esperado: str, caminho_arquivo: str, debug_arquivo: str = "", snapshot: Optional[SnapshotArquivo] = None) -> bool:
     """🆕 Valida posições considerando offset BOM"""
     # Detecta offset BOM
     offset_bom = 0
-    if caminho_arquivo and os.path.exists(caminho_arquivo):
+    if snapshot is not None:
+        offset_bom = snapshot.offset_bom
+    elif caminho_arquivo and os.path.exists(caminho_arquivo):
         info_encoding = detectar_bom_e_encoding(caminho_arquivo)
         if info_encoding['has_bom'] and 'utf-8' in info_encoding['detected'].lower():
             offset_bom = info_encoding['bom_size']
@@ -484,7 +1349,7 @@ def validar_posicoes_com_bom(conteudo_original: str, posicoes: Dict[str, int], t
     # Verificações básicas
     if inicio < 0 or fim > len(conteudo_original) or inicio >= fim:
         if debug_arquivo:
-            print(f"❌ Validação FALHOU para {debug_arquivo}: limites inválidos (ajustados para BOM: -{offset_bom})")
+            log_debug(f"❌ Validação FALHOU para {debug_arquivo}: limites inválidos (ajustados para BOM: -{offset_bom})")
         return False
     
     # Extrai o texto nas posições calculadas
@@ -493,7 +1358,7 @@ def validar_posicoes_com_bom(conteudo_original: str, posicoes: Dict[str, int], t
     # 🔍 VALIDAÇÃO RIGOROSA
     if texto_extraido == texto_esperado:
         if debug_arquivo:
-            print(f"✅ Validação OK para {debug_arquivo}: textos idênticos (com ajuste BOM: +{offset_bom})")
+            log_debug(f"✅ Validação OK para {debug_arquivo}: textos idênticos (com ajuste BOM: +{offset_bom})")
         return True
     
     # 🔧 VALIDAÇÃO FLEXÍVEL PARA QUEBRAS DE LINHA
@@ -502,7 +1367,7 @@ def validar_posicoes_com_bom(conteudo_original: str, posicoes: Dict[str, int], t
     
     if texto_extraido_norm == texto_esperado_norm:
         if debug_arquivo:
-            print(f"✅ Validação OK para {debug_arquivo}: textos idênticos após normalização (BOM: +{offset_bom})")
+            log_debug(f"✅ Validação OK para {debug_arquivo}: textos idênticos após normalização (BOM: +{offset_bom})")
         return True
     
     # 🆕 VALIDAÇÃO FLEXÍVEL PARA U+000D
@@ -511,257 +1376,924 @@ def validar_posicoes_com_bom(conteudo_original: str, posicoes: Dict[str, int], t
     
     if texto_extraido_sem_cr == texto_esperado_sem_cr:
         if debug_arquivo:
-            print(f"✅ Validação OK para {debug_arquivo}: textos idênticos após remover \\r (BOM: +{offset_bom})")
+            log_debug(f"✅ Validação OK para {debug_arquivo}: textos idênticos após remover \\r (BOM: +{offset_bom})")
         return True
     
     if debug_arquivo:
-        print(f"❌ Validação FALHOU para {debug_arquivo}: textos diferentes (mesmo com ajuste BOM: +{offset_bom})")
-        print(f"   📝 Extraído: {repr(texto_extraido[:50])}")
-        print(f"   📝 Esperado: {repr(texto_esperado[:50])}")
+        log_debug(f"❌ Validação FALHOU para {debug_arquivo}: textos diferentes (mesmo com ajuste BOM: +{offset_bom})")
+        log_debug(f"   📝 Extraído: {repr(texto_extraido[:50])}")
+        log_debug(f"   📝 Esperado: {repr(texto_esperado[:50])}")
     
     return False
 
 # ═══════════════════════════════════════════════════════════════════════════════
-# 🔧 FUNÇÕES DE BUSCA ATUALIZADAS
+# 🆕 CONSULTA PRÉ-PROCESSADA E VARREDURA DE ARQUIVOS (v2.2.0)
 # ═══════════════════════════════════════════════════════════════════════════════
 
-def tipo1_comparacao_literal(texto_copiado):
-    """TIPO 1: Comparação 100% literal - NADA é removido"""
-    print("🔍 TIPO 1: COMPARAÇÃO 100% LITERAL (v2.1.6 - CORREÇÃO COMPLETA)")
-    print("Regra: texto_copiado in conteudo_arquivo")
-    
-    for raiz, _, arquivos in os.walk(PASTA_BASE):
-        for arquivo in arquivos:
-            ext = os.path.splitext(arquivo)[1].lower()
-            if ext in EXTENSOES_NEGADAS or eh_arquivo_backup(arquivo):
-                continue
-                
-            caminho_arquivo = os.path.join(raiz, arquivo)
-            conteudo = ler_arquivo(caminho_arquivo)
-            
-            if texto_copiado in conteudo:
-                print(f"✅ OK - {arquivo}")
-                
-                # 🚨 PASSA CAMINHO PARA CORREÇÃO BOM
-                posicoes = calcular_posicoes_precisas(conteudo, texto_copiado, arquivo, caminho_arquivo)
-                if not posicoes:
-                    print(f"❌ Erro ao calcular posições para {arquivo}")
-                    continue
-                
-                if not validar_posicoes_com_bom(conteudo, posicoes, texto_copiado, caminho_arquivo, arquivo):
-                    print(f"❌ Validação falhou para {arquivo}")
-                    continue
-                
-                contexto_inicio = max(0, posicoes['inicio'] - 50)
-                contexto_fim = min(len(conteudo) + 3, posicoes['fim'] + 50)  # +3 para BOM
-                
-                arquivo_info = {
-                    'nome': arquivo,
-                    'caminho': caminho_arquivo,
-                    'inicio': posicoes['inicio'],
-                    'fim': posicoes['fim'],
-                    'tamanho': len(texto_copiado),
-                    'texto_original': texto_copiado,
-                    'contexto_inicio': contexto_inicio,
-                    'contexto_fim': contexto_fim,
-                    'contexto_texto': conteudo[max(0, contexto_inicio-3):contexto_fim-3]  # Ajuste contexto
-                }
-                
-                adicionar_resultado_global(1, arquivo_info)
-                return
+# 🆕 ORDEM DE EXECUÇÃO DOS TIPOS E TIPOS QUE PARAM NO PRIMEIRO ARQUIVO (v2.2.0)
+TIPOS_ORDEM_EXECUCAO = (1, 2, 3, 4, 5, 6)
+TIPOS_PRIMEIRO_MATCH = {1, 2, 4}
+
+@dataclass
+class ConsultaBusca:
+    """🆕 Texto copiado pré-processado uma única vez para todos os TIPOS (v2.2.0)"""
+    texto_copiado: str
+    texto_normalizado: str
+    texto_stripped: str
+    texto_sem_cr: str
+    ancora_inicial: Optional[str]
+    ancora_meio: Optional[str]
+    ancora_final: Optional[str]
+    linha_meio_normalizada: Optional[str]
+    limite_similaridade: float
+    agulhas_bytes: Dict[str, Optional[bytes]] = field(default_factory=dict)
+    linhas_consulta: List[str] = field(default_factory=list)  # 🆕 Linhas não vazias, sem espaços nas pontas (TIPO 5)
+    hashes_linhas_consulta: List[int] = field(default_factory=list)  # 🆕 hash_linha_stripped de cada uma
+    perfil_similaridade: Optional[Tuple[str, str, set, set]] = None  # 🆕 Lado do texto copiado na similaridade do TIPO 5
+    todas_ocorrencias: bool = False  # 🆕 Viaja junto para os workers (spawn não herda globais)
+
+def preparar_consulta(texto_copiado, limite_similaridade=LIMITE_SIMILARIDADE_TIPO5, todas_ocorrencias=None) -> ConsultaBusca:
+    """🆕 Calcula normalizações e âncoras do texto copiado uma única vez (v2.2.0)"""
+    ancora_inicial, ancora_meio, ancora_final = extrair_ancoras(texto_copiado)
+    linhas_consulta = [linha.strip() for linha in texto_copiado.split('\n') if linha.strip()]
+    if todas_ocorrencias is None:
+        todas_ocorrencias = BUSCAR_TODAS_OCORRENCIAS
     
-    print("❌ FAIL")
+    return ConsultaBusca(
+        texto_copiado=texto_copiado,
+        texto_normalizado=texto_copiado.replace('\r\n', '\n'),
+        texto_stripped=texto_copiado.strip(),
+        texto_sem_cr=limpar_carriage_returns(texto_copiado),
+        ancora_inicial=ancora_inicial,
+        ancora_meio=ancora_meio,
+        ancora_final=ancora_final,
+        linha_meio_normalizada=ancora_meio.replace('\r\n', '\n') if ancora_meio else None,
+        limite_similaridade=limite_similaridade,
+        agulhas_bytes=preparar_agulhas_bytes(texto_copiado),
+        linhas_consulta=linhas_consulta,
+        hashes_linhas_consulta=[hash_linha_stripped(linha) for linha in linhas_consulta],
+        perfil_similaridade=perfil_similaridade(texto_copiado),
+        todas_ocorrencias=todas_ocorrencias
+    )
 
-def tipo2_comparacao_arquivo_completo(texto_copiado):
-    """TIPO 2: Arquivo completo deve ser igual ao texto copiado"""
-    print("🔍 TIPO 2: ARQUIVO COMPLETO IGUAL AO TEXTO")
-    print("Regra: texto_copiado == conteudo_arquivo")
+def converter_glob_ignore_para_regex(padrao: str) -> str:
+    """🆕 Converte um padrão do .gitignore (*, ?, [..], **) em regex sobre caminho com "/" (v2.2.0)"""
+    partes = []
+    i = 0
+    while i < len(padrao):
+        if padrao.startswith('**/', i):
+            partes.append('(?:.*/)?')
+            i += 3
+        elif padrao.startswith('**', i):
+            partes.append('.*')
+            i += 2
+        elif padrao[i] == '*':
+            partes.append('[^/]*')
+            i += 1
+        elif padrao[i] == '?':
+            partes.append('[^/]')
+            i += 1
+        elif padrao[i] == '[' and ']' in padrao[i + 2:]:
+            fim = padrao.index(']', i + 2)
+            classe = padrao[i + 1:fim]
+            if classe.startswith('!'):
+                classe = '^' + classe[1:]
+            partes.append('[' + classe.replace('\\', '\\\\') + ']')
+            i = fim + 1
+        else:
+            partes.append(re.escape(padrao[i]))
+            i += 1
+    return ''.join(partes)
+
+def carregar_regras_ignore(pasta: str, prefixo_relativo: str, nomes_presentes) -> List[Tuple[Any, bool, bool]]:
+    """🆕 Lê .gitignore/.pastesearchignore de uma pasta: [(regex, negacao, so_pasta)] (v2.2.0)
     
-    for raiz, _, arquivos in os.walk(PASTA_BASE):
-        for arquivo in arquivos:
-            ext = os.path.splitext(arquivo)[1].lower()
-            if ext in EXTENSOES_NEGADAS or eh_arquivo_backup(arquivo):
+    Os regex casam com o caminho relativo à PASTA_BASE (separador "/"), já
+    restritos à subárvore da pasta onde o arquivo de ignore está.
+    """
+    regras = []
+    for nome_ignore in ARQUIVOS_IGNORE:
+        if nome_ignore not in nomes_presentes:
+            continue
+        try:
+            with open(os.path.join(pasta, nome_ignore), 'r', encoding='utf-8', errors='replace') as f:
+                linhas = f.read().splitlines()
+        except OSError:
+            continue
+        
+        for linha in linhas:
+            linha = linha.rstrip()
+            if not linha or linha.startswith('#'):
                 continue
-                
-            caminho_arquivo = os.path.join(raiz, arquivo)
-            conteudo = ler_arquivo(caminho_arquivo)
             
-            if texto_copiado == conteudo:
-                print(f"✅ OK - {arquivo}")
-                
-                arquivo_info = {
-                    'nome': arquivo,
-                    'caminho': caminho_arquivo,
-                    'inicio': 0,
-                    'fim': len(conteudo),
-                    'tamanho': len(texto_copiado),
-                    'texto_original': texto_copiado,
-                    'contexto_inicio': 0,
-                    'contexto_fim': len(conteudo),
-                    'contexto_texto': conteudo
-                }
-                
-                adicionar_resultado_global(2, arquivo_info)
-                return
-    
-    print("❌ FAIL")
+            negacao = linha.startswith('!')
+            if negacao:
+                linha = linha[1:]
+            elif linha.startswith('\\'):
+                linha = linha[1:]  # \# e \! literais
+            
+            so_pasta = linha.endswith('/')
+            linha = linha.rstrip('/')
+            
+            # Com "/" no meio ou no início o padrão é ancorado na pasta do arquivo de ignore
+            # (a "/" final só marca pasta, então é removida antes)
+            ancorado = '/' in linha
+            linha = linha.lstrip('/')
+            if not linha:
+                continue
+            corpo = converter_glob_ignore_para_regex(linha)
+            if not ancorado:
+                corpo = '(?:.*/)?' + corpo
+            regras.append((re.compile(re.escape(prefixo_relativo) + corpo + '$'), negacao, so_pasta))
+    return regras
 
-def tipo3_comparacao_quebras_normalizadas(texto_copiado):
-    """🔧 TIPO 3: Normaliza quebras de linha \\r\\n para \\n"""
-    print("🔍 TIPO 3: QUEBRAS DE LINHA NORMALIZADAS (v2.1.6 - CORREÇÃO COMPLETA)")
-    print("Regra: normaliza \\r\\n para \\n, depois texto_copiado in conteudo")
+def caminho_ignorado(regras, caminho_relativo: str, eh_pasta: bool) -> bool:
+    """🆕 Como no git: a última regra que casa decide; "!" reinclui (v2.2.0)"""
+    ignorado = False
+    for regex, negacao, so_pasta in regras:
+        if so_pasta and not eh_pasta:
+            continue
+        if regex.match(caminho_relativo):
+            ignorado = not negacao
+    return ignorado
+
+def iterar_entradas_pasta_base():
+    """🆕 Percorre PASTA_BASE com os.scandir na mesma ordem do os.walk (v2.2.0)
     
-    texto_normalizado = texto_copiado.replace('\r\n', '\n')
-    arquivos_encontrados = 0
+    Pastas de DIRETORIOS_NEGADOS e as ignoradas por .gitignore/.pastesearchignore
+    são podadas sem descer nelas. Gera os os.DirEntry dos arquivos que passam nos
+    filtros de extensão, backup e ignore;
+    entrada.stat() reaproveita o que o scandir já leu (no Windows, sem syscall extra).
+    """
+    diretorios_negados = {nome.casefold() for nome in DIRETORIOS_NEGADOS}
     
-    for raiz, _, arquivos in os.walk(PASTA_BASE):
-        for arquivo in arquivos:
-            ext = os.path.splitext(arquivo)[1].lower()
-            if ext in EXTENSOES_NEGADAS or eh_arquivo_backup(arquivo):
-                continue
-                
-            caminho_arquivo = os.path.join(raiz, arquivo)
-            conteudo_original = ler_arquivo(caminho_arquivo)
-            conteudo_normalizado = conteudo_original.replace('\r\n', '\n')
+    # Cada item: (pasta, caminho relativo com "/", regras de ignore herdadas)
+    pastas = [(PASTA_BASE, '', [])]
+    while pastas:
+        pasta, relativo, regras_herdadas = pastas.pop()
+        try:
+            with os.scandir(pasta) as iterador:
+                entradas = list(iterador)
+        except OSError:
+            continue
+        
+        regras = regras_herdadas
+        if USAR_ARQUIVOS_IGNORE:
+            regras_pasta = carregar_regras_ignore(pasta, relativo, {entrada.name for entrada in entradas})
+            if regras_pasta:
+                regras = regras_herdadas + regras_pasta
+        
+        subpastas = []
+        for entrada in entradas:
+            try:
+                eh_pasta = entrada.is_dir()
+            except OSError:
+                eh_pasta = False
             
-            if texto_normalizado in conteudo_normalizado:
-                print(f"🔍 Calculando posições precisas para {arquivo}...")
-                
-                # 🚨 PASSA CAMINHO PARA CORREÇÃO BOM
-                posicoes = calcular_posicoes_precisas(conteudo_original, texto_copiado, arquivo, caminho_arquivo)
-                if not posicoes:
-                    print(f"❌ Erro ao calcular posições para {arquivo}")
+            if eh_pasta:
+                # 🆕 Poda: pastas negadas ou ignoradas nem chegam a ser listadas
+                if entrada.name.casefold() in diretorios_negados:
                     continue
-                
-                if not validar_posicoes_com_bom(conteudo_original, posicoes, texto_copiado, caminho_arquivo, arquivo):
-                    print(f"❌ Validação falhou para {arquivo}")
+                if regras and caminho_ignorado(regras, relativo + entrada.name, True):
                     continue
-                
-                contexto_inicio = max(0, posicoes['inicio'] - 50)
-                contexto_fim = min(len(conteudo_original) + 3, posicoes['fim'] + 50)  # +3 para BOM
-                contexto_texto = conteudo_original[max(0, contexto_inicio-3):contexto_fim-3]  # Ajuste contexto
-                
-                arquivo_info = {
-                    'nome': arquivo,
-                    'caminho': caminho_arquivo,
-                    'inicio': posicoes['inicio'],
-                    'fim': posicoes['fim'],
-                    'tamanho': len(texto_copiado),
-                    'texto_original': texto_copiado,
-                    'contexto_inicio': contexto_inicio,
-                    'contexto_fim': contexto_fim,
-                    'contexto_texto': contexto_texto
-                }
-                
-                adicionar_resultado_global(3, arquivo_info)
-                arquivos_encontrados += 1
-                print(f"✅ ENCONTRADO - {arquivo}")
+                # Igual ao os.walk(followlinks=False): links para pastas não são seguidos
+                if not entrada.is_symlink():
+                    subpastas.append((entrada.path, relativo + entrada.name + '/', regras))
+                continue
+            
+            ext = os.path.splitext(entrada.name)[1].lower()
+            if ext in EXTENSOES_NEGADAS or eh_arquivo_backup(entrada.name):
+                continue
+            if regras and caminho_ignorado(regras, relativo + entrada.name, False):
+                continue
+            
+            contar_metrica('arquivos_percorridos')
+            yield entrada
+        
+        # Pré-ordem: arquivos da pasta primeiro, depois as subpastas na ordem listada
+        pastas.extend(reversed(subpastas))
+
+def iterar_arquivos_pasta_base():
+    """🆕 Percorre PASTA_BASE uma única vez aplicando os filtros de extensão e backup (v2.2.0)"""
+    for entrada in iterar_entradas_pasta_base():
+        yield entrada.name, entrada.path
+
+def coletar_stats_pasta_base() -> List[Tuple[str, str, int, int]]:
+    """🆕 Lista (nome, caminho, mtime_ns, tamanho) de todos os arquivos, sem ler conteúdo (v2.2.0)"""
+    arquivos = []
+    for entrada in iterar_entradas_pasta_base():
+        try:
+            stat_arquivo = entrada.stat()
+        except OSError:
+            continue
+        arquivos.append((entrada.name, entrada.path, stat_arquivo.st_mtime_ns, stat_arquivo.st_size))
+    return arquivos
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# 🆕 MOTOR DE BUSCA EM BYTES COM MMAP - TIPO 1 E TIPO 2 (v2.2.0)
+# ═══════════════════════════════════════════════════════════════════════════════
+
+TIPOS_BUSCA_BYTES = {1, 2}
+BYTES_CONTINUACAO_UTF8 = bytes(range(0x80, 0xC0))
+BLOCO_CONTAGEM_BYTES = 1024 * 1024
+JANELA_CONTEXTO_BYTES = 256  # >= 53 caracteres mesmo com UTF-8 de 4 bytes
+
+def preparar_agulhas_bytes(texto: str) -> Dict[str, Optional[bytes]]:
+    """🆕 Codifica o texto copiado uma vez para cada encoding candidato (v2.2.0)
     
-    if arquivos_encontrados > 0:
-        print(f"\n🎯 RESUMO TIPO3: Texto encontrado em {arquivos_encontrados} arquivo(s)")
+    utf-8 e utf-8-sig usam a mesma agulha (o BOM só desloca o início);
+    None significa que o texto não é representável naquele encoding.
+    """
+    agulhas = {}
+    for encoding in ('utf-8', 'latin-1'):
+        try:
+            agulhas[encoding] = texto.encode(encoding)
+        except UnicodeEncodeError:
+            agulhas[encoding] = None
+    return agulhas
+
+def contar_caracteres_em_bytes(dados, inicio: int, fim: int, encoding: str) -> int:
+    """🆕 Quantos caracteres o trecho vira ao ser lido em modo texto (\r\n conta como 1) (v2.2.0)"""
+    total = 0
+    pos = inicio
+    while pos < fim:
+        bloco = dados[pos:min(fim, pos + BLOCO_CONTAGEM_BYTES)]
+        if encoding == 'utf-8':
+            total += len(bloco.translate(None, BYTES_CONTINUACAO_UTF8))
+        else:
+            total += len(bloco)
+        total -= bloco.count(b'\r\n')
+        pos += len(bloco)
+        
+        # \r\n cortado na fronteira entre dois blocos
+        if pos < fim and dados[pos - 1:pos + 1] == b'\r\n':
+            total -= 1
+    return total
+
+def decodificar_trecho_bytes(dados, inicio: int, fim: int, encoding: str, final: bool = False) -> str:
+    """🆕 Decodifica só uma pequena região, com a mesma tradução de quebras do modo texto (v2.2.0)"""
+    trecho = dados[inicio:fim]
+    if encoding == 'utf-8':
+        # Alinha no início de um caractere e descarta caractere cortado no fim
+        descartar = 0
+        while descartar < len(trecho) and 0x80 <= trecho[descartar] < 0xC0:
+            descartar += 1
+        texto = codecs.getincrementaldecoder('utf-8')(errors='replace').decode(trecho[descartar:], final)
     else:
-        print("❌ FAIL")
+        texto = trecho.decode(encoding, errors='replace')
+    return texto.replace('\r\n', '\n').replace('\r', '\n')
 
-def tipo4_comparacao_strip_aplicado(texto_copiado):
-    """TIPO 4: Remove espaços do início e fim (.strip())"""
-    print("🔍 TIPO 4: COM STRIP NAS PONTAS (v2.1.6 - CORREÇÃO COMPLETA)")
-    print("Regra: aplica .strip() em ambos, depois texto_copiado in conteudo")
+def buscar_tipos_em_bytes(consulta: ConsultaBusca, tipos, arquivo: str, caminho_arquivo: str, dados, tamanho: int) -> Optional[List[Tuple[int, Dict[str, Any]]]]:
+    """🆕 TIPO 1 e TIPO 2 direto nos bytes mapeados; None = precisa do caminho em texto (v2.2.0)"""
+    texto_copiado = consulta.texto_copiado
+    contar_metrica('chamadas_deteccao_encoding')
+    info_encoding = detectar_bom_e_encoding_em_bytes(dados[:TAMANHO_AMOSTRA_ENCODING + 1])
+    encoding = 'utf-8' if info_encoding['encoding'] in ('utf-8', 'utf-8-sig') else info_encoding['encoding']
     
-    texto_stripped = texto_copiado.strip()
+    if encoding not in consulta.agulhas_bytes or not texto_copiado:
+        return None  # UTF-16 e casos triviais seguem pelo caminho em texto
     
-    for raiz, _, arquivos in os.walk(PASTA_BASE):
-        for arquivo in arquivos:
-            ext = os.path.splitext(arquivo)[1].lower()
-            if ext in EXTENSOES_NEGADAS or eh_arquivo_backup(arquivo):
-                continue
-                
-            caminho_arquivo = os.path.join(raiz, arquivo)
-            conteudo = ler_arquivo(caminho_arquivo)
-            conteudo_stripped = conteudo.strip()
+    agulha = consulta.agulhas_bytes[encoding]
+    if agulha is None or '\r' in texto_copiado:
+        # Conteúdo lido em modo texto nunca contém \r, e o texto não cabe nesse encoding
+        return []
+    
+    offset_bom = info_encoding['bom_size'] if info_encoding['has_bom'] else 0
+    tem_cr = dados.find(b'\r', offset_bom) != -1
+    if tem_cr and b'\n' in agulha:
+        return None  # quebras \r\n / \r precisam da tradução do modo texto
+    
+    # 🆕 Mesmo critério do SnapshotArquivo: sem BOM, UTF-8 vale só se o arquivo inteiro for válido.
+    # Agulha ASCII ausente não casa em nenhum dos dois encodings, então pula a validação.
+    if info_encoding['encoding'] == 'utf-8':
+        agulha_ascii = agulha == consulta.agulhas_bytes.get('latin-1')
+        if not (agulha_ascii and dados.find(agulha) == -1) and not utf8_valido_em_bytes(dados):
+            encoding = 'latin-1'
+            agulha = consulta.agulhas_bytes['latin-1']
+            if agulha is None:
+                return []
+    
+    acertos = []
+    
+    if 1 in tipos:
+        pos_byte = dados.find(agulha, offset_bom)
+        pos_char = 0
+        byte_contado = offset_bom
+        
+        # 🆕 Modo --todas: continua o find a partir do fim do acerto anterior (sem sobreposição)
+        while pos_byte != -1:
+            log_debug(f"✅ OK - {arquivo} (busca em bytes)")
+            pos_char += contar_caracteres_em_bytes(dados, byte_contado, pos_byte, encoding)
+            byte_contado = pos_byte
+            fim_byte = pos_byte + len(agulha)
+            fim_janela = min(tamanho, fim_byte + JANELA_CONTEXTO_BYTES)
             
-            if texto_stripped in conteudo_stripped:
-                print(f"✅ OK - {arquivo}")
-                
-                # 🚨 PASSA CAMINHO PARA CORREÇÃO BOM
-                posicoes = calcular_posicoes_precisas(conteudo, texto_copiado, arquivo, caminho_arquivo)
-                if not posicoes:
-                    posicoes_stripped = calcular_posicoes_precisas(conteudo, texto_stripped, arquivo, caminho_arquivo)
-                    if posicoes_stripped:
-                        posicoes = posicoes_stripped
-                    else:
-                        print(f"❌ Erro ao calcular posições para {arquivo}")
+            antes = decodificar_trecho_bytes(dados, max(offset_bom, pos_byte - JANELA_CONTEXTO_BYTES), pos_byte, encoding)
+            depois = decodificar_trecho_bytes(dados, fim_byte, fim_janela, encoding, final=fim_janela >= tamanho)
+            
+            inicio = pos_char + offset_bom
+            fim = inicio + len(texto_copiado)
+            contexto_inicio = max(0, inicio - 50)
+            if fim_janela >= tamanho:
+                tamanho_conteudo = pos_char + len(texto_copiado) + len(depois)
+                contexto_fim = min(tamanho_conteudo + 3, fim + 50)  # +3 para BOM
+            else:
+                contexto_fim = fim + 50
+            
+            # Mesmo recorte de conteudo[max(0, contexto_inicio-3):contexto_fim-3] do caminho em texto
+            chars_antes = pos_char - max(0, contexto_inicio - 3)
+            chars_depois = (contexto_fim - 3) - (pos_char + len(texto_copiado))
+            contexto_texto = antes[len(antes) - chars_antes:] + texto_copiado + depois[:max(0, chars_depois)]
+            
+            acertos.append((1, {
+                'nome': arquivo,
+                'caminho': caminho_arquivo,
+                'inicio': inicio,
+                'fim': fim,
+                'tamanho': len(texto_copiado),
+                'texto_original': texto_copiado,
+                'contexto_inicio': contexto_inicio,
+                'contexto_fim': contexto_fim,
+                'contexto_texto': contexto_texto
+            }))
+            
+            if not consulta.todas_ocorrencias:
+                break
+            pos_byte = dados.find(agulha, fim_byte)
+    
+    if 2 in tipos:
+        if not tem_cr and tamanho - offset_bom == len(agulha) and dados[offset_bom:tamanho] == agulha:
+            log_debug(f"✅ OK - {arquivo} (busca em bytes)")
+            acertos.append((2, {
+                'nome': arquivo,
+                'caminho': caminho_arquivo,
+                'inicio': 0,
+                'fim': len(texto_copiado),
+                'tamanho': len(texto_copiado),
+                'texto_original': texto_copiado,
+                'contexto_inicio': 0,
+                'contexto_fim': len(texto_copiado),
+                'contexto_texto': texto_copiado
+            }))
+    
+    return acertos
+
+def verificar_tipos_bytes_arquivo(consulta: ConsultaBusca, tipos, arquivo: str, caminho_arquivo: str,
+                                  estatisticas: Optional[EstatisticasVarredura] = None) -> Optional[List[Tuple[int, Dict[str, Any]]]]:
+    """🆕 Abre o arquivo com mmap e roda TIPO 1/TIPO 2 sem decodificar o conteúdo inteiro (v2.2.0)"""
+    try:
+        with open(caminho_arquivo, 'rb') as f:
+            tamanho = os.fstat(f.fileno()).st_size
+            if tamanho == 0:
+                return None
+            motivo = motivo_para_ignorar_arquivo(tamanho)
+            if motivo == 'grande' and USAR_BUSCA_STREAMING:
+                return None  # Fica para a busca em fluxo
+            if motivo is not None:
+                if estatisticas is not None:
+                    estatisticas.registrar_ignorado(motivo, tamanho)
+                return []
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as dados:
+                # 🆕 Binário detectado pelo primeiro bloco: nada do resto é tocado
+                motivo = motivo_para_ignorar_arquivo(tamanho, dados[:TAMANHO_BLOCO_DETECCAO_BINARIO])
+                if motivo is not None:
+                    if estatisticas is not None:
+                        estatisticas.registrar_ignorado(motivo, tamanho)
+                    return []
+                if estatisticas is not None:
+                    estatisticas.arquivos_lidos += 1
+                contar_metrica('bytes_lidos', tamanho)
+                return buscar_tipos_em_bytes(consulta, tipos, arquivo, caminho_arquivo, dados, tamanho)
+    except (OSError, ValueError):
+        return None
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# 🆕 ÍNDICE INVERTIDO DE TRIGRAMAS SOBRE A PASTA_BASE (v2.2.0)
+# ═══════════════════════════════════════════════════════════════════════════════
+
+VERSAO_INDICE_TRIGRAMAS = 2  # PRAGMA user_version do sessionlinner_indice.db
+TIPOS_PODA_EXATA = {1, 2, 3, 4, 6}
+
+def extrair_trigramas(texto: str) -> set:
+    """🆕 Conjunto de trigramas de um texto já sem \\r (v2.2.0)"""
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+class IndiceTrigramas:
+    """🆕 Índice persistente trigrama → ids de arquivos, montado do conteúdo sem \\r (v2.2.0)
+    
+    Vale para TIPO 1, 2, 3, 4 e 6 (todos exigem o texto limpo como substring) e,
+    pela âncora inicial, para o TIPO 5. A ordem dos ids é a ordem do os.walk.
+    """
+    
+    def __init__(self, pasta_base: str):
+        self.pasta_base = pasta_base
+        self.criado_em = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self.arquivos: List[Optional[Tuple[str, str, int, int]]] = []  # (nome, caminho, mtime_ns, tamanho)
+        self.por_caminho: Dict[str, int] = {}
+        self.postings: Dict[str, array] = {}
+    
+    def adicionar_arquivo(self, arquivo: str, caminho_arquivo: str, mtime_ns: int, tamanho: int, conteudo: str):
+        """Indexa um arquivo com o conteúdo já lido (via ler_arquivo) e o stat anterior à leitura"""
+        id_arquivo = len(self.arquivos)
+        self.arquivos.append((arquivo, caminho_arquivo, mtime_ns, tamanho))
+        self.por_caminho[caminho_arquivo] = id_arquivo
+        
+        postings = self.postings
+        for trigrama in extrair_trigramas(limpar_carriage_returns(conteudo)):
+            lista = postings.get(trigrama)
+            if lista is None:
+                postings[trigrama] = array('I', (id_arquivo,))
+            else:
+                lista.append(id_arquivo)
+    
+    def remover_arquivo(self, caminho_arquivo: str):
+        """🆕 Marca o id como removido; as listas são limpas na próxima compactação"""
+        id_arquivo = self.por_caminho.pop(caminho_arquivo, None)
+        if id_arquivo is not None:
+            self.arquivos[id_arquivo] = None
+    
+    def total_removidos(self) -> int:
+        return len(self.arquivos) - len(self.por_caminho)
+    
+    def compactar(self):
+        """🆕 Renumera os ids ativos e descarta os removidos das listas de trigramas"""
+        novos_ids = {}
+        arquivos = []
+        for id_antigo, entrada in enumerate(self.arquivos):
+            if entrada is not None:
+                novos_ids[id_antigo] = len(arquivos)
+                arquivos.append(entrada)
+        
+        postings = {}
+        for trigrama, lista in self.postings.items():
+            nova_lista = array('I', (novos_ids[i] for i in lista if i in novos_ids))
+            if nova_lista:
+                postings[trigrama] = nova_lista
+        
+        self.arquivos = arquivos
+        self.por_caminho = {entrada[1]: id_arquivo for id_arquivo, entrada in enumerate(arquivos)}
+        self.postings = postings
+    
+    def construir(self):
+        """Varre a PASTA_BASE inteira uma vez e indexa todos os arquivos"""
+        self.atualizar(coletar_stats_pasta_base())
+    
+    def atualizar(self, stats_atuais: List[Tuple[str, str, int, int]]) -> Tuple[int, int, int]:
+        """🆕 Reindexa só o que mudou de (mtime, tamanho); retorna (novos, alterados, removidos)"""
+        vistos = set()
+        novos = alterados = 0
+        
+        abriu_cache = cache_conteudo_ativo is None
+        abrir_cache_conteudo()
+        try:
+            for arquivo, caminho_arquivo, mtime_ns, tamanho in stats_atuais:
+                vistos.add(caminho_arquivo)
+                id_arquivo = self.por_caminho.get(caminho_arquivo)
+                if id_arquivo is not None:
+                    entrada = self.arquivos[id_arquivo]
+                    if (entrada[2], entrada[3]) == (mtime_ns, tamanho):
                         continue
-                
-                contexto_inicio = max(0, posicoes['inicio'] - 50)
-                contexto_fim = min(len(conteudo) + 3, posicoes['fim'] + 50)  # +3 para BOM
-                
-                arquivo_info = {
-                    'nome': arquivo,
-                    'caminho': caminho_arquivo,
-                    'inicio': posicoes['inicio'],
-                    'fim': posicoes['fim'],
-                    'tamanho': len(texto_copiado),
-                    'texto_original': texto_copiado,
-                    'contexto_inicio': contexto_inicio,
-                    'contexto_fim': contexto_fim,
-                    'contexto_texto': conteudo[max(0, contexto_inicio-3):contexto_fim-3]  # Ajuste contexto
-                }
-                
-                adicionar_resultado_global(4, arquivo_info)
+                    self.remover_arquivo(caminho_arquivo)
+                    alterados += 1
+                else:
+                    novos += 1
+                # 🆕 Binários/grandes entram sem trigramas: nunca viram candidatos
+                snapshot = carregar_snapshot(caminho_arquivo, classificar=True)
+                conteudo = snapshot.conteudo if snapshot is not None else ""
+                self.adicionar_arquivo(arquivo, caminho_arquivo, mtime_ns, tamanho, conteudo)
+        finally:
+            if abriu_cache:
+                fechar_cache_conteudo()
+        
+        removidos_agora = [caminho for caminho in self.por_caminho if caminho not in vistos]
+        for caminho_arquivo in removidos_agora:
+            self.remover_arquivo(caminho_arquivo)
+        
+        if self.total_removidos() > max(100, len(self.por_caminho) // 4):
+            self.compactar()
+        
+        if novos or alterados or removidos_agora:
+            self.criado_em = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        return novos, alterados, len(removidos_agora)
+    
+    def ids_candidatos(self, texto: str) -> Optional[set]:
+        """Ids que contêm todos os trigramas do texto; None = texto curto demais para podar"""
+        trigramas = extrair_trigramas(limpar_carriage_returns(texto))
+        if not trigramas:
+            return None
+        
+        listas = []
+        for trigrama in trigramas:
+            lista = self.postings.get(trigrama)
+            if lista is None:
+                return set()
+            listas.append(lista)
+        
+        listas.sort(key=len)
+        candidatos = set(listas[0])
+        for lista in listas[1:]:
+            candidatos.intersection_update(lista)
+            if not candidatos:
+                break
+        return candidatos
+
+    def ids_candidatos_alguma_linha(self, linhas: List[str]) -> Optional[set]:
+        """Ids que podem conter ao menos uma das linhas (TIPO 5); None = alguma linha curta demais"""
+        candidatos = set()
+        for linha in linhas:
+            ids = self.ids_candidatos(linha)
+            if ids is None:
+                return None
+            candidatos.update(ids)
+        return candidatos if linhas else None
+
+    def salvar(self, caminho_indice: str = ARQUIVO_INDICE_TRIGRAMAS):
+        """Grava o índice de forma atômica (banco SQLite temporário + os.replace)"""
+        temporario = f"{caminho_indice}.tmp"
+        if os.path.exists(temporario):
+            os.remove(temporario)
+        
+        conexao = sqlite3.connect(temporario)
+        try:
+            conexao.executescript(f"""
+                PRAGMA journal_mode = OFF;
+                PRAGMA user_version = {VERSAO_INDICE_TRIGRAMAS};
+                CREATE TABLE info (chave TEXT PRIMARY KEY, valor TEXT NOT NULL);
+                CREATE TABLE arquivos (
+                    id INTEGER PRIMARY KEY,
+                    nome BLOB NOT NULL,
+                    caminho BLOB NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    tamanho INTEGER NOT NULL
+                );
+                CREATE TABLE postings (trigrama TEXT PRIMARY KEY, ids BLOB NOT NULL);
+            """)
+            conexao.executemany("INSERT INTO info VALUES (?, ?)", [
+                ('pasta_base', self.pasta_base),
+                ('criado_em', self.criado_em),
+                ('total_ids', str(len(self.arquivos))),
+            ])
+            # Caminhos como bytes do sistema: nomes não decodificáveis (surrogateescape) também cabem
+            conexao.executemany("INSERT INTO arquivos VALUES (?, ?, ?, ?, ?)", (
+                (id_arquivo, os.fsencode(entrada[0]), os.fsencode(entrada[1]), entrada[2], entrada[3])
+                for id_arquivo, entrada in enumerate(self.arquivos) if entrada is not None
+            ))
+            conexao.executemany("INSERT INTO postings VALUES (?, ?)", (
+                (trigrama, IndiceTrigramas._ids_para_bytes(lista)) for trigrama, lista in self.postings.items()
+            ))
+            conexao.commit()
+        finally:
+            conexao.close()
+        with open(temporario, 'rb+') as f:
+            os.fsync(f.fileno())
+        
+        # No Windows o os.replace falha enquanto uma busca estiver lendo o índice
+        for tentativa in range(10):
+            try:
+                os.replace(temporario, caminho_indice)
                 return
+            except PermissionError:
+                if tentativa == 9:
+                    raise
+                time.sleep(0.1)
+    
+    @staticmethod
+    def _ids_para_bytes(lista: array) -> bytes:
+        """Lista de ids como uint32 little-endian (o formato no disco não depende da máquina)"""
+        if sys.byteorder != 'little':
+            lista = array('I', lista)
+            lista.byteswap()
+        return lista.tobytes()
+    
+    @staticmethod
+    def _ids_de_bytes(dados: bytes) -> array:
+        lista = array('I')
+        lista.frombytes(dados)
+        if sys.byteorder != 'little':
+            lista.byteswap()
+        return lista
+    
+    @staticmethod
+    def carregar(caminho_indice: str = ARQUIVO_INDICE_TRIGRAMAS) -> Optional['IndiceTrigramas']:
+        """Carrega o índice salvo; None se não existir ou for de outra versão"""
+        if not os.path.exists(caminho_indice):
+            return None
+        try:
+            conexao = sqlite3.connect(caminho_indice, timeout=30)
+            try:
+                if conexao.execute("PRAGMA user_version").fetchone()[0] != VERSAO_INDICE_TRIGRAMAS:
+                    print("⚠️ Índice de trigramas de outra versão, execute: python pythonsearch.py index build")
+                    return None
+                info = dict(conexao.execute("SELECT chave, valor FROM info"))
+                indice = IndiceTrigramas(info['pasta_base'])
+                indice.criado_em = info['criado_em']
+                indice.arquivos = [None] * int(info['total_ids'])
+                for id_arquivo, nome, caminho, mtime_ns, tamanho in conexao.execute("SELECT * FROM arquivos"):
+                    caminho = os.fsdecode(caminho)
+                    indice.arquivos[id_arquivo] = (os.fsdecode(nome), caminho, mtime_ns, tamanho)
+                    indice.por_caminho[caminho] = id_arquivo
+                indice.postings = {trigrama: IndiceTrigramas._ids_de_bytes(ids)
+                                   for trigrama, ids in conexao.execute("SELECT trigrama, ids FROM postings")}
+            finally:
+                conexao.close()
+        except (sqlite3.Error, KeyError, ValueError, IndexError) as e:
+            print(f"⚠️ Índice de trigramas ilegível ({e}), usando varredura completa")
+            return None
+        return indice
+
+def carregar_indice_pasta_base() -> Optional[IndiceTrigramas]:
+    """🆕 Índice de trigramas da PASTA_BASE atual; None se desativado, ausente ou de outra pasta (v2.2.0)"""
+    if not USAR_INDICE_TRIGRAMAS:
+        return None
+    indice = IndiceTrigramas.carregar()
+    if indice is not None and os.path.abspath(indice.pasta_base) != os.path.abspath(PASTA_BASE):
+        print(f"⚠️ Índice de trigramas é de outra pasta ({indice.pasta_base}), usando varredura completa")
+        return None
+    return indice
+
+def listar_arquivos_para_busca(consulta: ConsultaBusca, tipos_ativos):
+    """🆕 Lista (nome, caminho, tipos_permitidos) a varrer, podando pelo índice se possível (v2.2.0)"""
+    indice = carregar_indice_pasta_base() if tipos_ativos else None
+    return listar_arquivos_com_indice(consulta, tipos_ativos, indice)
+
+def listar_arquivos_com_indice(consulta: ConsultaBusca, tipos_ativos, indice: Optional[IndiceTrigramas]):
+    """🆕 Igual a listar_arquivos_para_busca, com o índice já carregado (None = varredura completa)"""
+    varredura_completa = ((arquivo, caminho, None) for arquivo, caminho in iterar_arquivos_pasta_base())
+    if indice is None or not tipos_ativos:
+        return varredura_completa
+    
+    candidatos_por_tipo: Dict[int, Optional[set]] = {}
+    ids_exatos = None
+    if any(tipo in TIPOS_PODA_EXATA for tipo in tipos_ativos):
+        ids_exatos = indice.ids_candidatos(consulta.texto_stripped)
+    for tipo in tipos_ativos:
+        if tipo in TIPOS_PODA_EXATA:
+            candidatos_por_tipo[tipo] = ids_exatos
+        elif tipo == 5:
+            candidatos_por_tipo[tipo] = indice.ids_candidatos_alguma_linha(
+                linhas_votantes_consulta(consulta.linhas_consulta)
+            )
     
-    print("❌ FAIL")
+    if any(ids is None for ids in candidatos_por_tipo.values()):
+        log_detalhe("ℹ️ Texto curto demais para o índice de trigramas, usando varredura completa")
+        return varredura_completa
+    
+    todos_ids = set()
+    for ids in candidatos_por_tipo.values():
+        todos_ids.update(ids)
+    
+    # Percorre a pasta (só stat, sem leitura): arquivos novos ou alterados depois do
+    # índice entram como candidatos de todos os TIPOS, então a poda nunca perde acertos
+    arquivos = []
+    desatualizados = 0
+    for arquivo, caminho_arquivo, mtime_ns, tamanho in coletar_stats_pasta_base():
+        id_arquivo = indice.por_caminho.get(caminho_arquivo)
+        entrada = indice.arquivos[id_arquivo] if id_arquivo is not None else None
+        
+        if entrada is None or (entrada[2], entrada[3]) != (mtime_ns, tamanho):
+            desatualizados += 1
+            arquivos.append((arquivo, caminho_arquivo, None))
+        elif USAR_BUSCA_STREAMING and motivo_para_ignorar_arquivo(tamanho) == 'grande':
+            # 🆕 Grandes entram no índice sem texto: a busca em fluxo decide
+            arquivos.append((arquivo, caminho_arquivo, None))
+        elif id_arquivo in todos_ids:
+            tipos_permitidos = {tipo for tipo, ids in candidatos_por_tipo.items() if id_arquivo in ids}
+            arquivos.append((arquivo, caminho_arquivo, tipos_permitidos))
+    
+    log_detalhe(f"🗂️ ÍNDICE DE TRIGRAMAS: {len(arquivos)} candidato(s) "
+          f"({desatualizados} fora do índice ou alterado(s)) - índice criado em {indice.criado_em}")
+    return arquivos
 
-def calcular_similaridade_melhorada(texto1, texto2):
-    """
-    🔧 ALGORITMO OTIMIZADO: Calcula similaridade mais precisa
+def vigiar_indice():
+    """🆕 Mantém o índice atualizado por polling de stat (v2.2.0) - Ctrl+C para sair
+    
+    Cada ciclo junta todas as mudanças e grava o índice uma única vez, de forma
+    atômica, então uma busca concorrente vê sempre o índice antigo ou o novo inteiro.
     """
-    def normalizar_texto(texto):
-        linhas = []
-        for linha in texto.split('\n'):
-            linha_limpa = linha.strip()
-            if linha_limpa:
-                linhas.append(linha_limpa)
-        return '\n'.join(linhas)
+    indice = IndiceTrigramas.carregar()
+    if indice is None or os.path.abspath(indice.pasta_base) != os.path.abspath(PASTA_BASE):
+        print("🏗️ Nenhum índice válido para esta pasta, construindo do zero...")
+        indice = IndiceTrigramas(PASTA_BASE)
     
-    texto1_norm = normalizar_texto(texto1)
-    texto2_norm = normalizar_texto(texto2)
+    print(f"👀 VIGIANDO {PASTA_BASE} a cada {INTERVALO_INDICE_WATCH:.1f}s (Ctrl+C para sair)")
+    abrir_cache_conteudo()
+    try:
+        while True:
+            inicio = time.time()
+            novos, alterados, removidos = indice.atualizar(coletar_stats_pasta_base())
+            if novos or alterados or removidos:
+                if cache_conteudo_ativo is not None:
+                    cache_conteudo_ativo.gravar_pendentes()
+                indice.salvar()
+                print(f"🔄 {datetime.now().strftime('%H:%M:%S')} índice atualizado: "
+                      f"+{novos} novo(s), ~{alterados} alterado(s), -{removidos} removido(s) "
+                      f"em {time.time() - inicio:.2f}s")
+            sys.stdout.flush()  # 🆕 Saída bufferizada: mostra cada ciclo
+            time.sleep(INTERVALO_INDICE_WATCH)
+    except KeyboardInterrupt:
+        print("\n👋 Vigilância do índice encerrada")
+    finally:
+        fechar_cache_conteudo()
+
+def comando_indice(argumentos: List[str]):
+    """🆕 Subcomandos "index build", "index watch", "index stats" e "index drop" (v2.2.0)"""
+    acao = argumentos[0].lower() if argumentos else 'stats'
     
-    if texto1_norm == texto2_norm:
-        return 100.0
-    if not texto1_norm or not texto2_norm:
-        return 0.0
+    if acao == 'build':
+        print(f"🏗️ CONSTRUINDO ÍNDICE DE TRIGRAMAS: {PASTA_BASE}")
+        inicio = time.time()
+        indice = IndiceTrigramas(PASTA_BASE)
+        indice.construir()
+        indice.salvar()
+        print(f"✅ Índice salvo em {ARQUIVO_INDICE_TRIGRAMAS}: {len(indice.arquivos)} arquivo(s), "
+              f"{len(indice.postings)} trigrama(s) em {time.time() - inicio:.1f}s")
     
-    # 🎯 ALGORITMO MELHORADO: Combina múltiplas métricas
+    elif acao == 'watch':
+        vigiar_indice()
+    
+    elif acao == 'stats':
+        indice = IndiceTrigramas.carregar()
+        if indice is None:
+            print(f"ℹ️ Nenhum índice encontrado ({ARQUIVO_INDICE_TRIGRAMAS}). Execute: python pythonsearch.py index build")
+            return
+        ativos = sum(1 for entrada in indice.arquivos if entrada is not None)
+        total_postings = sum(len(lista) for lista in indice.postings.values())
+        print("📊 ÍNDICE DE TRIGRAMAS:")
+        print(f"   📁 Pasta: {indice.pasta_base}")
+        print(f"   🕒 Criado em: {indice.criado_em}")
+        print(f"   📄 Arquivos indexados: {ativos} ({len(indice.arquivos) - ativos} removido(s))")
+        print(f"   🔤 Trigramas distintos: {len(indice.postings)}")
+        print(f"   🔗 Entradas nas listas: {total_postings}")
+        print(f"   💾 Tamanho em disco: {os.path.getsize(ARQUIVO_INDICE_TRIGRAMAS) / 1024 / 1024:.1f} MB")
+    
+    elif acao == 'drop':
+        if os.path.exists(ARQUIVO_INDICE_TRIGRAMAS):
+            os.remove(ARQUIVO_INDICE_TRIGRAMAS)
+            print(f"🗑️ Índice removido: {ARQUIVO_INDICE_TRIGRAMAS}")
+        else:
+            print(f"ℹ️ Nenhum índice para remover ({ARQUIVO_INDICE_TRIGRAMAS})")
     
-    # 1. Similaridade de caracteres
-    chars1 = set(texto1_norm.lower())
-    chars2 = set(texto2_norm.lower())
-    if chars1.union(chars2):
-        sim_chars = len(chars1.intersection(chars2)) / len(chars1.union(chars2))
     else:
-        sim_chars = 0
+        print(f"❌ Ação de índice desconhecida: {acao}")
+        print("   python pythonsearch.py index build|watch|stats|drop")
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# 🔧 FUNÇÕES DE BUSCA ATUALIZADAS
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def verificar_tipo1_arquivo(consulta: ConsultaBusca, arquivo: str, caminho_arquivo: str, conteudo: str, snapshot: Optional[SnapshotArquivo] = None) -> Optional[Dict[str, Any]]:
+    """🆕 TIPO 1 aplicado a um único arquivo já carregado (v2.2.0)"""
+    texto_copiado = consulta.texto_copiado
+    
+    if texto_copiado not in conteudo:
+        return None
+    
+    log_debug(f"✅ OK - {arquivo}")
+    
+    # 🚨 PASSA CAMINHO PARA CORREÇÃO BOM
+    posicoes = calcular_posicoes_precisas(conteudo, texto_copiado, arquivo, caminho_arquivo, snapshot=snapshot)
+    if not posicoes:
+        log_debug(f"❌ Erro ao calcular posições para {arquivo}")
+        return None
+    
+    if not validar_posicoes_com_bom(conteudo, posicoes, texto_copiado, caminho_arquivo, arquivo, snapshot=snapshot):
+        log_debug(f"❌ Validação falhou para {arquivo}")
+        return None
+    
+    contexto_inicio = max(0, posicoes['inicio'] - 50)
+    contexto_fim = min(len(conteudo) + 3, posicoes['fim'] + 50)  # +3 para BOM
+    
+    return {
+        'nome': arquivo,
+        'caminho': caminho_arquivo,
+        'inicio': posicoes['inicio'],
+        'fim': posicoes['fim'],
+        'tamanho': len(texto_copiado),
+        'texto_original': texto_copiado,
+        'contexto_inicio': contexto_inicio,
+        'contexto_fim': contexto_fim,
+        'contexto_texto': conteudo[max(0, contexto_inicio-3):contexto_fim-3]  # Ajuste contexto
+    }
+
+def verificar_tipo2_arquivo(consulta: ConsultaBusca, arquivo: str, caminho_arquivo: str, conteudo: str, snapshot: Optional[SnapshotArquivo] = None) -> Optional[Dict[str, Any]]:
+    """🆕 TIPO 2 aplicado a um único arquivo já carregado (v2.2.0)"""
+    texto_copiado = consulta.texto_copiado
+    
+    if texto_copiado != conteudo:
+        return None
+    
+    log_debug(f"✅ OK - {arquivo}")
+    
+    return {
+        'nome': arquivo,
+        'caminho': caminho_arquivo,
+        'inicio': 0,
+        'fim': len(conteudo),
+        'tamanho': len(texto_copiado),
+        'texto_original': texto_copiado,
+        'contexto_inicio': 0,
+        'contexto_fim': len(conteudo),
+        'contexto_texto': conteudo
+    }
+
+def verificar_tipo3_arquivo(consulta: ConsultaBusca, arquivo: str, caminho_arquivo: str, conteudo_original: str, snapshot: Optional[SnapshotArquivo] = None) -> Optional[Dict[str, Any]]:
+    """🆕 TIPO 3 aplicado a um único arquivo já carregado (v2.2.0)"""
+    texto_copiado = consulta.texto_copiado
+    conteudo_normalizado = conteudo_original.replace('\r\n', '\n')
+    
+    if consulta.texto_normalizado not in conteudo_normalizado:
+        return None
+    
+    log_debug(f"🔍 Calculando posições precisas para {arquivo}...")
+    
+    # 🚨 PASSA CAMINHO PARA CORREÇÃO BOM
+    posicoes = calcular_posicoes_precisas(conteudo_original, texto_copiado, arquivo, caminho_arquivo, snapshot=snapshot)
+    if not posicoes:
+        log_debug(f"❌ Erro ao calcular posições para {arquivo}")
+        return None
+    
+    if not validar_posicoes_com_bom(conteudo_original, posicoes, texto_copiado, caminho_arquivo, arquivo, snapshot=snapshot):
+        log_debug(f"❌ Validação falhou para {arquivo}")
+        return None
+    
+    contexto_inicio = max(0, posicoes['inicio'] - 50)
+    contexto_fim = min(len(conteudo_original) + 3, posicoes['fim'] + 50)  # +3 para BOM
+    contexto_texto = conteudo_original[max(0, contexto_inicio-3):contexto_fim-3]  # Ajuste contexto
+    
+    log_debug(f"✅ ENCONTRADO - {arquivo}")
+    
+    return {
+        'nome': arquivo,
+        'caminho': caminho_arquivo,
+        'inicio': posicoes['inicio'],
+        'fim': posicoes['fim'],
+        'tamanho': len(texto_copiado),
+        'texto_original': texto_copiado,
+        'contexto_inicio': contexto_inicio,
+        'contexto_fim': contexto_fim,
+        'contexto_texto': contexto_texto
+    }
+
+def verificar_tipo4_arquivo(consulta: ConsultaBusca, arquivo: str, caminho_arquivo: str, conteudo: str, snapshot: Optional[SnapshotArquivo] = None) -> Optional[Dict[str, Any]]:
+    """🆕 TIPO 4 aplicado a um único arquivo já carregado (v2.2.0)"""
+    texto_copiado = consulta.texto_copiado
+    texto_stripped = consulta.texto_stripped
+    conteudo_stripped = conteudo.strip()
+    
+    if texto_stripped not in conteudo_stripped:
+        return None
+    
+    log_debug(f"✅ OK - {arquivo}")
+    
+    # 🚨 PASSA CAMINHO PARA CORREÇÃO BOM
+    posicoes = calcular_posicoes_precisas(conteudo, texto_copiado, arquivo, caminho_arquivo, snapshot=snapshot)
+    if not posicoes:
+        posicoes_stripped = calcular_posicoes_precisas(conteudo, texto_stripped, arquivo, caminho_arquivo, snapshot=snapshot)
+        if posicoes_stripped:
+            posicoes = posicoes_stripped
+        else:
+            log_debug(f"❌ Erro ao calcular posições para {arquivo}")
+            return None
+    
+    contexto_inicio = max(0, posicoes['inicio'] - 50)
+    contexto_fim = min(len(conteudo) + 3, posicoes['fim'] + 50)  # +3 para BOM
+    
+    return {
+        'nome': arquivo,
+        'caminho': caminho_arquivo,
+        'inicio': posicoes['inicio'],
+        'fim': posicoes['fim'],
+        'tamanho': len(texto_copiado),
+        'texto_original': texto_copiado,
+        'contexto_inicio': contexto_inicio,
+        'contexto_fim': contexto_fim,
+        'contexto_texto': conteudo[max(0, contexto_inicio-3):contexto_fim-3]  # Ajuste contexto
+    }
+
+def normalizar_texto_similaridade(texto):
+    """Remove linhas vazias e espaços nas pontas de cada linha"""
+    linhas = []
+    for linha in texto.split('\n'):
+        linha_limpa = linha.strip()
+        if linha_limpa:
+            linhas.append(linha_limpa)
+    return '\n'.join(linhas)
+
+def combinar_metricas_similaridade(inter_chars, uniao_chars, inter_palavras, uniao_palavras, tamanho1, tamanho2, eh_substring):
+    """🆕 Fórmula final da similaridade a partir das contagens de caracteres e palavras (v2.2.0)"""
+    # 1. Similaridade de caracteres
+    sim_chars = inter_chars / uniao_chars if uniao_chars else 0
     
     # 2. Similaridade de palavras
-    palavras1 = set(texto1_norm.lower().split())
-    palavras2 = set(texto2_norm.lower().split())
-    if palavras1.union(palavras2):
-        sim_palavras = len(palavras1.intersection(palavras2)) / len(palavras1.union(palavras2))
-    else:
-        sim_palavras = 0
+    sim_palavras = inter_palavras / uniao_palavras if uniao_palavras else 0
     
     # 3. Similaridade de tamanho
-    tam_min = min(len(texto1_norm), len(texto2_norm))
-    tam_max = max(len(texto1_norm), len(texto2_norm))
+    tam_min = min(tamanho1, tamanho2)
+    tam_max = max(tamanho1, tamanho2)
     sim_tamanho = tam_min / tam_max if tam_max > 0 else 0
     
     # 4. Bonus substring
-    texto1_lower = texto1_norm.lower()
-    texto2_lower = texto2_norm.lower()
-    if texto1_lower in texto2_lower or texto2_lower in texto1_lower:
-        bonus_substring = 0.3
-    else:
-        bonus_substring = 0
+    bonus_substring = 0.3 if eh_substring else 0
     
     # 🏆 FÓRMULA FINAL
     similaridade_final = (
@@ -773,9 +2305,42 @@ def calcular_similaridade_melhorada(texto1, texto2):
     
     return min(100.0, similaridade_final)
 
-def extrair_ancoras(texto):
-    """🆕 Extrai âncoras TRIPLAS para busca por probabilidade (inicial, meio, final) - v2.1.1"""
-    linhas = [linha.strip() for linha in texto.split('\n') if linha.strip()]
+def perfil_similaridade(texto: str) -> Tuple[str, str, set, set]:
+    """🆕 (normalizado, minúsculo, caracteres, palavras) de um texto, calculado uma vez (v2.2.0)"""
+    texto_norm = normalizar_texto_similaridade(texto)
+    texto_lower = texto_norm.lower()
+    return texto_norm, texto_lower, set(texto_lower), set(texto_lower.split())
+
+def calcular_similaridade_melhorada(texto1, texto2, perfil1: Optional[Tuple[str, str, set, set]] = None):
+    """
+    🔧 ALGORITMO OTIMIZADO: Calcula similaridade mais precisa
+    
+    🆕 perfil1: perfil_similaridade(texto1) já calculado (o texto copiado é o mesmo
+    para todas as regiões de todos os arquivos do TIPO 5)
+    """
+    texto1_norm, texto1_lower, chars1, palavras1 = perfil1 if perfil1 is not None else perfil_similaridade(texto1)
+    texto2_norm = normalizar_texto_similaridade(texto2)
+    
+    if texto1_norm == texto2_norm:
+        return 100.0
+    if not texto1_norm or not texto2_norm:
+        return 0.0
+    
+    # 🎯 ALGORITMO MELHORADO: Combina múltiplas métricas
+    texto2_lower = texto2_norm.lower()
+    chars2 = set(texto2_lower)
+    palavras2 = set(texto2_lower.split())
+    
+    return combinar_metricas_similaridade(
+        len(chars1 & chars2), len(chars1 | chars2),
+        len(palavras1 & palavras2), len(palavras1 | palavras2),
+        len(texto1_norm), len(texto2_norm),
+        texto1_lower in texto2_lower or texto2_lower in texto1_lower
+    )
+
+def extrair_ancoras(texto):
+    """🆕 Extrai âncoras TRIPLAS para busca por probabilidade (inicial, meio, final) - v2.1.1"""
+    linhas = [linha.strip() for linha in texto.split('\n') if linha.strip()]
     
     if not linhas:
         return None, None, None
@@ -791,334 +2356,1211 @@ def extrair_ancoras(texto):
     
     return linhas[0], linhas[indice_meio], linhas[-1]
 
-def tipo5_busca_por_probabilidade(texto_copiado, limite_similaridade=90.0):
-    """🆕 TIPO 5: Busca por probabilidade com CORREÇÃO COMPLETA v2.1.6"""
-    print("🔍 TIPO 5: BUSCA POR PROBABILIDADE COM CORREÇÃO COMPLETA")
-    print(f"Regra: Âncoras inicial/final + análise TIPO3 na linha do meio, similaridade >= {limite_similaridade}%")
+# ═══════════════════════════════════════════════════════════════════════════════
+# 🧮 ALINHAMENTO DE LINHAS PARA O TIPO 5 (v2.2.0)
+# ═══════════════════════════════════════════════════════════════════════════════
+
+# Quantas diagonais (deslocamento linha_arquivo - linha_consulta) mais votadas são refinadas
+TIPO5_DIAGONAIS_CANDIDATAS = 3
+# Linhas mais curtas que isso ("}", ")", "end") não votam: casam em qualquer lugar
+TIPO5_TAMANHO_MINIMO_LINHA_VOTO = 3
+
+def linhas_votantes_consulta(linhas_consulta: List[str]) -> List[str]:
+    """🆕 Linhas da consulta que votam no alinhamento (todas, se nenhuma for longa o bastante) (v2.2.0)"""
+    longas = [linha for linha in linhas_consulta if len(linha) >= TIPO5_TAMANHO_MINIMO_LINHA_VOTO]
+    return longas if longas else list(linhas_consulta)
+
+def alinhar_linhas_consulta(hashes_consulta: List[int], hashes_votantes: set, tabela: TabelaLinhas) -> List[Tuple[int, int, int, float]]:
+    """🆕 Regiões do arquivo que melhor alinham com as linhas da consulta (v2.2.0)
     
-    ancora_inicial, ancora_meio, ancora_final = extrair_ancoras(texto_copiado)
+    Cada ocorrência (consulta da tabela de linhas por hash) de uma linha votante vota
+    na diagonal (indice_arquivo - indice_consulta); as diagonais mais votadas viram
+    janelas que o SequenceMatcher refina. Custo proporcional às ocorrências + quadrático
+    só no tamanho da consulta. Retorna [(primeira_linha, fim_linhas, linhas_casadas, razao)],
+    com índices de linha da tabela.
+    """
+    total_consulta = len(hashes_consulta)
+    if not total_consulta or not len(tabela):
+        return []
+    
+    indices_por_hash: Dict[int, List[int]] = {}
+    for indice, hash_linha in enumerate(hashes_consulta):
+        if hash_linha in hashes_votantes:
+            indices_por_hash.setdefault(hash_linha, []).append(indice)
+    
+    votos: Dict[int, float] = {}
+    for hash_linha, indices in indices_por_hash.items():
+        peso = 1.0 / len(indices)  # Linha repetida na consulta não domina a votação
+        for indice_arquivo in tabela.posicoes(hash_linha):
+            for indice_consulta in indices:
+                diagonal = indice_arquivo - indice_consulta
+                votos[diagonal] = votos.get(diagonal, 0.0) + peso
+    
+    if not votos:
+        return []
+    
+    diagonais = sorted(votos.items(), key=lambda item: (-item[1], item[0]))[:TIPO5_DIAGONAIS_CANDIDATAS]
+    folga = total_consulta // 2 + 1
+    regioes = []
+    vistas = set()
+    for diagonal, _ in diagonais:
+        janela_inicio = max(0, diagonal - folga)
+        janela_fim = min(len(tabela), diagonal + total_consulta + folga)
+        matcher = SequenceMatcher(None, hashes_consulta, tabela.hashes[janela_inicio:janela_fim], autojunk=False)
+        blocos = [bloco for bloco in matcher.get_matching_blocks() if bloco.size]
+        if not blocos:
+            continue
+        
+        primeira = janela_inicio + blocos[0].b
+        fim_linhas = janela_inicio + blocos[-1].b + blocos[-1].size
+        if (primeira, fim_linhas) in vistas:
+            continue
+        vistas.add((primeira, fim_linhas))
+        
+        casadas = sum(bloco.size for bloco in blocos)
+        razao = 2.0 * casadas / (total_consulta + (fim_linhas - primeira))
+        regioes.append((primeira, fim_linhas, casadas, razao))
+    
+    return regioes
+
+def localizar_texto_na_regiao(conteudo: str, texto: str, inicio: int, fim: int) -> Optional[Tuple[int, int]]:
+    """🆕 Procura o texto copiado (literal ou sem \\r) perto da região alinhada (v2.2.0)"""
+    margem = len(texto)
+    janela_inicio = max(0, inicio - margem)
+    janela_fim = min(len(conteudo), fim + margem)
+    
+    posicao = conteudo.find(texto, janela_inicio, janela_fim)
+    if posicao != -1:
+        return posicao, posicao + len(texto)
+    
+    texto_sem_cr = limpar_carriage_returns(texto)
+    if '\r' not in conteudo:
+        posicao = conteudo.find(texto_sem_cr, janela_inicio, janela_fim)
+        return (posicao, posicao + len(texto_sem_cr)) if posicao != -1 else None
+    
+    mapa = MapaOffsetsQuebras(conteudo, remover_cr_isolado=True)
+    conteudo_sem_cr = limpar_carriage_returns(conteudo)
+    posicao = conteudo_sem_cr.find(texto_sem_cr, mapa.para_normalizado(janela_inicio), mapa.para_normalizado(janela_fim))
+    if posicao == -1:
+        return None
+    return mapa.trecho_original(posicao, len(texto_sem_cr))
+
+def verificar_tipo5_arquivo(consulta: ConsultaBusca, arquivo: str, caminho_arquivo: str, conteudo_original: str, snapshot: Optional[SnapshotArquivo] = None) -> Optional[Dict[str, Any]]:
+    """🆕 TIPO 5 por alinhamento de linhas aplicado a um único arquivo já carregado (v2.2.0)"""
+    texto_copiado = consulta.texto_copiado
+    linhas_consulta = consulta.linhas_consulta
+    
+    tabela = obter_tabela_linhas(conteudo_original, snapshot)
+    hashes_votantes = {hash_linha_stripped(linha) for linha in linhas_votantes_consulta(linhas_consulta)}
+    regioes = alinhar_linhas_consulta(consulta.hashes_linhas_consulta, hashes_votantes, tabela)
+    
+    # Com 3+ linhas, uma única linha em comum não basta (antes eram exigidas 2 âncoras)
+    minimo_casadas = 1 if len(linhas_consulta) <= 2 else 2
+    regioes = [regiao for regiao in regioes if regiao[2] >= minimo_casadas]
+    if not regioes:
+        return None
+    
+    # Preserva a indentação da primeira linha quando o texto copiado também a tem
+    copiou_indentacao = texto_copiado[:1] in (' ', '\t')
+    
+    trechos = []
+    for primeira, fim_linhas, _, _ in regioes:
+        inicio_trecho = tabela.inicios_linha[primeira] if copiou_indentacao else tabela.inicios_texto[primeira]
+        trechos.append((inicio_trecho, tabela.fins_texto[fim_linhas - 1]))
+    similaridades_texto = [calcular_similaridade_melhorada(texto_copiado, conteudo_original[inicio:fim],
+                                                           consulta.perfil_similaridade)
+                           for inicio, fim in trechos]
     
-    if not ancora_inicial:
-        print("❌ ERRO: Não foi possível extrair âncoras do texto copiado")
+    melhor = None
+    for (_, _, casadas, razao), (inicio_trecho, fim_trecho), similaridade_texto in zip(regioes, trechos, similaridades_texto):
+        similaridade = min(100.0, razao * 50.0 + similaridade_texto * 0.5)
+        if melhor is None or similaridade > melhor[0]:
+            melhor = (similaridade, inicio_trecho, fim_trecho, casadas, razao, similaridade_texto)
+    
+    similaridade_final, inicio_trecho, fim_trecho, casadas, razao, similaridade_texto = melhor
+    
+    log_debug(f"🧮 Testando {arquivo}:")
+    log_debug(f"   📏 Linhas alinhadas: {casadas}/{len(linhas_consulta)} (alinhamento {razao * 100:.1f}%)")
+    log_debug(f"   📊 Similaridade do trecho: {similaridade_texto:.1f}%")
+    log_debug(f"   🏆 Similaridade final: {similaridade_final:.1f}%")
+    
+    if similaridade_final < consulta.limite_similaridade:
+        return None
+    
+    # Se o texto copiado aparece inteiro na região, usa os offsets exatos dele
+    exato = localizar_texto_na_regiao(conteudo_original, texto_copiado, inicio_trecho, fim_trecho)
+    if exato:
+        inicio_trecho, fim_trecho = exato
+        log_debug(f"✅ Posições exatas do texto copiado dentro da região alinhada")
+    
+    trecho_encontrado = conteudo_original[inicio_trecho:fim_trecho]
+    
+    info_encoding = obter_info_encoding_arquivo(caminho_arquivo, snapshot)
+    offset_bom = info_encoding['bom_size'] if info_encoding['has_bom'] else 0
+    inicio_final = inicio_trecho + offset_bom
+    fim_final = fim_trecho + offset_bom
+    
+    contexto_inicio = max(0, inicio_final - 50)
+    contexto_fim = min(len(conteudo_original) + offset_bom, fim_final + 50)
+    contexto_texto = conteudo_original[max(0, contexto_inicio - offset_bom):min(len(conteudo_original), contexto_fim - offset_bom)]
+    
+    log_debug(f"✅ MATCH POR ALINHAMENTO ENCONTRADO - {arquivo} ({similaridade_final:.1f}%)")
+    log_debug(f"   📍 Posições: {inicio_final} até {fim_final} (BOM: +{offset_bom})")
+    
+    return {
+        'nome': arquivo,
+        'caminho': caminho_arquivo,
+        'inicio': inicio_final,
+        'fim': fim_final,
+        'tamanho': len(texto_copiado),
+        'texto_original': texto_copiado,
+        'texto_encontrado': trecho_encontrado,
+        'similaridade': similaridade_final,
+        'contexto_inicio': contexto_inicio,
+        'contexto_fim': contexto_fim,
+        'contexto_texto': contexto_texto
+    }
+
+def verificar_tipo6_arquivo(consulta: ConsultaBusca, arquivo: str, caminho_arquivo: str, conteudo_original: str, snapshot: Optional[SnapshotArquivo] = None) -> Optional[Dict[str, Any]]:
+    """🆕 TIPO 6 aplicado a um único arquivo já carregado (v2.2.0)"""
+    texto_copiado = consulta.texto_copiado
+    conteudo_sem_cr = limpar_carriage_returns(conteudo_original)
+    
+    if consulta.texto_sem_cr not in conteudo_sem_cr:
+        return None
+    
+    log_debug(f"🔍 Calculando posições precisas para {arquivo} (TIPO6 - sem \\r)...")
+    
+    # 🚨 PASSA CAMINHO PARA CORREÇÃO BOM
+    posicoes = calcular_posicoes_precisas(conteudo_original, texto_copiado, arquivo, caminho_arquivo, snapshot=snapshot)
+    if not posicoes:
+        log_debug(f"❌ Erro ao calcular posições para {arquivo}")
+        return None
+    
+    # 🔧 USA FUNÇÃO CORRIGIDA COM BOM
+    if not validar_posicoes_com_bom(conteudo_original, posicoes, texto_copiado, caminho_arquivo, arquivo, snapshot=snapshot):
+        log_debug(f"❌ Validação falhou para {arquivo}")
+        return None
+    
+    contexto_inicio = max(0, posicoes['inicio'] - 50)
+    contexto_fim = min(len(conteudo_original) + 3, posicoes['fim'] + 50)  # +3 para BOM
+    contexto_texto = conteudo_original[max(0, contexto_inicio-3):contexto_fim-3]  # Ajuste contexto
+    
+    log_debug(f"✅ ENCONTRADO - {arquivo} (ignorando \\r)")
+    
+    return {
+        'nome': arquivo,
+        'caminho': caminho_arquivo,
+        'inicio': posicoes['inicio'],
+        'fim': posicoes['fim'],
+        'tamanho': len(texto_copiado),
+        'texto_original': texto_copiado,
+        'contexto_inicio': contexto_inicio,
+        'contexto_fim': contexto_fim,
+        'contexto_texto': contexto_texto
+    }
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# 🆕 MODO TODAS AS OCORRÊNCIAS (v2.2.0) - "--todas"
+# ═══════════════════════════════════════════════════════════════════════════════
+
+TIPOS_OCORRENCIAS_MULTIPLAS = {1, 3, 4, 6}  # TIPO 2 é o arquivo inteiro; TIPO 5 fica com a melhor região
+
+def iterar_ocorrencias(conteudo: str, agulha: str, inicio: int = 0):
+    """🆕 Posições de todas as ocorrências sem sobreposição, com str.find contínuo (v2.2.0)"""
+    if not agulha:
         return
+    pos = conteudo.find(agulha, inicio)
+    while pos != -1:
+        yield pos
+        pos = conteudo.find(agulha, pos + len(agulha))
+
+def buscar_ocorrencias_adicionais(tipo: int, consulta: ConsultaBusca, arquivo: str, caminho_arquivo: str,
+                                  conteudo: str, snapshot: Optional[SnapshotArquivo],
+                                  primeiro: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """🆕 Demais ocorrências do TIPO no mesmo arquivo, depois do primeiro acerto (v2.2.0)
     
-    print(f"🎯 ÂNCORAS EXTRAÍDAS:")
-    print(f"   📍 Inicial: {repr(ancora_inicial[:50])}")
-    print(f"   📍 Meio (TIPO3): {repr(ancora_meio[:50])}")
-    print(f"   📍 Final: {repr(ancora_final[:50])}")
+    Cada TIPO procura sua agulha no seu próprio espaço normalizado e o
+    MapaOffsetsQuebras devolve as coordenadas no conteúdo original.
+    """
+    if tipo == 3:
+        espaco = conteudo.replace('\r\n', '\n').replace('\r', '\n')
+        agulha = consulta.texto_copiado.replace('\r\n', '\n').replace('\r', '\n')
+        mapa = MapaOffsetsQuebras(conteudo)
+    elif tipo == 6:
+        espaco = limpar_carriage_returns(conteudo)
+        agulha = consulta.texto_sem_cr
+        mapa = MapaOffsetsQuebras(conteudo, remover_cr_isolado=True)
+    else:
+        espaco = conteudo
+        agulha = consulta.texto_copiado if tipo == 1 else consulta.texto_stripped
+        mapa = None
     
-    # 🆕 PREPARA LINHA DO MEIO PARA ANÁLISE TIPO3
-    linha_meio_normalizada = ancora_meio.replace('\r\n', '\n')
-    print(f"🔬 ESTRATÉGIA MATEMÁTICA: Aplicando precisão TIPO3 na linha do meio")
+    offset_bom = snapshot.offset_bom if snapshot is not None else 0
+    fim_primeiro = primeiro['fim'] - offset_bom
+    inicio_busca = mapa.para_normalizado(fim_primeiro) if mapa is not None else fim_primeiro
     
-    arquivos_encontrados = 0
+    ocorrencias = []
+    for pos in iterar_ocorrencias(espaco, agulha, inicio_busca):
+        if mapa is not None:
+            inicio, fim = mapa.trecho_original(pos, len(agulha))
+        else:
+            inicio, fim = pos, pos + len(agulha)
+        inicio += offset_bom
+        fim += offset_bom
+        
+        contexto_inicio = max(0, inicio - 50)
+        contexto_fim = min(len(conteudo) + 3, fim + 50)  # +3 para BOM
+        ocorrencias.append({
+            'nome': arquivo,
+            'caminho': caminho_arquivo,
+            'inicio': inicio,
+            'fim': fim,
+            'tamanho': len(consulta.texto_copiado),
+            'texto_original': consulta.texto_copiado,
+            'contexto_inicio': contexto_inicio,
+            'contexto_fim': contexto_fim,
+            'contexto_texto': conteudo[max(0, contexto_inicio-3):contexto_fim-3]  # Ajuste contexto
+        })
     
-    for raiz, _, arquivos in os.walk(PASTA_BASE):
-        for arquivo in arquivos:
-            ext = os.path.splitext(arquivo)[1].lower()
-            if ext in EXTENSOES_NEGADAS or eh_arquivo_backup(arquivo):
-                continue
-                
-            caminho_arquivo = os.path.join(raiz, arquivo)
-            conteudo_original = ler_arquivo(caminho_arquivo)
-            
-            # 1. 🔍 BUSCA ÂNCORA INICIAL (primeira validação)
-            pos_inicial = conteudo_original.find(ancora_inicial)
-            if pos_inicial == -1:
-                continue  # Âncora inicial não encontrada
-            
-            # 2. 🔍 BUSCA ÂNCORA FINAL (segunda validação)
-            pos_busca_final = pos_inicial + len(ancora_inicial)
-            pos_final_ancora = conteudo_original.find(ancora_final, pos_busca_final)
-            
-            if pos_final_ancora == -1:
-                if ancora_inicial == ancora_final:
-                    pos_final_ancora = pos_inicial
-                else:
-                    continue
-            
-            # 3. 🆕 ANÁLISE MATEMÁTICA HÍBRIDA: TIPO3 na linha do meio
-            score_matematico = 0
-            bonus_tipo3_meio = 0
-            bonus_ancora_meio = 0
-            bonus_precisao = 0
-            
-            # Aplica TIPO3 especificamente na linha do meio
-            conteudo_normalizado = conteudo_original.replace('\r\n', '\n')
-            
-            if linha_meio_normalizada in conteudo_normalizado:
-                # 🏆 TIPO3 na linha do meio ENCONTRADO!
-                pos_meio_tipo3 = conteudo_normalizado.find(linha_meio_normalizada)
-                
-                # Verifica se a linha do meio está dentro da região das âncoras
-                pos_inicial_normalizada = conteudo_normalizado.find(ancora_inicial.replace('\r\n', '\n'))
-                pos_final_normalizada = conteudo_normalizado.find(ancora_final.replace('\r\n', '\n'), pos_inicial_normalizada + len(ancora_inicial))
+    if ocorrencias:
+        log_debug(f"🔁 {arquivo}: +{len(ocorrencias)} ocorrência(s) adicional(is) TIPO{tipo}")
+    return ocorrencias
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# 🆕 BUSCA EM FLUXO PARA ARQUIVOS MUITO GRANDES (v2.2.0)
+# ═══════════════════════════════════════════════════════════════════════════════
+
+# TIPO 5 precisa do texto inteiro (tabela de linhas + similaridade): não roda em fluxo
+TIPOS_BUSCA_STREAMING = {1, 2, 3, 4, 6}
+# Contexto salvo: 50 chars antes do início + o ajuste fixo de 3 das coordenadas
+MARGEM_CONTEXTO_STREAMING = 53
+
+def utilizavel_fluxo(agulha: str) -> bool:
+    """🆕 Agulha não vazia e sem \\r (o texto lido em modo texto nunca tem \\r)"""
+    return bool(agulha) and '\r' not in agulha
+
+def planos_fluxo_por_tipo(consulta: ConsultaBusca) -> Dict[int, Tuple[str, List[str], str]]:
+    """🆕 Por TIPO: (agulha que decide o acerto, agulhas das posições em ordem, agulha do --todas) (v2.2.0)
+    
+    As agulhas das posições seguem as estratégias 1, 2 e 2B de calcular_posicoes_precisas
+    (+ strip no TIPO 4) e a do --todas é a de buscar_ocorrencias_adicionais. O arquivo é
+    lido em modo texto e nunca contém \\r, então agulhas com \\r ficam de fora (na busca
+    em memória elas também não casam).
+    """
+    texto_copiado = consulta.texto_copiado
+    normalizado_completo = texto_copiado.replace('\r\n', '\n').replace('\r', '\n')
+    posicoes = [texto_copiado, normalizado_completo, consulta.texto_sem_cr]
+    planos = {
+        1: (texto_copiado, [texto_copiado], texto_copiado),
+        3: (consulta.texto_normalizado, posicoes, normalizado_completo),
+        4: (consulta.texto_stripped, posicoes + [consulta.texto_stripped], consulta.texto_stripped),
+        6: (consulta.texto_sem_cr, posicoes, consulta.texto_sem_cr),
+    }
+    
+    # Agulha decisiva vazia (texto só de espaços no TIPO 4) está em qualquer texto, como em memória
+    return {tipo: (decisiva, [agulha for agulha in ordem if utilizavel_fluxo(agulha)], adicional)
+            for tipo, (decisiva, ordem, adicional) in planos.items() if '\r' not in decisiva}
+
+def montar_info_fluxo(consulta: ConsultaBusca, arquivo: str, caminho_arquivo: str,
+                      posicao: int, tamanho_agulha: int, offset_bom: int) -> Dict[str, Any]:
+    """🆕 arquivo_info de um acerto em fluxo; contexto_texto é completado conforme os blocos chegam"""
+    inicio = posicao + offset_bom
+    fim = posicao + tamanho_agulha + offset_bom
+    return {
+        'nome': arquivo,
+        'caminho': caminho_arquivo,
+        'inicio': inicio,
+        'fim': fim,
+        'tamanho': len(consulta.texto_copiado),
+        'texto_original': consulta.texto_copiado,
+        'contexto_inicio': max(0, inicio - 50),
+        'contexto_fim': fim + 50,  # Limitado ao tamanho do texto quando o arquivo termina
+        'contexto_texto': ""
+    }
+
+def buscar_em_fluxo_arquivo(consulta: ConsultaBusca, tipos, arquivo: str, caminho_arquivo: str,
+                            estatisticas: Optional[EstatisticasVarredura] = None) -> List[Tuple[int, Dict[str, Any]]]:
+    """🆕 TIPOS 1-4 e 6 lendo o arquivo em blocos de TAMANHO_BLOCO_STREAMING caracteres (v2.2.0)
+    
+    Cada bloco é procurado junto com a cauda do anterior (maior agulha - 1 + margem de
+    contexto), então um acerto que cruza a fronteira é visto uma única vez. O modo texto
+    do Python normaliza \\r\\n/\\r incrementalmente (um \\r no fim do bloco fica retido até
+    o próximo), então as posições são as mesmas da leitura completa. Memória: um bloco
+    + cauda, independente do tamanho do arquivo.
+    """
+    if estatisticas is None:
+        estatisticas = EstatisticasVarredura()
+    tipos_fluxo = [tipo for tipo in tipos if tipo in TIPOS_BUSCA_STREAMING]
+    if not tipos_fluxo:
+        return []
+    
+    try:
+        with open(caminho_arquivo, 'rb') as f:
+            tamanho_bytes = os.fstat(f.fileno()).st_size
+            if tamanho_bytes == 0:
+                return []
+            if IGNORAR_ARQUIVOS_BINARIOS and eh_bloco_binario(f.read(TAMANHO_BLOCO_DETECCAO_BINARIO)):
+                estatisticas.registrar_ignorado('binario', tamanho_bytes)
+                return []
+            f.seek(0)
+            info_encoding = detectar_encoding_em_fluxo(f)  # Validação UTF-8 também em blocos
+    except OSError as e:
+        print(f"❌ Erro ao ler {caminho_arquivo}: {e}")
+        return []
+    
+    offset_bom = info_encoding['bom_size'] if info_encoding['has_bom'] and 'utf-8' in info_encoding['detected'].lower() else 0
+    planos = {tipo: plano for tipo, plano in planos_fluxo_por_tipo(consulta).items() if tipo in tipos_fluxo}
+    
+    primeiras: Dict[str, Optional[Dict[str, Any]]] = {}
+    for decisiva, ordem, _ in planos.values():
+        for agulha in [decisiva] + ordem:
+            if agulha:
+                primeiras[agulha] = None
+    # 🆕 Com --todas, as ocorrências da agulha adicional são filtradas conforme chegam: uma
+    # cadeia sem sobreposição por agulha que pode dar o primeiro acerto (ela começa no fim
+    # dele), então só as ocorrências aceitas ficam em memória
+    cadeias: Dict[str, Dict[str, Dict[str, Any]]] = {}
+    if consulta.todas_ocorrencias:
+        for _, ordem, adicional in planos.values():
+            if utilizavel_fluxo(adicional):
+                cadeias.setdefault(adicional, {}).update(
+                    (agulha, {'proximo': None, 'aceitas': []}) for agulha in ordem
+                )
+    
+    agulhas = set(primeiras) | set(cadeias)
+    tamanho_cauda = max((len(agulha) for agulha in agulhas), default=1) - 1 + MARGEM_CONTEXTO_STREAMING
+    
+    # TIPO 2: compara cada bloco com o trecho correspondente do texto copiado
+    texto_copiado = consulta.texto_copiado
+    tipo2_igual = 2 in tipos_fluxo
+    
+    pendentes = []  # (arquivo_info, fim da janela de contexto) aguardando os próximos blocos
+    estatisticas.arquivos_lidos += 1
+    estatisticas.arquivos_em_fluxo += 1
+    contar_metrica('arquivos_decodificados')
+    contar_metrica('bytes_lidos', tamanho_bytes)
+    log_debug(f"🌊 Busca em fluxo: {arquivo} ({tamanho_bytes / 1024 / 1024:.1f} MB, blocos de {TAMANHO_BLOCO_STREAMING} chars)")
+    
+    base = 0       # Posição (no texto) do primeiro caractere do buffer
+    buffer = ""
+    total_lido = 0
+    
+    def registrar_acerto(posicao: int, tamanho_agulha: int) -> Dict[str, Any]:
+        info = montar_info_fluxo(consulta, arquivo, caminho_arquivo, base + posicao, tamanho_agulha, offset_bom)
+        fim_janela = info['contexto_fim'] - 3
+        info['contexto_texto'] = buffer[max(0, info['contexto_inicio'] - 3) - base:fim_janela - base]
+        if fim_janela > base + len(buffer):
+            pendentes.append((info, fim_janela))
+        return info
+    
+    try:
+        with open(caminho_arquivo, 'r', encoding=info_encoding['encoding'], errors='replace') as f:
+            while True:
+                bloco = f.read(TAMANHO_BLOCO_STREAMING)
+                if tipo2_igual and bloco != texto_copiado[total_lido:total_lido + len(bloco)]:
+                    tipo2_igual = False
+                total_lido += len(bloco)
+                inicio_novo = len(buffer)
+                buffer += bloco
                 
-                if pos_inicial_normalizada <= pos_meio_tipo3 <= pos_final_normalizada:
-                    bonus_tipo3_meio = 35.0  # 🎯 BONUS MATEMÁTICO: +35% por TIPO3 válido no meio
-                    score_matematico += bonus_tipo3_meio
-                    print(f"🧮 {arquivo}: TIPO3 na linha do meio CONFIRMADO! (+{bonus_tipo3_meio:.1f}% bonus)")
-                    
-                    # 🆕 BONUS EXTRA: Se consegue validar posições precisas
-                    posicoes_teste = calcular_posicoes_precisas(conteudo_original, texto_copiado, "", caminho_arquivo)
-                    if posicoes_teste:
-                        bonus_precisao = 25.0  # Bonus por posições válidas
-                        score_matematico += bonus_precisao
-                        print(f"🎯 {arquivo}: Posições precisas validadas (+{bonus_precisao:.1f}% bonus de precisão)")
-                else:
-                    print(f"⚠️ {arquivo}: TIPO3 linha do meio encontrada, mas fora da região das âncoras")
-            else:
-                print(f"📊 {arquivo}: Linha do meio não passa no teste TIPO3")
-            
-            # 4. 🎯 BUSCA ÂNCORA DO MEIO TRADICIONAL (validação adicional)
-            if ancora_meio != ancora_inicial and ancora_meio != ancora_final:
-                pos_busca_meio_inicio = pos_inicial + len(ancora_inicial)
-                pos_busca_meio_fim = pos_final_ancora
-                trecho_busca_meio = conteudo_original[pos_busca_meio_inicio:pos_busca_meio_fim + len(ancora_final)]
-                pos_meio_relativa = trecho_busca_meio.find(ancora_meio)
+                # Completa o contexto dos acertos anteriores com o bloco novo
+                for info, fim_janela in pendentes:
+                    info['contexto_texto'] += buffer[inicio_novo:max(inicio_novo, fim_janela - base)]
+                pendentes = [pendente for pendente in pendentes if pendente[1] > base + len(buffer)]
                 
-                if pos_meio_relativa != -1:
-                    bonus_ancora_meio = 10.0  # Bonus menor por âncora tradicional
-                    score_matematico += bonus_ancora_meio
-                    print(f"✅ {arquivo}: Âncora do meio tradicional encontrada (+{bonus_ancora_meio:.1f}% bonus)")
-                else:
-                    print(f"⚠️ {arquivo}: Âncora do meio tradicional não localizada")
-            else:
-                # 🆕 CASO ESPECIAL: Âncoras inicial/final iguais (comentários repetitivos)
-                if ancora_inicial == ancora_final:
-                    # Dá bonus se a linha do meio é diferente e específica
-                    if ancora_meio != ancora_inicial and len(ancora_meio.strip()) > 10:
-                        bonus_ancora_meio = 20.0  # Bonus por linha do meio específica
-                        score_matematico += bonus_ancora_meio
-                        print(f"🔥 {arquivo}: Linha do meio específica em bloco com bordas iguais (+{bonus_ancora_meio:.1f}% bonus)")
-                    else:
-                        print(f"📝 {arquivo}: Âncoras inicial/final iguais (bordas de comentário)")
-                else:
-                    print(f"📝 {arquivo}: Âncora do meio igual às bordas (texto pequeno)")
-            
-            # 5. 🎯 CALCULA POSIÇÕES E SIMILARIDADE BASE
-            inicio_trecho = pos_inicial
-            fim_linha_final = conteudo_original.find('\n', pos_final_ancora + len(ancora_final))
-            if fim_linha_final == -1:
-                fim_linha_final = len(conteudo_original)
-            
-            fim_trecho = fim_linha_final
-            trecho_encontrado = conteudo_original[inicio_trecho:fim_trecho]
-            
-            similaridade_base = calcular_similaridade_melhorada(texto_copiado, trecho_encontrado)
-            
-            # 🆕 CÁLCULO FINAL MATEMÁTICO: Similaridade base + bonus matemático
-            similaridade_final = min(100.0, similaridade_base + score_matematico)
-            
-            print(f"🧮 Testando {arquivo}:")
-            print(f"   📊 Similaridade base: {similaridade_base:.1f}%")
-            print(f"   🎯 Score matemático: +{score_matematico:.1f}%")
-            print(f"   🏆 Similaridade final: {similaridade_final:.1f}%")
-            
-            # 6. ✅ VALIDAÇÃO FINAL POR SIMILARIDADE MATEMÁTICA (CORRIGIDA v2.1.6)
-            if similaridade_final >= limite_similaridade:
-                posicoes_validadas = calcular_posicoes_precisas(conteudo_original, texto_copiado, arquivo, caminho_arquivo)
+                # Só acertos que terminam no bloco novo: os anteriores já foram vistos
+                for agulha in primeiras:
+                    if primeiras[agulha] is None:
+                        posicao = buffer.find(agulha, max(0, inicio_novo - len(agulha) + 1))
+                        if posicao != -1:
+                            primeiras[agulha] = registrar_acerto(posicao, len(agulha))
                 
-                if posicoes_validadas:
-                    inicio_final = posicoes_validadas['inicio']
-                    fim_final = posicoes_validadas['fim']
-                    print(f"✅ Posições validadas por busca direta para {arquivo}")
-                    
-                    # 🆕 BONUS EXTRA: Se conseguiu validar posições precisas, é muito confiável
-                    if bonus_precisao == 0:  # Só adiciona se não foi adicionado antes
-                        similaridade_final = min(100.0, similaridade_final + 15.0)
-                        print(f"🎯 {arquivo}: Bonus extra por validação precisa (+15.0% final)")
-                else:
-                    # 🚨 NOVO: Tenta busca com normalização de quebras
-                    print(f"⚠️ Busca direta falhou, tentando com normalização de quebras...")
-                    
-                    # Normaliza quebras de linha
-                    texto_normalizado = texto_copiado.replace('\r\n', '\n').replace('\r', '\n')
-                    conteudo_normalizado = conteudo_original.replace('\r\n', '\n').replace('\r', '\n')
-                    
-                    # Busca no conteúdo normalizado
-                    pos_normalizada = conteudo_normalizado.find(texto_normalizado)
+                # --todas: os primeiros acertos deste bloco já são conhecidos, então toda
+                # ocorrência que pode entrar numa cadeia já encontra a cadeia aberta
+                for adicional, cadeias_adicional in cadeias.items():
+                    ativas = []
+                    for agulha, cadeia in cadeias_adicional.items():
+                        if cadeia['proximo'] is None and primeiras.get(agulha) is not None:
+                            cadeia['proximo'] = primeiras[agulha]['fim']
+                        if cadeia['proximo'] is not None:
+                            ativas.append(cadeia)
+                    if not ativas:
+                        continue
                     
-                    if pos_normalizada != -1:
-                        print(f"✅ Encontrado após normalização na posição {pos_normalizada}")
-                        
-                        # Mapeia posição normalizada de volta para original
-                        contador_norm = 0
-                        pos_real = 0
-                        
-                        # Percorre o conteúdo original contando caracteres
-                        for i, char in enumerate(conteudo_original):
-                            if contador_norm >= pos_normalizada:
-                                pos_real = i
-                                break
-                            
-                            # Se for \r\n, conta como 1 no normalizado
-                            if char == '\r' and i + 1 < len(conteudo_original) and conteudo_original[i + 1] == '\n':
-                                continue  # Pula o \r
-                            
-                            contador_norm += 1
-                        
-                        # Calcula fim baseado no tamanho original
-                        fim_real = pos_real
-                        chars_originais = 0
-                        
-                        # Conta caracteres do texto original no conteúdo
-                        for i in range(pos_real, len(conteudo_original)):
-                            if chars_originais >= len(texto_copiado):
-                                break
-                            fim_real = i + 1
-                            chars_originais += 1
-                        
-                        # Detecta BOM se houver
-                        info_encoding = detectar_bom_e_encoding(caminho_arquivo)
-                        offset_bom = info_encoding['bom_size'] if info_encoding['has_bom'] else 0
-                        
-                        inicio_final = pos_real + offset_bom
-                        fim_final = fim_real + offset_bom
-                        
-                        print(f"📍 Posições calculadas: {inicio_final} até {fim_final}")
-                        print(f"   🔧 Offset BOM: +{offset_bom} bytes")
-                        
-                        # Validação
-                        texto_validacao = conteudo_original[pos_real:fim_real]
-                        texto_validacao_norm = texto_validacao.replace('\r\n', '\n').replace('\r', '\n')
-                        
-                        if texto_validacao_norm == texto_normalizado:
-                            print(f"✅ Validação OK: textos idênticos após normalização")
-                        else:
-                            print(f"⚠️ Validação parcial: pequenas diferenças detectadas")
-                            
-                    else:
-                        # Último recurso: usa posições das âncoras
-                        print(f"⚠️ Usando posições por âncoras (menos preciso)")
-                        
-                        # Detecta BOM para ajuste
-                        info_encoding = detectar_bom_e_encoding(caminho_arquivo)
-                        offset_bom = info_encoding['bom_size'] if info_encoding['has_bom'] else 0
-                        
-                        inicio_final = inicio_trecho + offset_bom
-                        fim_final = fim_trecho + offset_bom
-                        print(f"   🔧 Ajuste BOM aplicado: +{offset_bom} bytes")
-                
-                # Contexto com ajuste para possível BOM
-                info_encoding = detectar_bom_e_encoding(caminho_arquivo)
-                offset_contexto = info_encoding['bom_size'] if info_encoding['has_bom'] else 0
-                
-                contexto_inicio = max(0, inicio_final - 50)
-                contexto_fim = min(len(conteudo_original) + offset_contexto, fim_final + 50)
+                    aceitas_bloco: Dict[int, Dict[str, Any]] = {}
+                    desde = max(0, inicio_novo - len(adicional) + 1)
+                    while True:
+                        # Pula direto para onde a cadeia mais atrasada aceita a próxima ocorrência
+                        minimo = min(cadeia['proximo'] for cadeia in ativas) - base - offset_bom
+                        posicao = buffer.find(adicional, max(desde, minimo))
+                        if posicao == -1:
+                            break
+                        inicio = base + posicao + offset_bom
+                        for cadeia in ativas:
+                            if inicio >= cadeia['proximo']:
+                                info = aceitas_bloco.get(posicao)
+                                if info is None:
+                                    info = aceitas_bloco[posicao] = registrar_acerto(posicao, len(adicional))
+                                cadeia['aceitas'].append(info)
+                                cadeia['proximo'] = info['fim']
+                        desde = posicao + 1
                 
-                # Ajusta extração do contexto
-                if offset_contexto > 0:
-                    contexto_real_inicio = max(0, contexto_inicio - offset_contexto)
-                    contexto_real_fim = min(len(conteudo_original), contexto_fim - offset_contexto)
-                else:
-                    contexto_real_inicio = contexto_inicio
-                    contexto_real_fim = contexto_fim
+                if not bloco:
+                    break
                 
-                contexto_texto = conteudo_original[contexto_real_inicio:contexto_real_fim]
+                # Sem --todas: tudo encontrado, contextos completos e TIPO 2 descartado = para de ler
+                if (not cadeias and not pendentes and not tipo2_igual
+                        and all(info is not None for info in primeiras.values())):
+                    break
                 
-                arquivo_info = {
+                if len(buffer) > tamanho_cauda:
+                    base += len(buffer) - tamanho_cauda
+                    buffer = buffer[-tamanho_cauda:]
+    except OSError as e:
+        print(f"❌ Erro ao ler {caminho_arquivo}: {e}")
+        return []
+    
+    def finalizar(info):
+        info = dict(info)
+        info['contexto_fim'] = min(total_lido + 3, info['contexto_fim'])  # +3 para BOM
+        return info
+    
+    acertos = []
+    for tipo in tipos_fluxo:
+        if tipo == 2:
+            if tipo2_igual and total_lido == len(texto_copiado):
+                acertos.append((2, {
                     'nome': arquivo,
                     'caminho': caminho_arquivo,
-                    'inicio': inicio_final,
-                    'fim': fim_final,
+                    'inicio': 0,
+                    'fim': total_lido,
                     'tamanho': len(texto_copiado),
                     'texto_original': texto_copiado,
-                    'texto_encontrado': trecho_encontrado,
-                    'similaridade': similaridade_final,
-                    'contexto_inicio': contexto_inicio,
-                    'contexto_fim': contexto_fim,
-                    'contexto_texto': contexto_texto
-                }
-                
-                adicionar_resultado_global(5, arquivo_info)
-                arquivos_encontrados += 1
-                print(f"✅ MATCH MATEMÁTICO ENCONTRADO - {arquivo} ({similaridade_final:.1f}%)")
-                print(f"   🧮 Breakdown: {similaridade_base:.1f}% base + {score_matematico:.1f}% matemático + validações")
-    
-    if arquivos_encontrados > 0:
-        print(f"\n🎯 RESUMO TIPO5: Texto encontrado em {arquivos_encontrados} arquivo(s) por estratégia matemática híbrida")
-        print(f"🧮 Estratégia: Âncoras + TIPO3 no meio + cálculo matemático de probabilidade")
-    else:
-        print("❌ FAIL: Nenhum arquivo atendeu o critério de estratégia matemática híbrida")
+                    'contexto_inicio': 0,
+                    'contexto_fim': total_lido,
+                    'contexto_texto': texto_copiado
+                }))
+            continue
+        
+        if tipo not in planos or (planos[tipo][0] and primeiras[planos[tipo][0]] is None):
+            continue
+        decisiva, ordem, adicional = planos[tipo]
+        agulha_primeiro = next((agulha for agulha in ordem if primeiras[agulha] is not None), None)
+        if agulha_primeiro is None:
+            continue
+        acertos.append((tipo, finalizar(primeiras[agulha_primeiro])))
+        
+        # --todas: ocorrências sem sobreposição depois do primeiro acerto, como em memória
+        if adicional in cadeias:
+            for info in cadeias[adicional][agulha_primeiro]['aceitas']:
+                acertos.append((tipo, finalizar(info)))
+        log_debug(f"✅ OK (fluxo) - {arquivo}: TIPO {tipo}")
+    
+    return acertos
 
-# 🆕 TIPO 6: IGNORANDO TODOS OS U+000D (v2.1.2)
-def tipo6_ignorar_carriage_returns(texto_copiado):
-    """🆕 TIPO 6: Ignora completamente todos os U+000D (\\r) - HOTFIX v2.1.2"""
-    print("🔍 TIPO 6: IGNORANDO COMPLETAMENTE TODOS OS U+000D (\\r)")
-    print("Regra: Remove todos os \\r de ambos os textos, depois busca")
+# ═══════════════════════════════════════════════════════════════════════════════
+# 🆕 LEITURA ANTECIPADA EM THREADS: DISCO E CPU OCUPADOS AO MESMO TEMPO (v2.2.0)
+# ═══════════════════════════════════════════════════════════════════════════════
+
+class LeitorAntecipado:
+    """🆕 Produtor/consumidor: threads leem os próximos arquivos enquanto os TIPOS rodam (v2.2.0)
     
-    texto_sem_cr = limpar_carriage_returns(texto_copiado)
-    arquivos_encontrados = 0
+    A janela guarda até LEITURA_ANTECIPADA_PROFUNDIDADE arquivos e no máximo
+    LEITURA_ANTECIPADA_MAX_BYTES em leitura (um arquivo sempre entra, mesmo maior).
+    A ordem dos arquivos é preservada. O cache de conteúdo (SQLite) só é usado pela
+    thread que consome: as threads fazem apenas o open/read/decodificação.
+    """
     
-    print(f"🧹 TEXTO ORIGINAL: {len(texto_copiado)} chars")
-    print(f"🧹 TEXTO LIMPO: {len(texto_sem_cr)} chars")
-    print(f"🧹 CRs REMOVIDOS: {len(texto_copiado) - len(texto_sem_cr)}")
+    def __init__(self, arquivos, precisa_snapshot, threads: int = LEITURA_ANTECIPADA_THREADS,
+                 profundidade: int = LEITURA_ANTECIPADA_PROFUNDIDADE, max_bytes: int = LEITURA_ANTECIPADA_MAX_BYTES):
+        self.arquivos = iter(arquivos)
+        self.precisa_snapshot = precisa_snapshot  # (tipos_permitidos) -> bool, consultado ao entrar na janela
+        self.profundidade = max(1, profundidade)
+        self.max_bytes = max_bytes
+        self.executor = ThreadPoolExecutor(max_workers=max(1, threads), thread_name_prefix="leitura")
+        self.janela = deque()  # [item, futuro ou snapshot pronto, info_encoding do cache, bytes]
+        self.bytes_em_leitura = 0
+        self.esgotado = False
     
-    for raiz, _, arquivos in os.walk(PASTA_BASE):
-        for arquivo in arquivos:
-            ext = os.path.splitext(arquivo)[1].lower()
-            if ext in EXTENSOES_NEGADAS or eh_arquivo_backup(arquivo):
+    def _preencher(self):
+        while not self.esgotado and len(self.janela) < self.profundidade:
+            if self.janela and self.bytes_em_leitura >= self.max_bytes:
+                return
+            try:
+                item = next(self.arquivos)
+            except StopIteration:
+                self.esgotado = True
+                return
+            
+            if not self.precisa_snapshot(item[2]):
+                self.janela.append([item, None, None, 0])
                 continue
-                
-            caminho_arquivo = os.path.join(raiz, arquivo)
-            conteudo_original = ler_arquivo(caminho_arquivo)
-            conteudo_sem_cr = limpar_carriage_returns(conteudo_original)
             
-            if texto_sem_cr in conteudo_sem_cr:
-                print(f"🔍 Calculando posições precisas para {arquivo} (TIPO6 - sem \\r)...")
-                
-                # 🚨 PASSA CAMINHO PARA CORREÇÃO BOM
-                posicoes = calcular_posicoes_precisas(conteudo_original, texto_copiado, arquivo, caminho_arquivo)
-                if not posicoes:
-                    print(f"❌ Erro ao calcular posições para {arquivo}")
-                    continue
-                
-                # 🔧 USA FUNÇÃO CORRIGIDA COM BOM
-                if not validar_posicoes_com_bom(conteudo_original, posicoes, texto_copiado, caminho_arquivo, arquivo):
-                    print(f"❌ Validação falhou para {arquivo}")
-                    continue
-                
-                contexto_inicio = max(0, posicoes['inicio'] - 50)
-                contexto_fim = min(len(conteudo_original) + 3, posicoes['fim'] + 50)  # +3 para BOM
-                contexto_texto = conteudo_original[max(0, contexto_inicio-3):contexto_fim-3]  # Ajuste contexto
-                
-                arquivo_info = {
-                    'nome': arquivo,
-                    'caminho': caminho_arquivo,
-                    'inicio': posicoes['inicio'],
-                    'fim': posicoes['fim'],
-                    'tamanho': len(texto_copiado),
-                    'texto_original': texto_copiado,
-                    'contexto_inicio': contexto_inicio,
-                    'contexto_fim': contexto_fim,
-                    'contexto_texto': contexto_texto
-                }
-                
-                adicionar_resultado_global(6, arquivo_info)
-                arquivos_encontrados += 1
-                print(f"✅ ENCONTRADO - {arquivo} (ignorando \\r)")
+            resolvido, snapshot, info_encoding = resolver_snapshot_pelo_cache(item[1], classificar=True)
+            if resolvido:
+                self.janela.append([item, snapshot, None, 0])
+                continue
+            
+            try:
+                tamanho = os.path.getsize(item[1])
+            except OSError:
+                tamanho = 0
+            futuro = self.executor.submit(ler_snapshot_do_disco, item[1], info_encoding, True)
+            self.janela.append([item, futuro, info_encoding, tamanho])
+            self.bytes_em_leitura += tamanho
+    
+    def __iter__(self):
+        """Itens (nome, caminho, tipos_permitidos, obter_snapshot); obter_snapshot None = não lido"""
+        self._preencher()
+        while self.janela:
+            item, pronto, info_encoding, tamanho = self.janela.popleft()
+            self.bytes_em_leitura -= tamanho
+            self._preencher()
+            
+            if pronto is None:
+                yield item + (None,)
+            elif isinstance(pronto, Future):
+                def obter_snapshot(futuro=pronto, info_encoding=info_encoding):
+                    snapshot = futuro.result()
+                    registrar_snapshot_no_cache(snapshot, info_encoding)
+                    return snapshot
+                yield item + (obter_snapshot,)
+            else:
+                yield item + (lambda snapshot=pronto: snapshot,)
+    
+    def fechar(self):
+        """Cancela as leituras ainda não iniciadas (parada antecipada) e encerra as threads"""
+        for _, pronto, _, _ in self.janela:
+            if isinstance(pronto, Future):
+                pronto.cancel()
+        self.janela.clear()
+        self.executor.shutdown(wait=True)
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# 🆕 MOTOR DE VARREDURA ÚNICA COMPARTILHADO PELOS 6 TIPOS (v2.2.0)
+# ═══════════════════════════════════════════════════════════════════════════════
+
+VERIFICADORES_TIPOS = {
+    1: verificar_tipo1_arquivo,
+    2: verificar_tipo2_arquivo,
+    3: verificar_tipo3_arquivo,
+    4: verificar_tipo4_arquivo,
+    5: verificar_tipo5_arquivo,
+    6: verificar_tipo6_arquivo
+}
+
+def imprimir_cabecalho_tipo(tipo: int, consulta: ConsultaBusca) -> bool:
+    """🆕 Mostra a regra de cada TIPO; retorna False se o TIPO não puder ser executado (v2.2.0)"""
+    if tipo == 1:
+        log_detalhe("🔍 TIPO 1: COMPARAÇÃO 100% LITERAL (v2.1.6 - CORREÇÃO COMPLETA)")
+        log_detalhe("Regra: texto_copiado in conteudo_arquivo")
+    elif tipo == 2:
+        log_detalhe("🔍 TIPO 2: ARQUIVO COMPLETO IGUAL AO TEXTO")
+        log_detalhe("Regra: texto_copiado == conteudo_arquivo")
+    elif tipo == 3:
+        log_detalhe("🔍 TIPO 3: QUEBRAS DE LINHA NORMALIZADAS (v2.1.6 - CORREÇÃO COMPLETA)")
+        log_detalhe("Regra: normaliza \\r\\n para \\n, depois texto_copiado in conteudo")
+    elif tipo == 4:
+        log_detalhe("🔍 TIPO 4: COM STRIP NAS PONTAS (v2.1.6 - CORREÇÃO COMPLETA)")
+        log_detalhe("Regra: aplica .strip() em ambos, depois texto_copiado in conteudo")
+    elif tipo == 5:
+        log_detalhe("🔍 TIPO 5: BUSCA POR PROBABILIDADE (ALINHAMENTO DE LINHAS)")
+        log_detalhe(f"Regra: linhas sem espaços nas pontas votam na melhor região, similaridade >= {consulta.limite_similaridade}%")
+        
+        if not consulta.linhas_consulta:
+            log_detalhe("❌ ERRO: Texto copiado não tem linhas para alinhar")
+            return False
+        
+        votantes = linhas_votantes_consulta(consulta.linhas_consulta)
+        log_detalhe(f"📏 Linhas da consulta: {len(consulta.linhas_consulta)} ({len(votantes)} votantes)")
+        log_detalhe(f"   📍 Primeira: {repr(consulta.linhas_consulta[0][:50])}")
+        log_detalhe(f"   📍 Última: {repr(consulta.linhas_consulta[-1][:50])}")
+    elif tipo == 6:
+        log_detalhe("🔍 TIPO 6: IGNORANDO COMPLETAMENTE TODOS OS U+000D (\\r)")
+        log_detalhe("Regra: Remove todos os \\r de ambos os textos, depois busca")
+        log_detalhe(f"🧹 TEXTO ORIGINAL: {len(consulta.texto_copiado)} chars")
+        log_detalhe(f"🧹 TEXTO LIMPO: {len(consulta.texto_sem_cr)} chars")
+        log_detalhe(f"🧹 CRs REMOVIDOS: {len(consulta.texto_copiado) - len(consulta.texto_sem_cr)}")
     
-    if arquivos_encontrados > 0:
-        print(f"\n🎯 RESUMO TIPO6: Texto encontrado em {arquivos_encontrados} arquivo(s) ignorando todos os \\r")
+    return True
+
+def imprimir_resumo_tipo(tipo: int, arquivos_encontrados: int):
+    """🆕 Mostra o resumo de cada TIPO ao final da varredura (v2.2.0)"""
+    if tipo == 3 and arquivos_encontrados > 0:
+        log_info(f"🎯 RESUMO TIPO3: Texto encontrado em {arquivos_encontrados} arquivo(s)")
+    elif tipo == 5 and arquivos_encontrados > 0:
+        log_info(f"🎯 RESUMO TIPO5: Texto encontrado em {arquivos_encontrados} arquivo(s) por alinhamento de linhas")
+        log_info(f"🧮 Estratégia: linhas sem espaços nas pontas votam na região + similaridade da região escolhida")
+    elif tipo == 5:
+        log_info("❌ FAIL TIPO5: Nenhuma região alinhada pelas linhas atingiu a similaridade mínima")
+    elif tipo == 6 and arquivos_encontrados > 0:
+        log_info(f"🎯 RESUMO TIPO6: Texto encontrado em {arquivos_encontrados} arquivo(s) ignorando todos os \\r")
+    elif arquivos_encontrados > 0:
+        log_info(f"✅ TIPO{tipo}: OK")
     else:
-        print("❌ FAIL")
+        log_info(f"❌ FAIL TIPO{tipo}")
+
+def varrer_arquivos(consulta: ConsultaBusca, tipos_ativos, arquivos,
+                    estatisticas: Optional[EstatisticasVarredura] = None) -> List[Tuple[int, Dict[str, Any]]]:
+    """🆕 Núcleo da varredura: lê cada arquivo uma vez e aplica os TIPOS ativos (v2.2.0)
+    
+    arquivos: itens (nome, caminho, tipos_permitidos) - tipos_permitidos None = todos.
+    Retorna os acertos (tipo, arquivo_info) na ordem dos arquivos, sem tocar em
+    resultados_globais, para poder rodar tanto no processo principal quanto em workers.
+    """
+    acertos = []
+    pendentes = list(tipos_ativos)
+    if estatisticas is None:
+        estatisticas = EstatisticasVarredura()
+    
+    def tipos_do_arquivo(tipos_permitidos):
+        # 🆕 Com índice de trigramas, cada candidato só roda os TIPOS que ele pode satisfazer
+        if tipos_permitidos is None:
+            return list(pendentes)
+        return [tipo for tipo in pendentes if tipo in tipos_permitidos]
+    
+    def usa_busca_bytes(tipos_arquivo):
+        return USAR_BUSCA_BYTES_MMAP and set(tipos_arquivo) <= TIPOS_BUSCA_BYTES
+    
+    def precisa_snapshot(tipos_permitidos):
+        tipos_arquivo = tipos_do_arquivo(tipos_permitidos)
+        return bool(tipos_arquivo) and not usa_busca_bytes(tipos_arquivo)
+    
+    # 🆕 Leitura antecipada: o próximo arquivo já está sendo lido enquanto este é verificado
+    leitor = None
+    if LEITURA_ANTECIPADA_THREADS > 0:
+        leitor = LeitorAntecipado(arquivos, precisa_snapshot, LEITURA_ANTECIPADA_THREADS,
+                                  LEITURA_ANTECIPADA_PROFUNDIDADE, LEITURA_ANTECIPADA_MAX_BYTES)
+        itens = iter(leitor)
+    else:
+        itens = ((arquivo, caminho, tipos, None) for arquivo, caminho, tipos in arquivos)
+    
+    try:
+        for arquivo, caminho_arquivo, tipos_permitidos, obter_snapshot in itens:
+            if not pendentes:
+                break
+            acertos.extend(verificar_arquivo_na_varredura(
+                consulta, arquivo, caminho_arquivo, tipos_do_arquivo(tipos_permitidos),
+                obter_snapshot, pendentes, estatisticas
+            ))
+    finally:
+        if leitor is not None:
+            leitor.fechar()
+    
+    return acertos
+
+def verificar_arquivo_na_varredura(consulta: ConsultaBusca, arquivo: str, caminho_arquivo: str, tipos_arquivo,
+                                   obter_snapshot, pendentes: List[int],
+                                   estatisticas: EstatisticasVarredura) -> List[Tuple[int, Dict[str, Any]]]:
+    """🆕 Aplica os TIPOS a um arquivo da varredura e atualiza os TIPOS pendentes (v2.2.0)
+    
+    obter_snapshot: função que entrega o snapshot já lido pela leitura antecipada,
+    ou None para ler agora.
+    """
+    acertos = []
+    if not tipos_arquivo:
+        return acertos
+    
+    # 🆕 Só TIPO 1/TIPO 2 pendentes: busca nos bytes via mmap, sem decodificar (v2.2.0)
+    acertos_arquivo = None
+    if obter_snapshot is None and USAR_BUSCA_BYTES_MMAP and set(tipos_arquivo) <= TIPOS_BUSCA_BYTES:
+        medicao = iniciar_medicao()
+        acertos_arquivo = verificar_tipos_bytes_arquivo(consulta, tipos_arquivo, arquivo, caminho_arquivo, estatisticas)
+        if acertos_arquivo is not None:
+            rotulo = ','.join(str(tipo) for tipo in tipos_arquivo)
+            registrar_medicao(f"TIPO{'S' if len(tipos_arquivo) > 1 else ''} {rotulo} (bytes)", medicao)
+    
+    if acertos_arquivo is None:
+        # 🆕 Um único read() por arquivo: bytes, encoding e texto no mesmo snapshot
+        medicao = iniciar_medicao()
+        if obter_snapshot is not None:
+            snapshot = obter_snapshot()
+        else:
+            snapshot = carregar_snapshot(caminho_arquivo, classificar=True)
+        registrar_medicao("leitura", medicao)
+        
+        if snapshot is not None and snapshot.ignorado == 'grande' and USAR_BUSCA_STREAMING:
+            # 🆕 Grande demais para carregar inteiro: blocos com memória fixa (sem TIPO 5)
+            medicao = iniciar_medicao()
+            acertos_arquivo = buscar_em_fluxo_arquivo(consulta, tipos_arquivo, arquivo, caminho_arquivo, estatisticas)
+            registrar_medicao("fluxo", medicao)
+        elif snapshot is not None and snapshot.ignorado is not None:
+            estatisticas.registrar_ignorado(snapshot.ignorado, snapshot.tamanho)
+            return acertos
+        else:
+            estatisticas.arquivos_lidos += 1
+            if snapshot is not None and metricas_ativas is not None:
+                if snapshot.dados is not None:
+                    contar_metrica('arquivos_decodificados')
+                    contar_metrica('bytes_lidos', len(snapshot.dados))
+                else:
+                    contar_metrica('arquivos_do_cache')
+            conteudo = snapshot.conteudo if snapshot is not None else ""
+            acertos_arquivo = []
+            for tipo in tipos_arquivo:
+                medicao = iniciar_medicao()
+                arquivo_info = VERIFICADORES_TIPOS[tipo](consulta, arquivo, caminho_arquivo, conteudo, snapshot=snapshot)
+                if arquivo_info is not None:
+                    acertos_arquivo.append((tipo, arquivo_info))
+                    if consulta.todas_ocorrencias and tipo in TIPOS_OCORRENCIAS_MULTIPLAS:
+                        for info_extra in buscar_ocorrencias_adicionais(tipo, consulta, arquivo, caminho_arquivo,
+                                                                        conteudo, snapshot, arquivo_info):
+                            acertos_arquivo.append((tipo, info_extra))
+                registrar_medicao(f"TIPO {tipo}", medicao)
+    
+    for tipo, arquivo_info in acertos_arquivo:
+        acertos.append((tipo, arquivo_info))
+        
+        # TIPOS 1, 2 e 4 continuam parando no primeiro arquivo encontrado (exceto com --todas)
+        if tipo in TIPOS_PRIMEIRO_MATCH and not consulta.todas_ocorrencias and tipo in pendentes:
+            pendentes.remove(tipo)
+    
+    return acertos
+
+def varrer_lote_em_worker(consulta: ConsultaBusca, tipos_ativos, lote, coletar_metricas: bool = False
+                          ) -> Tuple[List[Tuple[int, Dict[str, Any]]], EstatisticasVarredura, Optional[MetricasBusca]]:
+    """🆕 Executado em cada processo do pool: varre um lote contíguo de arquivos (v2.2.0)"""
+    global metricas_ativas, memoria_snapshots_ativa
+    estatisticas = EstatisticasVarredura()
+    # 🆕 Coletor próprio por lote (um worker criado por fork herdaria o do processo principal)
+    metricas_ativas = MetricasBusca() if coletar_metricas else None
+    memoria_snapshots_ativa = None
+    with open(os.devnull, 'w', encoding='utf-8') as saida_nula, contextlib.redirect_stdout(saida_nula):
+        abrir_cache_conteudo()
+        try:
+            acertos = varrer_arquivos(consulta, tipos_ativos, lote, estatisticas)
+        finally:
+            fechar_cache_conteudo()
+    
+    # 🗜️ Registro compacto: o texto copiado é recolocado pelo processo principal
+    for _, arquivo_info in acertos:
+        arquivo_info.pop('texto_original', None)
+    
+    return acertos, estatisticas, metricas_ativas
+
+def varrer_arquivos_em_paralelo(consulta: ConsultaBusca, tipos_ativos, workers: int, arquivos,
+                                estatisticas: Optional[EstatisticasVarredura] = None) -> List[Tuple[int, Dict[str, Any]]]:
+    """🆕 Divide a lista de arquivos em lotes contíguos para um ProcessPoolExecutor (v2.2.0)
+    
+    Os lotes são juntados na ordem do os.walk e o "primeiro arquivo" dos TIPOS 1, 2 e 4
+    é decidido aqui, então o resultado é idêntico ao da execução em um só processo.
+    """
+    arquivos = list(arquivos)
+    if not arquivos:
+        return []
+    
+    tamanho_lote = max(1, -(-len(arquivos) // (workers * 4)))
+    lotes = [arquivos[i:i + tamanho_lote] for i in range(0, len(arquivos), tamanho_lote)]
+    log_detalhe(f"⚙️ MODO PARALELO: {len(arquivos)} arquivo(s) em {len(lotes)} lote(s) para {workers} worker(s)")
+    
+    acertos = []
+    tipos_ja_encontrados = set()
+    sys.stdout.flush()  # 🆕 Workers criados por fork não herdam (e repetem) o buffer de saída
+    
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futuros = [executor.submit(varrer_lote_em_worker, consulta, tipos_ativos, lote, metricas_ativas is not None)
+                   for lote in lotes]
+        
+        for futuro in futuros:
+            acertos_lote, estatisticas_lote, metricas_lote = futuro.result()
+            if estatisticas is not None:
+                estatisticas.somar(estatisticas_lote)
+            if metricas_lote is not None and metricas_ativas is not None:
+                metricas_ativas.somar(metricas_lote)
+            for tipo, arquivo_info in acertos_lote:
+                if tipo in TIPOS_PRIMEIRO_MATCH and not consulta.todas_ocorrencias:
+                    if tipo in tipos_ja_encontrados:
+                        continue
+                    tipos_ja_encontrados.add(tipo)
+                
+                arquivo_info['texto_original'] = consulta.texto_copiado
+                acertos.append((tipo, arquivo_info))
+    
+    return acertos
+
+def executar_varredura_unica(consulta: ConsultaBusca, tipos=TIPOS_ORDEM_EXECUCAO, workers: int = 1,
+                             caminhos_excluidos: Optional[set] = None, arquivos=None) -> Dict[int, int]:
+    """🆕 Percorre PASTA_BASE uma vez, lê cada arquivo uma vez e aplica todos os TIPOS ativos (v2.2.0)
+    
+    Os resultados continuam indo para resultados_globais, reordenados por TIPO no
+    final para manter a mesma ordem da execução sequencial TIPO 1 → TIPO 6.
+    Com workers > 1 os arquivos são divididos entre processos (mesma ordem final).
+    arquivos: lista (nome, caminho, tipos_permitidos) já montada pelo planejador;
+    None = percorre a pasta (com o índice de trigramas, se houver).
+    """
+    tipos_ativos = []
+    for tipo in tipos:
+        log_detalhe("\n" + "=" * 80)
+        if imprimir_cabecalho_tipo(tipo, consulta):
+            tipos_ativos.append(tipo)
+    
+    arquivos_encontrados = {tipo: 0 for tipo in tipos_ativos}
+    inicio_resultados = len(resultados_globais)
+    
+    log_detalhe("\n" + "=" * 80)
+    log_detalhe(f"🚀 VARREDURA ÚNICA: TIPOS {', '.join(str(t) for t in tipos_ativos)} em uma só passada por {PASTA_BASE}")
+    
+    # 🆕 Índice de trigramas: só os arquivos candidatos são lidos (v2.2.0)
+    if arquivos is None:
+        arquivos = listar_arquivos_para_busca(consulta, tipos_ativos)
+    if caminhos_excluidos:
+        arquivos = (item for item in arquivos if item[1] not in caminhos_excluidos)
+    
+    acertos = None
+    estatisticas = EstatisticasVarredura()
+    if tipos_ativos and workers > 1:
+        try:
+            arquivos = list(arquivos)
+            acertos = varrer_arquivos_em_paralelo(consulta, tipos_ativos, workers, arquivos, estatisticas)
+        except Exception as e:
+            print(f"⚠️ Falha no modo paralelo ({e}), continuando em um só processo")
+            estatisticas = EstatisticasVarredura()
+    
+    if acertos is None:
+        # 🆕 Cache persistente: arquivos sem mudança não são decodificados de novo (v2.2.0)
+        abriu_cache = cache_conteudo_ativo is None
+        abrir_cache_conteudo()
+        try:
+            acertos = varrer_arquivos(consulta, tipos_ativos, arquivos, estatisticas)
+        finally:
+            if abriu_cache:
+                fechar_cache_conteudo()
+    
+    for tipo, arquivo_info in acertos:
+        adicionar_resultado_global(tipo, arquivo_info)
+        arquivos_encontrados[tipo] += 1
+    
+    # 🔄 Mantém a ordem "por TIPO" da execução sequencial (sort estável)
+    ordem_tipos = {tipo: indice for indice, tipo in enumerate(tipos)}
+    resultados_globais[inicio_resultados:] = sorted(
+        resultados_globais[inicio_resultados:],
+        key=lambda r: ordem_tipos[r.tipo]
+    )
+    
+    if metricas_ativas is not None:
+        metricas_ativas.somar_estatisticas(estatisticas)
+    
+    log_info(f"\n📊 RESUMO DA VARREDURA ÚNICA:")
+    estatisticas.imprimir()
+    for tipo in tipos_ativos:
+        imprimir_resumo_tipo(tipo, arquivos_encontrados[tipo])
+    
+    return arquivos_encontrados
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# 🆕 PLANEJADOR: TIPOS EM ORDEM DE CUSTO COM PARADA ANTECIPADA (v2.2.0)
+# ═══════════════════════════════════════════════════════════════════════════════
+
+# Fases em ordem de custo: bytes/mmap → substring com normalização → sem \r → fuzzy
+FASES_PLANEJADOR = ((1, 2), (3, 4), (6,), (5,))
+# TIPOS que nunca são pulados: variantes de quebra de linha/espaços do mesmo bloco são
+# acertos reais (e alvos do "paste --all"); a parada antecipada só evita TIPO 6 e TIPO 5
+TIPOS_SEMPRE_EXECUTADOS = {1, 2, 3, 4}
+
+# Custo relativo por byte lido (TIPO 1 = 1): medido no caminho em texto de cada TIPO
+CUSTO_RELATIVO_TIPOS = {1: 1.0, 2: 1.0, 3: 4.0, 4: 4.0, 5: 30.0, 6: 6.0}
+
+def score_minimo_confiavel() -> float:
+    """🆕 Resultado "confiável" = acima do TIPO 5 com a probabilidade mínima de melhor resultado"""
+    return SCORES_TIPOS[5] + LIMITE_PROBABILIDADE_MELHOR_RESULTADO
+
+def contar_resultados_confiaveis(resultados: List[ResultadoBusca]) -> int:
+    minimo = score_minimo_confiavel()
+    return sum(1 for resultado in resultados if resultado.score_confiabilidade >= minimo)
+
+def estimar_custo_fase(tipos, bytes_pasta: int) -> float:
+    """🆕 Custo estimado em "MB equivalentes a TIPO 1": uma leitura por fase, o TIPO mais caro domina"""
+    return bytes_pasta * max(CUSTO_RELATIVO_TIPOS.get(tipo, 1.0) for tipo in tipos) / 1024 / 1024
+
+def bytes_pasta_para_planejador(indice: Optional[IndiceTrigramas]) -> Optional[int]:
+    """🆕 Bytes da PASTA_BASE para as estimativas de custo, sem varrer a pasta a cada busca (v2.2.0)
+    
+    Vem do índice de trigramas quando há um; sem índice, a pasta só é percorrida
+    com log detalhado (-v). None = custos não estimados.
+    """
+    if indice is not None:
+        return sum(entrada[3] for entrada in indice.arquivos if entrada is not None)
+    if NIVEL_LOG >= NIVEL_LOG_DETALHADO:
+        return sum(tamanho for _, _, _, tamanho in coletar_stats_pasta_base())
+    return None
+
+def executar_busca_planejada(consulta: ConsultaBusca, workers: int = 1, exaustiva: bool = False) -> Dict[int, int]:
+    """🆕 Roda as fases do planejador e para quando há resultados confiáveis suficientes (v2.2.0)
+    
+    A pasta é percorrida (e o índice carregado) uma única vez: todas as fases usam
+    a mesma lista de candidatos, e o texto lido por uma fase fica em memória para
+    as seguintes. Com exaustiva=True nenhuma fase para antes, então tudo roda numa
+    só varredura única. Fora do modo exaustivo, o TIPO 5 não revisita arquivos que
+    já tiveram acerto exato.
+    """
+    global memoria_snapshots_ativa
+    fases = [tuple(tipo for tipo in fase if tipo in TIPOS_ORDEM_EXECUCAO) for fase in FASES_PLANEJADOR]
+    fases = [fase for fase in fases if fase]
+    
+    indice = carregar_indice_pasta_base()
+    bytes_pasta = bytes_pasta_para_planejador(indice)
+    # TIPO 5 sem linhas não roda (ver imprimir_cabecalho_tipo) e não pode pedir varredura completa ao índice
+    tipos_planejados = [tipo for fase in fases for tipo in fase if tipo != 5 or consulta.linhas_consulta]
+    
+    log_detalhe("\n" + "=" * 80)
+    log_detalhe(f"🧭 PLANEJADOR DE BUSCA ({'exaustivo' if exaustiva else f'para com {RESULTADOS_CONFIAVEIS_SUFICIENTES} resultado(s) com score >= {score_minimo_confiavel():.0f}'})")
+    for numero, fase in enumerate(fases, 1):
+        custo = f" - custo estimado {estimar_custo_fase(fase, bytes_pasta):.1f}" if bytes_pasta is not None else ""
+        log_detalhe(f"   {numero}. TIPOS {', '.join(str(t) for t in fase)}{custo}")
+    
+    arquivos = listar_arquivos_com_indice(consulta, tipos_planejados, indice)
+    inicio_resultados = len(resultados_globais)
+    if exaustiva or len(fases) == 1:
+        return executar_varredura_unica(consulta, [tipo for fase in fases for tipo in fase], workers, arquivos=arquivos)
+    
+    arquivos = list(arquivos)
+    arquivos_encontrados = {}
+    if workers <= 1 and MEMORIA_SNAPSHOTS_PLANEJADOR > 0:
+        memoria_snapshots_ativa = MemoriaSnapshots()
+    try:
+        executar_fases_planejador(consulta, fases, arquivos, workers, inicio_resultados, bytes_pasta, arquivos_encontrados)
+    finally:
+        memoria_snapshots_ativa = None
+    
+    # 🔄 Mesma ordem "por TIPO" da varredura única (sort estável)
+    ordem_tipos = {tipo: indice for indice, tipo in enumerate(TIPOS_ORDEM_EXECUCAO)}
+    resultados_globais[inicio_resultados:] = sorted(
+        resultados_globais[inicio_resultados:],
+        key=lambda r: ordem_tipos[r.tipo]
+    )
+    return arquivos_encontrados
+
+def executar_fases_planejador(consulta: ConsultaBusca, fases, arquivos, workers: int, inicio_resultados: int,
+                              bytes_pasta: Optional[int], arquivos_encontrados: Dict[int, int]):
+    """🆕 Roda as fases sobre a mesma lista de candidatos até haver resultados confiáveis (v2.2.0)"""
+    for numero, fase in enumerate(fases, 1):
+        if TIPOS_SEMPRE_EXECUTADOS.intersection(fase):
+            arquivos_encontrados.update(executar_varredura_unica(consulta, fase, workers, None, arquivos))
+            continue
+        
+        confiaveis = contar_resultados_confiaveis(resultados_globais[inicio_resultados:])
+        if confiaveis >= RESULTADOS_CONFIAVEIS_SUFICIENTES:
+            restantes = fases[numero - 1:]
+            pulados = ', '.join(str(t) for f in restantes for t in f)
+            economia = ""
+            if bytes_pasta is not None:
+                economia = f" (custo estimado evitado {sum(estimar_custo_fase(f, bytes_pasta) for f in restantes):.1f})"
+            log_info(f"\n⏩ PLANEJADOR: {confiaveis} resultado(s) confiável(is) - TIPOS {pulados} pulados"
+                  f"{economia}. Use --exaustiva para rodar todos.")
+            break
+        
+        caminhos_excluidos = None
+        if 5 in fase:
+            caminhos_excluidos = {r.caminho_completo for r in resultados_globais[inicio_resultados:] if r.tipo != 5}
+        
+        arquivos_encontrados.update(executar_varredura_unica(consulta, fase, workers, caminhos_excluidos, arquivos))
+
+# 🔧 Funções por TIPO mantidas para uso isolado: cada uma roda a varredura única só com seu TIPO
+def tipo1_comparacao_literal(texto_copiado):
+    """TIPO 1: Comparação 100% literal - NADA é removido"""
+    executar_varredura_unica(preparar_consulta(texto_copiado), tipos=(1,))
+
+def tipo2_comparacao_arquivo_completo(texto_copiado):
+    """TIPO 2: Arquivo completo deve ser igual ao texto copiado"""
+    executar_varredura_unica(preparar_consulta(texto_copiado), tipos=(2,))
+
+def tipo3_comparacao_quebras_normalizadas(texto_copiado):
+    """🔧 TIPO 3: Normaliza quebras de linha \\r\\n para \\n"""
+    executar_varredura_unica(preparar_consulta(texto_copiado), tipos=(3,))
+
+def tipo4_comparacao_strip_aplicado(texto_copiado):
+    """TIPO 4: Remove espaços do início e fim (.strip())"""
+    executar_varredura_unica(preparar_consulta(texto_copiado), tipos=(4,))
+
+def tipo5_busca_por_probabilidade(texto_copiado, limite_similaridade=90.0):
+    """🆕 TIPO 5: Busca por probabilidade com CORREÇÃO COMPLETA v2.1.6"""
+    executar_varredura_unica(preparar_consulta(texto_copiado, limite_similaridade), tipos=(5,))
+
+# 🆕 TIPO 6: IGNORANDO TODOS OS U+000D (v2.1.2)
+def tipo6_ignorar_carriage_returns(texto_copiado):
+    """🆕 TIPO 6: Ignora completamente todos os U+000D (\\r) - HOTFIX v2.1.2"""
+    executar_varredura_unica(preparar_consulta(texto_copiado), tipos=(6,))
 
 # ═══════════════════════════════════════════════════════════════════════════════
 # 🆕 SISTEMA CONSOLIDADO DE SALVAMENTO XML
 # ═══════════════════════════════════════════════════════════════════════════════
 
-def salvar_xml_consolidado(resultados: List[ResultadoBusca]):
-    """Função unificada para salvar XML com resultados ordenados por confiabilidade"""
-    if not resultados:
-        print("⚠️ Nenhum resultado para salvar no XML")
-        return
+VERSAO_ESQUEMA_SESSAO = 2  # PRAGMA user_version do sessionlinner.db
+MARCADOR_CONTEXTO_RESUMIDO = " […] "
+
+def hash_texto(texto: str) -> str:
+    """🆕 Chave de um texto da sessão (v2.2.0)"""
+    return hashlib.blake2b(texto.encode('utf-8', errors='surrogatepass'), digest_size=16).hexdigest()
+
+def mapear_textos_sessao(resultados: Iterable[ResultadoBusca]) -> Dict[str, str]:
+    """🆕 texto → hash do texto copiado e dos trechos do TIPO 5, cada um calculado uma vez (v2.2.0)
+    
+    Os resultados compartilham o mesmo objeto str do texto copiado, então a
+    consulta ao dicionário não copia nem re-hasheia o texto.
+    """
+    hashes_textos: Dict[str, str] = {}
+    for resultado in resultados:
+        for texto in (resultado.texto_original, resultado.texto_encontrado):
+            if texto and texto not in hashes_textos:
+                hashes_textos[texto] = hash_texto(texto)
+    return hashes_textos
+
+def resumir_contexto(contexto: str) -> str:
+    """🆕 Contexto gravado na sessão: até LIMITE_CONTEXTO_SESSAO caracteres (começo + fim) (v2.2.0)
     
-    resultados_ordenados = sorted(
+    O contexto completo continua recuperável do arquivo por contexto_inicio/contexto_fim.
+    """
+    if len(contexto) <= LIMITE_CONTEXTO_SESSAO + len(MARCADOR_CONTEXTO_RESUMIDO):
+        return contexto
+    metade = LIMITE_CONTEXTO_SESSAO // 2
+    return contexto[:metade] + MARCADOR_CONTEXTO_RESUMIDO + contexto[len(contexto) - metade:]
+
+def ordenar_resultados_por_confiabilidade(resultados: List[ResultadoBusca]) -> List[ResultadoBusca]:
+    """🆕 Ordem do ranking: score, similaridade e nome, do mais confiável ao menos (v2.2.0)"""
+    return sorted(
         resultados,
         key=lambda r: (r.score_confiabilidade, r.similaridade or 0, r.nome_arquivo),
         reverse=True
     )
+
+def configuracoes_busca_atuais() -> Dict[str, str]:
+    """🆕 Configurações gravadas com a sessão (bloco <configuracoes_busca> do XML) (v2.2.0)"""
+    return {
+        'limite_probabilidade_melhor_resultado': str(LIMITE_PROBABILIDADE_MELHOR_RESULTADO),
+        'limite_similaridade_tipo5': str(LIMITE_SIMILARIDADE_TIPO5),
+        'todas_ocorrencias': str(BUSCAR_TODAS_OCORRENCIAS).lower(),
+        # 🆕 ADICIONA INFO SOBRE HOTFIX U+000D (v2.1.2)
+        'hotfix_carriage_return': "true",
+        'tipo6_ignorar_cr': "true",
+        # 🚨 NOVA INFO SOBRE CORREÇÃO BOM
+        'correcao_bom_utf8': "true",
+        'encoding_automatico': "utf-8-sig",
+        # 🆕 NOVA CORREÇÃO v2.1.6
+        'correcao_quebras_linha': "true",
+        'mapeamento_posicoes_preciso': "true",
+    }
+
+def elemento_resultado_xml(i: int, resultado: ResultadoBusca, hashes_textos: Dict[str, str]):
+    """🆕 Monta o <arquivoN> de um resultado (gravado e descartado um por vez) (v2.2.0)
+    
+    Os textos vão só como hash (conteúdo em <info><textos>) e o contexto é resumido.
+    """
+    arquivo_elem = ET.Element(f"arquivo{i}")
+    
+    ET.SubElement(arquivo_elem, "nome").text = resultado.nome_arquivo
+    ET.SubElement(arquivo_elem, "caminho_completo").text = resultado.caminho_completo
+    
+    confiabilidade = ET.SubElement(arquivo_elem, "confiabilidade")
+    ET.SubElement(confiabilidade, "tipo_busca").text = str(resultado.tipo)
+    ET.SubElement(confiabilidade, "score_confiabilidade").text = f"{resultado.score_confiabilidade:.2f}"
+    if resultado.similaridade is not None:
+        ET.SubElement(confiabilidade, "similaridade_percentual").text = f"{resultado.similaridade:.2f}"
+    
+    posicoes = ET.SubElement(arquivo_elem, "posicoes")
+    ET.SubElement(posicoes, "inicio").text = str(resultado.posicao_inicio)
+    ET.SubElement(posicoes, "fim").text = str(resultado.posicao_fim)
+    ET.SubElement(posicoes, "tamanho_texto").text = str(resultado.tamanho_texto)
+    
+    validacao = ET.SubElement(posicoes, "validacao")
+    ET.SubElement(validacao, "posicoes_validadas").text = "true"
+    ET.SubElement(validacao, "metodo_calculo").text = "calcular_posicoes_precisas_v2_1_6_CORRECAO_COMPLETA"
+    ET.SubElement(validacao, "hotfix_carriage_return").text = "aplicado"
+    ET.SubElement(validacao, "correcao_bom_utf8").text = "aplicado"
+    ET.SubElement(validacao, "mapeamento_quebras_linha").text = "aplicado"
+    
+    texto_elem = ET.SubElement(arquivo_elem, "texto_encontrado")
+    ET.SubElement(texto_elem, "hash_original").text = hashes_textos[resultado.texto_original]
+    if resultado.texto_encontrado:
+        ET.SubElement(texto_elem, "hash_encontrado").text = hashes_textos[resultado.texto_encontrado]
+    
+    contexto = ET.SubElement(arquivo_elem, "contexto")
+    ET.SubElement(contexto, "inicio_contexto").text = str(resultado.contexto_inicio)
+    ET.SubElement(contexto, "fim_contexto").text = str(resultado.contexto_fim)
+    ET.SubElement(contexto, "texto_contexto").text = resumir_contexto(resultado.contexto_texto)
+    return arquivo_elem
+
+def escrever_elemento_xml(f, elemento):
+    """Um filho de <sessionlinner>, com a mesma indentação de ET.indent na árvore inteira
+    
+    O ElementTree não escapa \r no texto dos nós e o parser normaliza fins de linha
+    ao ler, então \r vira &#13; (os atributos já saem escapados): o texto copiado
+    em <textos> volta idêntico no export e no ler_xml_posicoes.
+    """
+    ET.indent(elemento, space="  ", level=1)
+    f.write("  " + ET.tostring(elemento, encoding='unicode').replace("\r", "&#13;") + "\n")
+
+def escrever_xml_sessao(caminho_xml: str, resultados_ordenados: Iterable[ResultadoBusca], total: int,
+                        tipos_executados: str, timestamp: str, configuracoes: Dict[str, str],
+                        hashes_textos: Dict[str, str], metricas: Optional['MetricasBusca'] = None) -> bool:
+    """🆕 Grava o XML da sessão em fluxo: um <arquivoN> por vez, sem montar a árvore inteira (v2.2.0)
+    
+    A memória não cresce com o número de resultados. O arquivo é escrito num
+    temporário e só substitui o anterior no final.
+    """
+    info = ET.Element("info")
+    ET.SubElement(info, "timestamp").text = timestamp
+    ET.SubElement(info, "versao").text = VERSAO_FORMATO_SESSAO
+    ET.SubElement(info, "total_arquivos").text = str(total)
+    ET.SubElement(info, "tipos_busca_executados").text = tipos_executados
+    ET.SubElement(info, "ordenacao").text = ORDENACAO_SESSAO
+    if metricas is not None:
+        metricas.adicionar_ao_xml(info)  # 🆕 Métricas da busca (v2.2.0)
+    
+    # 🆕 SALVA CONFIGURAÇÕES DE QUALIDADE USADAS NA BUSCA (v2.1.1)
+    configuracoes_elem = ET.SubElement(info, "configuracoes_busca")
+    for chave, valor in configuracoes.items():
+        ET.SubElement(configuracoes_elem, chave).text = valor
+    
+    # 🆕 Cada texto uma vez; os <arquivoN> apontam para ele pelo hash (v2.2.0)
+    textos_elem = ET.SubElement(info, "textos")
+    for texto, hash_do_texto in hashes_textos.items():
+        ET.SubElement(textos_elem, "texto", hash=hash_do_texto).text = texto
+    
+    caminho_temporario = caminho_xml + ".tmp"
+    try:
+        with open(caminho_temporario, 'w', encoding='utf-8') as f:
+            f.write("<?xml version='1.0' encoding='utf-8'?>\n<sessionlinner>\n")
+            escrever_elemento_xml(f, info)
+            for i, resultado in enumerate(resultados_ordenados, 1):
+                escrever_elemento_xml(f, elemento_resultado_xml(i, resultado, hashes_textos))
+            f.write("</sessionlinner>")
+        os.replace(caminho_temporario, caminho_xml)
+        return True
+    except Exception as e:
+        print(f"❌ ERRO ao salvar XML consolidado: {e}")
+        try:
+            os.remove(caminho_temporario)
+        except OSError:
+            pass
+        return False
+
+def salvar_xml_consolidado(resultados: List[ResultadoBusca], caminho_xml: Optional[str] = None,
+                           timestamp: Optional[str] = None, configuracoes: Optional[Dict[str, str]] = None,
+                           metricas: Optional['MetricasBusca'] = None) -> bool:
+    """Grava os resultados, ordenados por confiabilidade, no formato XML da sessão
+    
+    🆕 Desde a v2.2.0 é o formato de exportação: a sessão fica no SQLite (SessaoSQLite).
+    """
+    resultados_ordenados = ordenar_resultados_por_confiabilidade(resultados)
+    return escrever_xml_sessao(
+        caminho_xml or ARQUIVO_SESSAO,
+        resultados_ordenados,
+        len(resultados_ordenados),
+        ",".join(sorted(set(str(r.tipo) for r in resultados_ordenados))),
+        timestamp or datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        configuracoes or configuracoes_busca_atuais(),
+        mapear_textos_sessao(resultados_ordenados),
+        metricas
+    )
+
+def salvar_sessao_consolidada(resultados: List[ResultadoBusca]):
+    """🆕 Ranking + gravação da sessão no SQLite (e no XML, se EXPORTAR_XML_SESSAO) (v2.2.0)"""
+    if not resultados:
+        print("⚠️ Nenhum resultado para salvar na sessão")
+        return
+    
+    resultados_ordenados = ordenar_resultados_por_confiabilidade(resultados)
     
     print(f"\n🔄 ORDENANDO RESULTADOS POR CONFIABILIDADE:")
     for i, resultado in enumerate(resultados_ordenados, 1):
@@ -1126,239 +3568,493 @@ def salvar_xml_consolidado(resultados: List[ResultadoBusca]):
         sim_texto = f" (sim: {resultado.similaridade:.1f}%)" if resultado.similaridade else ""
         print(f"   {i}. 📁 {resultado.nome_arquivo} - TIPO{resultado.tipo} (score: {score:.1f}){sim_texto}")
     
-    root = ET.Element("sessionlinner")
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    configuracoes = configuracoes_busca_atuais()
+    try:
+        sessao = SessaoSQLite()
+        try:
+            sessao_id = sessao.salvar(resultados_ordenados, timestamp, configuracoes, metricas_ativas)
+        finally:
+            sessao.fechar()
+    except sqlite3.Error as e:
+        print(f"❌ ERRO ao salvar a sessão em {ARQUIVO_SESSAO_DB}: {e}")
+        return
     
-    info = ET.SubElement(root, "info")
-    ET.SubElement(info, "timestamp").text = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    ET.SubElement(info, "versao").text = "2.1.6-CORRECAO-COMPLETA"
-    ET.SubElement(info, "total_arquivos").text = str(len(resultados_ordenados))
-    ET.SubElement(info, "tipos_busca_executados").text = ",".join(sorted(set(str(r.tipo) for r in resultados_ordenados)))
-    ET.SubElement(info, "ordenacao").text = "score_confiabilidade DESC, similaridade DESC, nome ASC"
+    log_info(f"\n💾 SESSÃO SALVA COM SUCESSO!")
+    log_info(f"   📁 Arquivo: {ARQUIVO_SESSAO_DB} (sessão {sessao_id})")
+    log_info(f"   📊 Total de resultados: {len(resultados_ordenados)}")
+    log_info(f"   🆕 Versão: {VERSAO_FORMATO_SESSAO} (quebras de linha + BOM)")
+    if EXPORTAR_XML_SESSAO and salvar_xml_consolidado(resultados_ordenados, ARQUIVO_SESSAO, timestamp,
+                                                      configuracoes, metricas_ativas):
+        log_info(f"   📄 Exportado também para {ARQUIVO_SESSAO}")
     
-    # 🆕 SALVA CONFIGURAÇÕES DE QUALIDADE USADAS NA BUSCA (v2.1.1)
-    configuracoes = ET.SubElement(info, "configuracoes_busca")
-    ET.SubElement(configuracoes, "limite_probabilidade_melhor_resultado").text = str(LIMITE_PROBABILIDADE_MELHOR_RESULTADO)
-    ET.SubElement(configuracoes, "limite_similaridade_tipo5").text = str(LIMITE_SIMILARIDADE_TIPO5)
-    # 🆕 ADICIONA INFO SOBRE HOTFIX U+000D (v2.1.2)
-    ET.SubElement(configuracoes, "hotfix_carriage_return").text = "true"
-    ET.SubElement(configuracoes, "tipo6_ignorar_cr").text = "true"
-    # 🚨 NOVA INFO SOBRE CORREÇÃO BOM
-    ET.SubElement(configuracoes, "correcao_bom_utf8").text = "true"
-    ET.SubElement(configuracoes, "encoding_automatico").text = "utf-8-sig"
-    # 🆕 NOVA CORREÇÃO v2.1.6
-    ET.SubElement(configuracoes, "correcao_quebras_linha").text = "true"
-    ET.SubElement(configuracoes, "mapeamento_posicoes_preciso").text = "true"
+    # 🆕 CONTROLE DE QUALIDADE: Só mostra como "melhor resultado" se atender critério de probabilidade (v2.1.1)
+    melhor_resultado = resultados_ordenados[0]
+    probabilidade_melhor = melhor_resultado.similaridade if melhor_resultado.similaridade is not None else 100.0
     
-    for i, resultado in enumerate(resultados_ordenados, 1):
-        arquivo_elem = ET.SubElement(root, f"arquivo{i}")
-        
-        ET.SubElement(arquivo_elem, "nome").text = resultado.nome_arquivo
-        ET.SubElement(arquivo_elem, "caminho_completo").text = resultado.caminho_completo
-        
-        confiabilidade = ET.SubElement(arquivo_elem, "confiabilidade")
-        ET.SubElement(confiabilidade, "tipo_busca").text = str(resultado.tipo)
-        ET.SubElement(confiabilidade, "score_confiabilidade").text = f"{resultado.score_confiabilidade:.2f}"
-        if resultado.similaridade is not None:
-            ET.SubElement(confiabilidade, "similaridade_percentual").text = f"{resultado.similaridade:.2f}"
-        
-        posicoes = ET.SubElement(arquivo_elem, "posicoes")
-        ET.SubElement(posicoes, "inicio").text = str(resultado.posicao_inicio)
-        ET.SubElement(posicoes, "fim").text = str(resultado.posicao_fim)
-        ET.SubElement(posicoes, "tamanho_texto").text = str(resultado.tamanho_texto)
-        
-        validacao = ET.SubElement(posicoes, "validacao")
-        ET.SubElement(validacao, "posicoes_validadas").text = "true"
-        ET.SubElement(validacao, "metodo_calculo").text = "calcular_posicoes_precisas_v2_1_6_CORRECAO_COMPLETA"
-        ET.SubElement(validacao, "hotfix_carriage_return").text = "aplicado"
-        ET.SubElement(validacao, "correcao_bom_utf8").text = "aplicado"
-        ET.SubElement(validacao, "mapeamento_quebras_linha").text = "aplicado"
-        
-        texto_elem = ET.SubElement(arquivo_elem, "texto_encontrado")
-        ET.SubElement(texto_elem, "original").text = resultado.texto_original
-        ET.SubElement(texto_elem, "repr_original").text = repr(resultado.texto_original)
-        if resultado.texto_encontrado:
-            ET.SubElement(texto_elem, "encontrado").text = resultado.texto_encontrado
-            ET.SubElement(texto_elem, "repr_encontrado").text = repr(resultado.texto_encontrado)
-        
-        contexto = ET.SubElement(arquivo_elem, "contexto")
-        ET.SubElement(contexto, "inicio_contexto").text = str(resultado.contexto_inicio)
-        ET.SubElement(contexto, "fim_contexto").text = str(resultado.contexto_fim)
-        ET.SubElement(contexto, "texto_contexto").text = resultado.contexto_texto
+    if probabilidade_melhor >= LIMITE_PROBABILIDADE_MELHOR_RESULTADO:
+        print(f"   🏆 Melhor resultado: {melhor_resultado.nome_arquivo} (TIPO{melhor_resultado.tipo}, score: {melhor_resultado.score_confiabilidade:.1f}, prob: {probabilidade_melhor:.1f}%)")
+    else:
+        print(f"   📊 Primeiro resultado: {melhor_resultado.nome_arquivo} (TIPO{melhor_resultado.tipo}, score: {melhor_resultado.score_confiabilidade:.1f}, prob: {probabilidade_melhor:.1f}%)")
+        print(f"   ⚠️ Aviso: Probabilidade {probabilidade_melhor:.1f}% < {LIMITE_PROBABILIDADE_MELHOR_RESULTADO:.1f}% (limite mínimo para 'melhor resultado')")
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# 🆕 SESSÃO EM SQLITE: SESSÕES, RESULTADOS E CONFIGURAÇÕES (v2.2.0)
+# ═══════════════════════════════════════════════════════════════════════════════
+
+class SessaoSQLite:
+    """🆕 Banco da sessão: substitui o sessionlinner.xml como fonte do PASTE (v2.2.0)
+    
+    Cada busca vira uma linha em "sessoes"; os resultados guardam o ranking
+    ("posicao", 1 = melhor) e têm índices por (sessão, nome, score) e (sessão, score),
+    então "melhor resultado do arquivo X" é uma busca indexada, sem limite de resultados.
+    Textos grandes ficam uma vez em "textos" (por hash) e o contexto é resumido.
+    Só as LIMITE_SESSOES_GUARDADAS sessões mais recentes são mantidas.
+    """
+    
+    def __init__(self, caminho_db: Optional[str] = None):
+        self.caminho_db = caminho_db or ARQUIVO_SESSAO_DB
+        self.conexao = sqlite3.connect(self.caminho_db, timeout=30)
+        self.conexao.row_factory = sqlite3.Row
+        if self.conexao.execute("PRAGMA user_version").fetchone()[0] != VERSAO_ESQUEMA_SESSAO:
+            # Esquema antigo: as sessões são descartáveis, recria as tabelas
+            self.conexao.executescript(f"""
+                DROP TABLE IF EXISTS resultados;
+                DROP TABLE IF EXISTS textos;
+                DROP TABLE IF EXISTS configuracoes;
+                DROP TABLE IF EXISTS sessoes;
+                PRAGMA user_version = {VERSAO_ESQUEMA_SESSAO};
+            """)
+        self.conexao.executescript("""
+            CREATE TABLE IF NOT EXISTS sessoes (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp TEXT NOT NULL,
+                versao TEXT NOT NULL,
+                total_resultados INTEGER NOT NULL,
+                tipos_executados TEXT NOT NULL,
+                ordenacao TEXT NOT NULL,
+                metricas TEXT
+            );
+            CREATE TABLE IF NOT EXISTS configuracoes (
+                sessao_id INTEGER NOT NULL,
+                chave TEXT NOT NULL,
+                valor TEXT NOT NULL,
+                PRIMARY KEY (sessao_id, chave)
+            );
+            CREATE TABLE IF NOT EXISTS textos (
+                sessao_id INTEGER NOT NULL,
+                hash TEXT NOT NULL,
+                texto TEXT NOT NULL,
+                PRIMARY KEY (sessao_id, hash)
+            );
+            CREATE TABLE IF NOT EXISTS resultados (
+                sessao_id INTEGER NOT NULL,
+                posicao INTEGER NOT NULL,
+                nome TEXT NOT NULL,
+                caminho TEXT NOT NULL,
+                tipo INTEGER NOT NULL,
+                score REAL NOT NULL,
+                similaridade REAL,
+                inicio INTEGER NOT NULL,
+                fim INTEGER NOT NULL,
+                tamanho_texto INTEGER NOT NULL,
+                hash_original TEXT NOT NULL,
+                hash_encontrado TEXT,
+                contexto_inicio INTEGER NOT NULL,
+                contexto_fim INTEGER NOT NULL,
+                contexto_texto TEXT NOT NULL,
+                PRIMARY KEY (sessao_id, posicao)
+            );
+            CREATE INDEX IF NOT EXISTS idx_resultados_nome ON resultados (sessao_id, nome, score DESC, posicao);
+            CREATE INDEX IF NOT EXISTS idx_resultados_score ON resultados (sessao_id, score DESC, posicao);
+        """)
+    
+    def salvar(self, resultados_ordenados: List[ResultadoBusca], timestamp: str,
+               configuracoes: Dict[str, str], metricas: Optional['MetricasBusca'] = None) -> int:
+        """Grava uma sessão nova (uma transação) e devolve o id"""
+        hashes_textos = mapear_textos_sessao(resultados_ordenados)
+        with self.conexao:
+            cursor = self.conexao.execute(
+                "INSERT INTO sessoes (timestamp, versao, total_resultados, tipos_executados, ordenacao, metricas) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (timestamp, VERSAO_FORMATO_SESSAO, len(resultados_ordenados),
+                 ",".join(sorted(set(str(r.tipo) for r in resultados_ordenados))), ORDENACAO_SESSAO,
+                 json.dumps(asdict(metricas)) if metricas is not None else None)
+            )
+            sessao_id = cursor.lastrowid
+            self.conexao.executemany(
+                "INSERT INTO configuracoes (sessao_id, chave, valor) VALUES (?, ?, ?)",
+                [(sessao_id, chave, valor) for chave, valor in configuracoes.items()]
+            )
+            self.conexao.executemany(
+                "INSERT INTO textos (sessao_id, hash, texto) VALUES (?, ?, ?)",
+                [(sessao_id, hash_texto, texto) for texto, hash_texto in hashes_textos.items()]
+            )
+            self.conexao.executemany(
+                "INSERT INTO resultados VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(sessao_id, posicao, r.nome_arquivo, r.caminho_completo, r.tipo, round(r.score_confiabilidade, 2),
+                  r.similaridade, r.posicao_inicio, r.posicao_fim, r.tamanho_texto, hashes_textos[r.texto_original],
+                  hashes_textos[r.texto_encontrado] if r.texto_encontrado else None,
+                  r.contexto_inicio, r.contexto_fim, resumir_contexto(r.contexto_texto))
+                 for posicao, r in enumerate(resultados_ordenados, 1)]
+            )
+            self.remover_sessoes_antigas()
+        return sessao_id
+    
+    def remover_sessoes_antigas(self):
+        antigas = [(linha['id'],) for linha in self.conexao.execute(
+            "SELECT id FROM sessoes ORDER BY id DESC LIMIT -1 OFFSET ?", (LIMITE_SESSOES_GUARDADAS,)
+        )]
+        if antigas:
+            self.conexao.executemany("DELETE FROM resultados WHERE sessao_id = ?", antigas)
+            self.conexao.executemany("DELETE FROM textos WHERE sessao_id = ?", antigas)
+            self.conexao.executemany("DELETE FROM configuracoes WHERE sessao_id = ?", antigas)
+            self.conexao.executemany("DELETE FROM sessoes WHERE id = ?", antigas)
+    
+    def ultima_sessao(self) -> Optional[sqlite3.Row]:
+        return self.conexao.execute("SELECT * FROM sessoes ORDER BY id DESC LIMIT 1").fetchone()
+    
+    def configuracoes(self, sessao_id: int) -> Dict[str, str]:
+        return {linha['chave']: linha['valor'] for linha in self.conexao.execute(
+            "SELECT chave, valor FROM configuracoes WHERE sessao_id = ? ORDER BY rowid", (sessao_id,)
+        )}
+    
+    def textos(self, sessao_id: int) -> Dict[str, str]:
+        """hash → texto (o texto copiado e os trechos achados pelo TIPO 5, um de cada)"""
+        return {linha['hash']: linha['texto'] for linha in self.conexao.execute(
+            "SELECT hash, texto FROM textos WHERE sessao_id = ? ORDER BY rowid", (sessao_id,)
+        )}
+    
+    def resultados_filtrados(self, sessao_id: int, score_minimo: Optional[float] = None,
+                             tipos: Optional[set] = None) -> List[sqlite3.Row]:
+        """Resultados do PASTE em lote, na ordem do ranking (score >= mínimo e TIPO na lista)"""
+        consulta = "SELECT * FROM resultados WHERE sessao_id = ?"
+        parametros: List[Any] = [sessao_id]
+        if score_minimo is not None:
+            consulta += " AND score >= ?"
+            parametros.append(score_minimo)
+        if tipos:
+            consulta += f" AND tipo IN ({','.join('?' * len(tipos))})"
+            parametros.extend(sorted(tipos))
+        return self.conexao.execute(consulta + " ORDER BY posicao", parametros).fetchall()
+    
+    def melhor_resultado(self, sessao_id: int, nome_arquivo: Optional[str] = None) -> Optional[sqlite3.Row]:
+        """Maior score da sessão (ou do arquivo); empate fica com o primeiro do ranking"""
+        if nome_arquivo is None:
+            return self.conexao.execute(
+                "SELECT * FROM resultados WHERE sessao_id = ? ORDER BY score DESC, posicao LIMIT 1", (sessao_id,)
+            ).fetchone()
+        return self.conexao.execute(
+            "SELECT * FROM resultados WHERE sessao_id = ? AND nome = ? ORDER BY score DESC, posicao LIMIT 1",
+            (sessao_id, nome_arquivo)
+        ).fetchone()
+    
+    def resultados(self, sessao_id: int, limite: int = -1):
+        """Linhas de resultado na ordem do ranking (limite -1 = todas)"""
+        return self.conexao.execute(
+            "SELECT * FROM resultados WHERE sessao_id = ? ORDER BY posicao LIMIT ?", (sessao_id, limite)
+        )
+    
+    def fechar(self):
+        self.conexao.close()
+
+def resultado_de_linha_sessao(linha: sqlite3.Row, textos: Dict[str, str]) -> ResultadoBusca:
+    """🆕 Linha da tabela resultados → ResultadoBusca (exportação para XML) (v2.2.0)"""
+    return ResultadoBusca(
+        tipo=linha['tipo'],
+        nome_arquivo=linha['nome'],
+        caminho_completo=linha['caminho'],
+        posicao_inicio=linha['inicio'],
+        posicao_fim=linha['fim'],
+        tamanho_texto=linha['tamanho_texto'],
+        texto_original=textos[linha['hash_original']],
+        contexto_inicio=linha['contexto_inicio'],
+        contexto_fim=linha['contexto_fim'],
+        contexto_texto=linha['contexto_texto'],
+        similaridade=linha['similaridade'],
+        texto_encontrado=textos[linha['hash_encontrado']] if linha['hash_encontrado'] else None
+    )
+
+def ler_posicoes_sessao(arquivo_especifico=None):
+    """🆕 Melhor resultado da última sessão (ou do arquivo pedido) para o PASTE (v2.2.0)
+    
+    Lê do banco SQLite; sem banco, cai no sessionlinner.xml de versões anteriores.
+    Retorna o mesmo dicionário de ler_xml_posicoes.
+    """
+    if not os.path.exists(ARQUIVO_SESSAO_DB):
+        if os.path.exists(ARQUIVO_SESSAO):
+            return ler_xml_posicoes(arquivo_especifico)
+        print(f"❌ ERRO: Sessão {ARQUIVO_SESSAO_DB} não encontrada!")
+        print("   Execute primeiro: python pythonsearch.py (sem parâmetros)")
+        return None
+    
+    try:
+        sessao = SessaoSQLite()
+        try:
+            return ler_posicoes_sessao_sqlite(sessao, arquivo_especifico)
+        finally:
+            sessao.fechar()
+    except sqlite3.Error as e:
+        print(f"❌ ERRO ao ler a sessão {ARQUIVO_SESSAO_DB}: {e}")
+        return None
+
+def ler_posicoes_sessao_sqlite(sessao: SessaoSQLite, arquivo_especifico):
+    linha_sessao = sessao.ultima_sessao()
+    if linha_sessao is None:
+        print("❌ ERRO: Nenhuma sessão salva!")
+        return None
+    sessao_id = linha_sessao['id']
+    print(f"📋 Carregando sessão {sessao_id} de {linha_sessao['timestamp']} (versão {linha_sessao['versao']}, "
+          f"{linha_sessao['total_resultados']} resultado(s))")
+    
+    # 🆕 LÊ CONFIGURAÇÕES DE QUALIDADE SALVAS NA SESSÃO (v2.1.1)
+    configuracoes = sessao.configuracoes(sessao_id)
+    if 'limite_probabilidade_melhor_resultado' in configuracoes:
+        limite_probabilidade = float(configuracoes['limite_probabilidade_melhor_resultado'])
+        print(f"🎯 Limite de probabilidade usado na busca: {limite_probabilidade:.1f}%")
+        if limite_probabilidade != LIMITE_PROBABILIDADE_MELHOR_RESULTADO:
+            print(f"⚠️ Aviso: Limite atual ({LIMITE_PROBABILIDADE_MELHOR_RESULTADO:.1f}%) difere do usado na busca ({limite_probabilidade:.1f}%)")
+    else:
+        limite_probabilidade = LIMITE_PROBABILIDADE_MELHOR_RESULTADO
+    
+    if arquivo_especifico:
+        print(f"🔍 BUSCANDO ARQUIVO ESPECÍFICO: {arquivo_especifico}")
+    linha = sessao.melhor_resultado(sessao_id, arquivo_especifico or None)
+    
+    if linha is None:
+        if not arquivo_especifico:
+            print("❌ ERRO: Nenhum resultado na sessão!")
+            return None
+        print(f"❌ ERRO: Arquivo '{arquivo_especifico}' não encontrado na sessão!")
+        print("📋 ARQUIVOS DISPONÍVEIS:")
+        for disponivel in sessao.resultados(sessao_id, LIMITE_ARQUIVOS_LISTADOS):
+            print(f"   {disponivel['posicao']}. 📁 {disponivel['nome']} (score: {disponivel['score']:.1f})")
+        if linha_sessao['total_resultados'] > LIMITE_ARQUIVOS_LISTADOS:
+            print(f"   ... e mais {linha_sessao['total_resultados'] - LIMITE_ARQUIVOS_LISTADOS} resultado(s)")
+        return None
+    
+    info = {
+        'arquivo': linha['nome'],
+        'caminho': linha['caminho'],
+        'inicio': linha['inicio'],
+        'fim': linha['fim'],
+        'timestamp': linha_sessao['timestamp'],
+        'similaridade': linha['similaridade'],
+        'score': linha['score'],
+        'tipo': str(linha['tipo']),
+        'limite_probabilidade_busca': limite_probabilidade,
+        'versao': linha_sessao['versao']
+    }
+    
+    if arquivo_especifico:
+        print("📋 MELHOR RESULTADO ENCONTRADO (ARQUIVO ESPECÍFICO):")
+    else:
+        print("📋 RESULTADO DE MAIOR CONFIABILIDADE CARREGADO:")
+    print(f"   📁 Arquivo: {info['arquivo']}")
+    print(f"   📍 Posição: {info['inicio']} até {info['fim']}")
+    print(f"   🏆 Score: {info['score']:.1f} (TIPO{info['tipo']})")
+    if info['similaridade']:
+        print(f"   🎯 Similaridade: {info['similaridade']:.1f}%")
+        # 🆕 CONTROLE DE QUALIDADE: Usa limite da busca original (v2.1.1)
+        if info['similaridade'] < limite_probabilidade:
+            print(f"   ⚠️ Aviso: Probabilidade {info['similaridade']:.1f}% < {limite_probabilidade:.1f}% (abaixo do limite usado na busca)")
+    print(f"   🕒 Salvo em: {info['timestamp']}")
+    return info
+
+def exportar_sessao_xml(caminho_xml: Optional[str] = None) -> bool:
+    """🆕 "export": grava a última sessão do SQLite no formato sessionlinner.xml (v2.2.0)
+    
+    Os resultados vão do cursor direto para o XML, já na ordem do ranking.
+    """
+    caminho_xml = caminho_xml or ARQUIVO_SESSAO
+    if not os.path.exists(ARQUIVO_SESSAO_DB):
+        print(f"❌ ERRO: Sessão {ARQUIVO_SESSAO_DB} não encontrada!")
+        return False
     
     try:
-        tree = ET.ElementTree(root)
-        ET.indent(tree, space="  ", level=0)
-        tree.write("sessionlinner.xml", encoding="utf-8", xml_declaration=True)
-        
-        print(f"\n💾 XML CONSOLIDADO SALVO COM SUCESSO!")
-        print(f"   📁 Arquivo: sessionlinner.xml")
-        print(f"   📊 Total de resultados: {len(resultados_ordenados)}")
-        print(f"   🆕 Versão: 2.1.6-CORRECAO-COMPLETA (quebras de linha + BOM)")
-        
-        # 🆕 CONTROLE DE QUALIDADE: Só mostra como "melhor resultado" se atender critério de probabilidade (v2.1.1)
-        melhor_resultado = resultados_ordenados[0]
-        probabilidade_melhor = melhor_resultado.similaridade if melhor_resultado.similaridade is not None else 100.0
-        
-        if probabilidade_melhor >= LIMITE_PROBABILIDADE_MELHOR_RESULTADO:
-            print(f"   🏆 Melhor resultado: {melhor_resultado.nome_arquivo} (TIPO{melhor_resultado.tipo}, score: {melhor_resultado.score_confiabilidade:.1f}, prob: {probabilidade_melhor:.1f}%)")
-        else:
-            print(f"   📊 Primeiro resultado: {melhor_resultado.nome_arquivo} (TIPO{melhor_resultado.tipo}, score: {melhor_resultado.score_confiabilidade:.1f}, prob: {probabilidade_melhor:.1f}%)")
-            print(f"   ⚠️ Aviso: Probabilidade {probabilidade_melhor:.1f}% < {LIMITE_PROBABILIDADE_MELHOR_RESULTADO:.1f}% (limite mínimo para 'melhor resultado')")
-        
-    except Exception as e:
-        print(f"❌ ERRO ao salvar XML consolidado: {e}")
+        sessao = SessaoSQLite()
+        try:
+            linha_sessao = sessao.ultima_sessao()
+            if linha_sessao is None:
+                print("❌ ERRO: Nenhuma sessão salva!")
+                return False
+            metricas = MetricasBusca(**json.loads(linha_sessao['metricas'])) if linha_sessao['metricas'] else None
+            textos = sessao.textos(linha_sessao['id'])
+            sucesso = escrever_xml_sessao(
+                caminho_xml,
+                (resultado_de_linha_sessao(linha, textos) for linha in sessao.resultados(linha_sessao['id'])),
+                linha_sessao['total_resultados'],
+                linha_sessao['tipos_executados'],
+                linha_sessao['timestamp'],
+                sessao.configuracoes(linha_sessao['id']),
+                {texto: hash_do_texto for hash_do_texto, texto in textos.items()},
+                metricas
+            )
+        finally:
+            sessao.fechar()
+    except sqlite3.Error as e:
+        print(f"❌ ERRO ao ler a sessão {ARQUIVO_SESSAO_DB}: {e}")
+        return False
+    
+    if sucesso:
+        print(f"📄 Sessão {linha_sessao['id']} ({linha_sessao['total_resultados']} resultado(s)) exportada para {caminho_xml}")
+    return sucesso
 
 # ═══════════════════════════════════════════════════════════════════════════════
 # 🔧 FUNÇÃO DE LEITURA XML
 # ═══════════════════════════════════════════════════════════════════════════════
 
+def dados_resultado_xml(arquivo_elem) -> Dict[str, Any]:
+    """🆕 Campos de um <arquivoN> usados pelo PASTE (v2.2.0)"""
+    score_elem = arquivo_elem.find('confiabilidade/score_confiabilidade')
+    tipo_elem = arquivo_elem.find('confiabilidade/tipo_busca')
+    similaridade_elem = arquivo_elem.find('confiabilidade/similaridade_percentual')
+    if similaridade_elem is None:
+        similaridade_elem = arquivo_elem.find('similaridade_percentual')  # XMLs antigos
+    return {
+        'arquivo': arquivo_elem.find('nome').text,
+        'caminho': arquivo_elem.find('caminho_completo').text,
+        'inicio': int(arquivo_elem.find('posicoes/inicio').text),
+        'fim': int(arquivo_elem.find('posicoes/fim').text),
+        'similaridade': float(similaridade_elem.text) if similaridade_elem is not None else None,
+        'score': float(score_elem.text) if score_elem is not None else 0,
+        'tipo': tipo_elem.text if tipo_elem is not None else "?",
+    }
+
+def ler_info_xml(info) -> Dict[str, Any]:
+    """🆕 Lê e mostra o bloco <info> da sessão (versão, correções e limite de probabilidade) (v2.2.0)"""
+    versao_elem = info.find('versao')
+    versao = versao_elem.text if versao_elem is not None else "anterior"
+    print(f"📋 Carregando XML versão: {versao}")
+    
+    # 🆕 VERIFICA SE TEM HOTFIX U+000D (v2.1.2)
+    hotfix_elem = info.find('configuracoes_busca/hotfix_carriage_return')
+    if hotfix_elem is not None and hotfix_elem.text == "true":
+        print("🔧 XML com HOTFIX U+000D ativado")
+    else:
+        print("⚠️ XML sem HOTFIX U+000D (versão anterior)")
+    
+    # 🚨 VERIFICA CORREÇÃO BOM
+    bom_elem = info.find('configuracoes_busca/correcao_bom_utf8')
+    if bom_elem is not None and bom_elem.text == "true":
+        print("🔧 XML com CORREÇÃO BOM UTF-8 ativada")
+    else:
+        print("⚠️ XML sem correção BOM (versão anterior)")
+    
+    # 🆕 VERIFICA CORREÇÃO QUEBRAS v2.1.6
+    quebras_elem = info.find('configuracoes_busca/correcao_quebras_linha')
+    if quebras_elem is not None and quebras_elem.text == "true":
+        print("🔧 XML com CORREÇÃO QUEBRAS DE LINHA ativada")
+    else:
+        print("⚠️ XML sem correção quebras de linha (versão anterior)")
+    
+    # 🆕 INFO SOBRE FILTRO DE BACKUP (v2.1.4)
+    if versao in ['2.1.4', '2.1.4-CORRECAO-BOM', '2.1.6-CORRECAO-COMPLETA']:
+        print("🗂️ Filtro de arquivos de backup ativado")
+    
+    # 🆕 LÊ CONFIGURAÇÕES DE QUALIDADE SALVAS NO XML (v2.1.1)
+    limite_prob_elem = info.find('configuracoes_busca/limite_probabilidade_melhor_resultado')
+    if limite_prob_elem is not None:
+        limite_probabilidade_xml = float(limite_prob_elem.text)
+        print(f"🎯 Limite de probabilidade usado na busca: {limite_probabilidade_xml:.1f}%")
+        if limite_probabilidade_xml != LIMITE_PROBABILIDADE_MELHOR_RESULTADO:
+            print(f"⚠️ Aviso: Limite atual ({LIMITE_PROBABILIDADE_MELHOR_RESULTADO:.1f}%) difere do usado na busca ({limite_probabilidade_xml:.1f}%)")
+    else:
+        limite_probabilidade_xml = LIMITE_PROBABILIDADE_MELHOR_RESULTADO  # Fallback para XMLs antigos
+    
+    timestamp_elem = info.find('timestamp')
+    ordenacao_elem = info.find('ordenacao')
+    return {
+        'versao': versao,
+        'timestamp': timestamp_elem.text if timestamp_elem is not None else "?",
+        'limite_probabilidade_busca': limite_probabilidade_xml,
+        # Ranking gravado do maior score para o menor: o primeiro <arquivoN> que serve já é o melhor
+        'ordenado': ordenacao_elem is not None and (ordenacao_elem.text or "").startswith("score_confiabilidade DESC"),
+    }
+
 def ler_xml_posicoes(arquivo_especifico=None):
-    """Lê XML e sempre retorna o de MAIOR SCORE"""
-    if not os.path.exists("sessionlinner.xml"):
-        print("❌ ERRO: Arquivo sessionlinner.xml não encontrado!")
+    """Lê XML e sempre retorna o de MAIOR SCORE
+    
+    🆕 v2.2.0: lê em fluxo (ET.iterparse), descartando cada <arquivoN> depois de
+    olhar, e para no primeiro que serve quando o XML está ordenado por score —
+    sem limite de resultados e sem carregar a sessão inteira.
+    """
+    if not os.path.exists(ARQUIVO_SESSAO):
+        print(f"❌ ERRO: Arquivo {ARQUIVO_SESSAO} não encontrado!")
         print("   Execute primeiro: python pythonsearch.py (sem parâmetros)")
         return None
     
     try:
-        tree = ET.parse("sessionlinner.xml")
-        root = tree.getroot()
-        
-        versao_elem = root.find('info/versao')
-        versao = versao_elem.text if versao_elem is not None else "anterior"
-        print(f"📋 Carregando XML versão: {versao}")
-        
-        # 🆕 VERIFICA SE TEM HOTFIX U+000D (v2.1.2)
-        hotfix_elem = root.find('info/configuracoes_busca/hotfix_carriage_return')
-        if hotfix_elem is not None and hotfix_elem.text == "true":
-            print("🔧 XML com HOTFIX U+000D ativado")
-        else:
-            print("⚠️ XML sem HOTFIX U+000D (versão anterior)")
-        
-        # 🚨 VERIFICA CORREÇÃO BOM
-        bom_elem = root.find('info/configuracoes_busca/correcao_bom_utf8')
-        if bom_elem is not None and bom_elem.text == "true":
-            print("🔧 XML com CORREÇÃO BOM UTF-8 ativada")
-        else:
-            print("⚠️ XML sem correção BOM (versão anterior)")
-        
-        # 🆕 VERIFICA CORREÇÃO QUEBRAS v2.1.6
-        quebras_elem = root.find('info/configuracoes_busca/correcao_quebras_linha')
-        if quebras_elem is not None and quebras_elem.text == "true":
-            print("🔧 XML com CORREÇÃO QUEBRAS DE LINHA ativada")
-        else:
-            print("⚠️ XML sem correção quebras de linha (versão anterior)")
-        
-        # 🆕 INFO SOBRE FILTRO DE BACKUP (v2.1.4)
-        if versao in ['2.1.4', '2.1.4-CORRECAO-BOM', '2.1.6-CORRECAO-COMPLETA']:
-            print("🗂️ Filtro de arquivos de backup ativado")
-        
-        # 🆕 LÊ CONFIGURAÇÕES DE QUALIDADE SALVAS NO XML (v2.1.1)
-        limite_probabilidade_xml = None
-        limite_prob_elem = root.find('info/configuracoes_busca/limite_probabilidade_melhor_resultado')
-        if limite_prob_elem is not None:
-            limite_probabilidade_xml = float(limite_prob_elem.text)
-            print(f"🎯 Limite de probabilidade usado na busca: {limite_probabilidade_xml:.1f}%")
-            if limite_probabilidade_xml != LIMITE_PROBABILIDADE_MELHOR_RESULTADO:
-                print(f"⚠️ Aviso: Limite atual ({LIMITE_PROBABILIDADE_MELHOR_RESULTADO:.1f}%) difere do usado na busca ({limite_probabilidade_xml:.1f}%)")
-        else:
-            limite_probabilidade_xml = LIMITE_PROBABILIDADE_MELHOR_RESULTADO  # Fallback para XMLs antigos
+        info_sessao = None
+        melhor_resultado = None
+        disponiveis = []
+        total_arquivos = 0
+        profundidade = 0
         
-        if arquivo_especifico:
-            print(f"🔍 BUSCANDO ARQUIVO ESPECÍFICO: {arquivo_especifico}")
-            
-            melhor_resultado = None
-            melhor_score = -1
-            
-            for i in range(1, 21):
-                arquivo_elem = root.find(f'arquivo{i}')
-                if arquivo_elem is None:
+        with open(ARQUIVO_SESSAO, 'rb') as f:
+            eventos = ET.iterparse(f, events=('start', 'end'))
+            _, raiz = next(eventos)
+            for evento, elemento in eventos:
+                if evento == 'start':
+                    profundidade += 1
                     continue
+                profundidade -= 1
+                if profundidade != 0:
+                    continue  # Elemento interno: lido junto com o pai
                 
-                nome_arquivo = arquivo_elem.find('nome').text
-                if nome_arquivo == arquivo_especifico:
-                    score_elem = arquivo_elem.find('confiabilidade/score_confiabilidade')
-                    score = float(score_elem.text) if score_elem is not None else 0
-                    
-                    if score > melhor_score:
-                        melhor_score = score
-                        
-                        similaridade_elem = arquivo_elem.find('confiabilidade/similaridade_percentual') or arquivo_elem.find('similaridade_percentual')
-                        similaridade = float(similaridade_elem.text) if similaridade_elem is not None else None
-                        
-                        melhor_resultado = {
-                            'arquivo': nome_arquivo,
-                            'caminho': arquivo_elem.find('caminho_completo').text,
-                            'inicio': int(arquivo_elem.find('posicoes/inicio').text),
-                            'fim': int(arquivo_elem.find('posicoes/fim').text),
-                            'timestamp': root.find('info/timestamp').text,
-                            'similaridade': similaridade,
-                            'score': score,
-                            'tipo': arquivo_elem.find('confiabilidade/tipo_busca').text if arquivo_elem.find('confiabilidade/tipo_busca') is not None else "?",
-                            'limite_probabilidade_busca': limite_probabilidade_xml,  # 🆕 Passa o limite usado na busca
-                            'versao': versao
-                        }
-            
-            if melhor_resultado:
-                print("📋 MELHOR RESULTADO ENCONTRADO (ARQUIVO ESPECÍFICO):")
-                print(f"   📁 Arquivo: {melhor_resultado['arquivo']}")
-                print(f"   📍 Posição: {melhor_resultado['inicio']} até {melhor_resultado['fim']}")
-                print(f"   🏆 Score: {melhor_resultado['score']:.1f} (TIPO{melhor_resultado['tipo']})")
-                if melhor_resultado['similaridade']:
-                    print(f"   🎯 Similaridade: {melhor_resultado['similaridade']:.1f}%")
-                    # 🆕 CONTROLE DE QUALIDADE: Usa limite da busca original (v2.1.1)
-                    limite_usado = melhor_resultado.get('limite_probabilidade_busca', limite_probabilidade_xml)
-                    if melhor_resultado['similaridade'] < limite_usado:
-                        print(f"   ⚠️ Aviso: Probabilidade {melhor_resultado['similaridade']:.1f}% < {limite_usado:.1f}% (abaixo do limite usado na busca)")
-                print(f"   🕒 Salvo em: {melhor_resultado['timestamp']}")
-                return melhor_resultado
-            
-            print(f"❌ ERRO: Arquivo '{arquivo_especifico}' não encontrado no XML!")
-            print("📋 ARQUIVOS DISPONÍVEIS:")
-            for i in range(1, 21):
-                arquivo_elem = root.find(f'arquivo{i}')
-                if arquivo_elem is not None:
-                    nome = arquivo_elem.find('nome').text
-                    score_elem = arquivo_elem.find('confiabilidade/score_confiabilidade')
-                    score_texto = f" (score: {float(score_elem.text):.1f})" if score_elem is not None else ""
-                    print(f"   {i}. 📁 {nome}{score_texto}")
+                if elemento.tag == 'info':
+                    info_sessao = ler_info_xml(elemento)
+                    if arquivo_especifico:
+                        print(f"🔍 BUSCANDO ARQUIVO ESPECÍFICO: {arquivo_especifico}")
+                elif elemento.tag.startswith('arquivo'):
+                    total_arquivos += 1
+                    nome_arquivo = elemento.find('nome').text
+                    if arquivo_especifico is None or nome_arquivo == arquivo_especifico:
+                        dados = dados_resultado_xml(elemento)
+                        if melhor_resultado is None or dados['score'] > melhor_resultado['score']:
+                            melhor_resultado = dados
+                        if info_sessao is not None and info_sessao['ordenado']:
+                            break
+                    elif len(disponiveis) < LIMITE_ARQUIVOS_LISTADOS:
+                        score_elem = elemento.find('confiabilidade/score_confiabilidade')
+                        disponiveis.append((nome_arquivo, float(score_elem.text) if score_elem is not None else None))
+                raiz.clear()  # Libera o elemento já lido
+        
+        if info_sessao is None:
+            print("❌ ERRO: XML sem bloco <info>!")
             return None
         
-        arquivo_elem = root.find('arquivo1')
-        if arquivo_elem is None:
-            print("❌ ERRO: Nenhum arquivo encontrado no XML!")
+        if melhor_resultado is None:
+            if not arquivo_especifico:
+                print("❌ ERRO: Nenhum arquivo encontrado no XML!")
+                return None
+            print(f"❌ ERRO: Arquivo '{arquivo_especifico}' não encontrado no XML!")
+            print("📋 ARQUIVOS DISPONÍVEIS:")
+            for i, (nome, score) in enumerate(disponiveis, 1):
+                score_texto = f" (score: {score:.1f})" if score is not None else ""
+                print(f"   {i}. 📁 {nome}{score_texto}")
+            if total_arquivos > len(disponiveis):
+                print(f"   ... e mais {total_arquivos - len(disponiveis)} resultado(s)")
             return None
         
-        score_elem = arquivo_elem.find('confiabilidade/score_confiabilidade')
-        score = float(score_elem.text) if score_elem is not None else 0
-        
-        tipo_elem = arquivo_elem.find('confiabilidade/tipo_busca')
-        tipo = tipo_elem.text if tipo_elem is not None else "?"
-        
-        similaridade_elem = arquivo_elem.find('confiabilidade/similaridade_percentual') or arquivo_elem.find('similaridade_percentual')
-        similaridade = float(similaridade_elem.text) if similaridade_elem is not None else None
-        
-        info = {
-            'arquivo': arquivo_elem.find('nome').text,
-            'caminho': arquivo_elem.find('caminho_completo').text,
-            'inicio': int(arquivo_elem.find('posicoes/inicio').text),
-            'fim': int(arquivo_elem.find('posicoes/fim').text),
-            'timestamp': root.find('info/timestamp').text,
-            'similaridade': similaridade,
-            'score': score,
-            'tipo': tipo,
-            'limite_probabilidade_busca': limite_probabilidade_xml,  # 🆕 Passa o limite usado na busca
-            'versao': versao
-        }
+        limite_probabilidade_xml = info_sessao['limite_probabilidade_busca']
+        info = dict(melhor_resultado,
+                    timestamp=info_sessao['timestamp'],
+                    limite_probabilidade_busca=limite_probabilidade_xml,  # 🆕 Passa o limite usado na busca
+                    versao=info_sessao['versao'])
         
-        print("📋 RESULTADO DE MAIOR CONFIABILIDADE CARREGADO:")
+        if arquivo_especifico:
+            print("📋 MELHOR RESULTADO ENCONTRADO (ARQUIVO ESPECÍFICO):")
+        else:
+            print("📋 RESULTADO DE MAIOR CONFIABILIDADE CARREGADO:")
         print(f"   📁 Arquivo: {info['arquivo']}")
         print(f"   📍 Posição: {info['inicio']} até {info['fim']}")
         print(f"   🏆 Score: {info['score']:.1f} (TIPO{info['tipo']})")
-        if similaridade:
-            print(f"   🎯 Similaridade: {similaridade:.1f}%")
+        if info['similaridade']:
+            print(f"   🎯 Similaridade: {info['similaridade']:.1f}%")
             # 🆕 CONTROLE DE QUALIDADE: Usa limite da busca original (v2.1.1)
-            if similaridade < limite_probabilidade_xml:
-                print(f"   ⚠️ Aviso: Probabilidade {similaridade:.1f}% < {limite_probabilidade_xml:.1f}% (abaixo do limite usado na busca)")
+            if info['similaridade'] < limite_probabilidade_xml:
+                print(f"   ⚠️ Aviso: Probabilidade {info['similaridade']:.1f}% < {limite_probabilidade_xml:.1f}% (abaixo do limite usado na busca)")
         print(f"   🕒 Salvo em: {info['timestamp']}")
         
         return info
@@ -1371,19 +4067,26 @@ def ler_xml_posicoes(arquivo_especifico=None):
 # 🔧 FUNÇÃO PASTE CORRIGIDA v2.1.6
 # ═══════════════════════════════════════════════════════════════════════════════
 
-def colar_nas_coordenadas(arquivo_especifico=None):
-    """Cola o conteúdo do Ctrl+C nas coordenadas salvas com CORREÇÃO AUTOMÁTICA v2.1.6"""
+def colar_nas_coordenadas(arquivo_especifico=None, texto_novo=None, fazer_backup: bool = True):
+    """Cola o conteúdo do Ctrl+C nas coordenadas salvas com CORREÇÃO AUTOMÁTICA v2.1.6
+    
+    🆕 texto_novo: texto a colar no lugar da área de transferência (benchmark, v2.2.0)
+    🆕 Transação (v2.2.0): o arquivo é lido uma vez; backup e arquivo novo saem desses
+    bytes, e a gravação é atômica (gravar_arquivo_atomico). fazer_backup=False: benchmark.
+    """
     if arquivo_especifico:
         print(f"📋 MODO PASTE ESPECÍFICO: {arquivo_especifico}")
     else:
         print("📋 MODO PASTE: Colando nas coordenadas salvas")
     print("=" * 80)
     
-    posicoes = ler_xml_posicoes(arquivo_especifico)
+    posicoes = ler_posicoes_sessao(arquivo_especifico)
     if not posicoes:
+        print("❌ ERRO: Não foi possível obter informações do arquivo. PASTE cancelado!")
         return
     
-    texto_novo = obter_texto_copiado()
+    if texto_novo is None:
+        texto_novo = obter_texto_copiado()
     if not texto_novo:
         print("❌ ERRO: Nenhum texto na área de transferência para colar!")
         return
@@ -1402,15 +4105,20 @@ def colar_nas_coordenadas(arquivo_especifico=None):
         return
     
     try:
-        # 🚨 CORREÇÃO: Usa leitura corrigida com BOM
-        conteudo_original = ler_arquivo(posicoes['caminho'])
+        # 🚨 CORREÇÃO: Usa leitura corrigida com BOM (snapshot único v2.2.0)
+        # 🆕 Única leitura do arquivo na transação: backup e conteúdo novo saem destes bytes
+        with open(posicoes['caminho'], 'rb') as f:
+            stat_original = os.fstat(f.fileno())
+            dados_originais = f.read()
+        snapshot = snapshot_de_bytes(posicoes['caminho'], stat_original, dados_originais)
+        conteudo_original = snapshot.conteudo
         
         print(f"\n📁 ARQUIVO CARREGADO: {posicoes['arquivo']}")
         print(f"   📏 Tamanho original: {len(conteudo_original)} caracteres")
         print(f"   🔧 XML versão: {posicoes.get('versao', 'anterior')}")
         
         # 🚨 CORREÇÃO AUTOMÁTICA DE COORDENADAS v2.1.6
-        info_encoding = detectar_bom_e_encoding(posicoes['caminho'])
+        info_encoding = obter_info_encoding_arquivo(posicoes['caminho'], snapshot)
         offset_bom = info_encoding['bom_size'] if info_encoding['has_bom'] else 0
         
         # Ajusta coordenadas removendo offset BOM (pois conteúdo foi lido sem BOM)
@@ -1448,6 +4156,7 @@ def colar_nas_coordenadas(arquivo_especifico=None):
             
             # Tenta busca direta primeiro
             pos_direta = conteudo_original.find(texto_novo)
+            fim_encontrado = pos_direta + len(texto_novo)
             
             if pos_direta == -1:
                 # Tenta com normalização
@@ -1459,18 +4168,13 @@ def colar_nas_coordenadas(arquivo_especifico=None):
                     print(f"✅ Encontrado após normalização na posição {pos_norm}")
                     
                     # Mapeia de volta para original
-                    contador = 0
-                    for i, char in enumerate(conteudo_original):
-                        if contador >= pos_norm:
-                            pos_direta = i
-                            break
-                        if char == '\r' and i + 1 < len(conteudo_original) and conteudo_original[i + 1] == '\n':
-                            continue
-                        contador += 1
+                    pos_direta, fim_encontrado = MapaOffsetsQuebras(conteudo_original).trecho_original(
+                        pos_norm, len(texto_novo_norm)
+                    )
             
             if pos_direta != -1:
                 inicio_ajustado = pos_direta
-                fim_ajustado = pos_direta + len(texto_novo)
+                fim_ajustado = fim_encontrado
                 print(f"✅ POSIÇÃO CORRETA ENCONTRADA: {inicio_ajustado} até {fim_ajustado}")
                 print(f"   📊 Diferença das coordenadas XML: {inicio_ajustado - (posicoes['inicio'] - offset_bom)} chars")
             else:
@@ -1521,62 +4225,143 @@ def colar_nas_coordenadas(arquivo_especifico=None):
         texto_novo_final = texto_novo
         novo_conteudo = conteudo_original[:inicio] + texto_novo_final + conteudo_original[fim:]
         
-        # 🚨 CORREÇÃO: Salva com encoding UTF-8 sem BOM (padrão)
-        with open(posicoes['caminho'], 'w', encoding='utf-8', newline='') as f:
-            f.write(novo_conteudo)
+        if fazer_backup:
+            print("\n🔄 CRIANDO BACKUP ANTES DA MODIFICAÇÃO...")
+            if not criar_backup_antes_paste(posicoes['caminho'], dados_originais, stat_original):
+                print("❌ ERRO: Não foi possível criar backup. PASTE cancelado por segurança!")
+                return
+            print("✅ Backup criado! Prosseguindo com PASTE...")
+        
+        dados_novos = codificar_conteudo_colado(novo_conteudo)
+        hash_gravado = gravar_arquivo_atomico(posicoes['caminho'], dados_novos, stat_original)
         
         print(f"\n✅ PASTE REALIZADO COM SUCESSO!")
         print(f"   📁 Arquivo: {posicoes['arquivo']}")
         print(f"   📏 Novo tamanho: {len(novo_conteudo)} caracteres")
         print(f"   📝 Diferença: {len(novo_conteudo) - len(conteudo_original):+d} caracteres")
+        print(f"✅ Verificação: Arquivo salvo corretamente! (blake2b {hash_gravado[:16]})")
         
-        # Verificação usando leitura corrigida
-        conteudo_verificacao = ler_arquivo(posicoes['caminho'])
-        
-        if len(conteudo_verificacao) == len(novo_conteudo):
-            print("✅ Verificação: Arquivo salvo corretamente!")
-            
-            texto_verificacao = conteudo_verificacao[inicio:inicio + len(texto_novo)]
-            if texto_verificacao == texto_novo:
-                print("✅ Verificação final: Texto colado exatamente na posição correta!")
-            else:
-                print("⚠️ Aviso: Texto pode ter sido colado com pequenos ajustes de formatação")
+        # Como o arquivo será lido de volta (modo texto), sem reler o disco
+        texto_verificacao = decodificar_como_modo_texto(dados_novos, 'utf-8')[inicio:inicio + len(texto_novo)]
+        if texto_verificacao == texto_novo:
+            print("✅ Verificação final: Texto colado exatamente na posição correta!")
         else:
-            print("⚠️ Aviso: Tamanho do arquivo diferente do esperado após salvamento")
+            print("⚠️ Aviso: Texto pode ter sido colado com pequenos ajustes de formatação")
         
+    except OSError as e:
+        print(f"❌ ERRO de leitura/gravação em {posicoes['arquivo']}: {e}")
+        print("   📂 Arquivo original intacto (gravação atômica)")
     except Exception as e:
         print(f"❌ ERRO ao processar arquivo: {e}")
         import traceback
         traceback.print_exc()
 
-def criar_backup_antes_paste(caminho_arquivo):
-    """Cria backup do arquivo antes de fazer modificações no modo paste com verificação de timezone"""
+def codificar_conteudo_colado(conteudo: str) -> bytes:
+    """🆕 Bytes gravados depois do PASTE (v2.2.0)"""
+    # 🚨 CORREÇÃO: Salva com encoding UTF-8 sem BOM (padrão)
+    return conteudo.encode('utf-8')
+
+def hash_arquivo(caminho: str) -> str:
+    """🆕 blake2b do arquivo lido em blocos (sem decodificar) (v2.2.0)"""
+    digest = hashlib.blake2b()
+    with open(caminho, 'rb') as f:
+        for bloco in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(bloco)
+    return digest.hexdigest()
+
+def gravar_arquivo_atomico(caminho: str, dados: bytes, stat_original: Optional[os.stat_result] = None) -> str:
+    """🆕 Grava via temporário na mesma pasta + fsync + os.replace; retorna o blake2b gravado (v2.2.0)
+    
+    O temporário é conferido pelo hash antes de substituir o original, então um
+    crash ou disco cheio deixa o arquivo antigo ou o novo, nunca metade de um.
+    Permissões vêm de stat_original. Levanta OSError se algo falhar (original intacto).
+    """
+    esperado = hashlib.blake2b(dados).hexdigest()
+    diretorio = os.path.dirname(os.path.abspath(caminho))
+    descritor, caminho_temporario = tempfile.mkstemp(
+        dir=diretorio, prefix=f".{os.path.basename(caminho)}.", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(descritor, 'wb') as f:
+            f.write(dados)
+            f.flush()
+            os.fsync(f.fileno())
+        if stat_original is not None:
+            os.chmod(caminho_temporario, stat_original.st_mode & 0o7777)
+        if hash_arquivo(caminho_temporario) != esperado:
+            raise OSError(f"hash do arquivo temporário não confere: {caminho_temporario}")
+        os.replace(caminho_temporario, caminho)
+    except BaseException:
+        try:
+            os.remove(caminho_temporario)
+        except OSError:
+            pass
+        raise
+    
+    # A troca de nome só é durável depois do fsync da pasta (POSIX; no Windows não se aplica)
+    if hasattr(os, 'O_DIRECTORY'):
+        try:
+            descritor_pasta = os.open(diretorio, os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(descritor_pasta)
+            finally:
+                os.close(descritor_pasta)
+        except OSError:
+            pass
+    return esperado
+
+def copiar_para_backup(caminho_arquivo: str, dados: bytes, stat_original: os.stat_result) -> Dict[str, Any]:
+    """🆕 Backup na pasta Backup a partir dos bytes já lidos pelo PASTE, sem mensagens (v2.2.0)
+    
+    Mesmos bytes que o PASTE vai modificar (nada de segunda leitura). Levanta OSError se falhar.
+    """
+    diretorio_arquivo = os.path.dirname(caminho_arquivo)
+    nome_arquivo = os.path.basename(caminho_arquivo)
+    
+    pasta_backup = os.path.join(diretorio_arquivo, "Backup")
+    pasta_criada = not os.path.exists(pasta_backup)
+    os.makedirs(pasta_backup, exist_ok=True)  # exist_ok: threads do lote na mesma pasta
+    
+    # 🆕 TIMESTAMP SINCRONIZADO COM VERIFICAÇÃO DE TIMEZONE
+    agora = datetime.now()
+    agora_real = datetime.fromtimestamp(time.time())  # Força timestamp real do sistema
+    timestamp = agora_real.strftime("%Y-%m-%d_%H-%M-%S")
+    
+    nome_backup = f"{nome_arquivo}.backup_{timestamp}.bak"
+    caminho_backup = os.path.join(pasta_backup, nome_backup)
+    
+    gravar_arquivo_atomico(caminho_backup, dados, stat_original)
+    
+    # 🆕 PRESERVAR TIMESTAMPS DO ARQUIVO ORIGINAL NO BACKUP
+    os.utime(caminho_backup, (stat_original.st_atime, stat_original.st_mtime))
+    
+    return {
+        'pasta_backup': pasta_backup,
+        'pasta_criada': pasta_criada,
+        'nome_backup': nome_backup,
+        'caminho_backup': caminho_backup,
+        'stat_original': stat_original,
+        'agora': agora,
+        'agora_real': agora_real,
+    }
+
+def criar_backup_antes_paste(caminho_arquivo, dados: bytes, stat_original: os.stat_result):
+    """Cria backup do arquivo antes de fazer modificações no modo paste com verificação de timezone
+    
+    🆕 dados/stat_original: o que o PASTE leu do arquivo (v2.2.0)
+    """
     try:
-        if not os.path.exists(caminho_arquivo):
-            print(f"❌ ERRO: Arquivo não encontrado para backup: {caminho_arquivo}")
-            return False
-        
-        diretorio_arquivo = os.path.dirname(caminho_arquivo)
+        backup = copiar_para_backup(caminho_arquivo, dados, stat_original)
         nome_arquivo = os.path.basename(caminho_arquivo)
+        pasta_backup = backup['pasta_backup']
+        nome_backup = backup['nome_backup']
+        agora = backup['agora']
+        agora_real = backup['agora_real']
+        mtime_original = datetime.fromtimestamp(backup['stat_original'].st_mtime)
         
-        pasta_backup = os.path.join(diretorio_arquivo, "Backup")
-        if not os.path.exists(pasta_backup):
-            os.makedirs(pasta_backup)
+        if backup['pasta_criada']:
             print(f"📁 Pasta Backup criada: {pasta_backup}")
         
-        # 🆕 OBTER INFORMAÇÕES DE TEMPO DO ARQUIVO ORIGINAL
-        stat_original = os.stat(caminho_arquivo)
-        mtime_original = datetime.fromtimestamp(stat_original.st_mtime)
-        
-        temp_backup = os.path.join(pasta_backup, f"{nome_arquivo}.temp.bak")
-        shutil.copy2(caminho_arquivo, temp_backup)
-        
-        # 🆕 TIMESTAMP SINCRONIZADO COM VERIFICAÇÃO DE TIMEZONE
-        import time
-        agora = datetime.now()
-        agora_real = datetime.fromtimestamp(time.time())  # Força timestamp real do sistema
-        timestamp = agora_real.strftime("%Y-%m-%d_%H-%M-%S")
-        
         # 🆕 DIAGNÓSTICO DE SINCRONIZAÇÃO
         diferenca_datetime = abs((agora - agora_real).total_seconds())
         if diferenca_datetime > 5:
@@ -1584,16 +4369,8 @@ def criar_backup_antes_paste(caminho_arquivo):
             print(f"   🕒 datetime.now(): {agora.strftime('%H:%M:%S')}")
             print(f"   🕒 time.time(): {agora_real.strftime('%H:%M:%S')}")
         
-        nome_backup = f"{nome_arquivo}.backup_{timestamp}.bak"
-        caminho_backup = os.path.join(pasta_backup, nome_backup)
-        
-        os.rename(temp_backup, caminho_backup)
-        
-        # 🆕 PRESERVAR TIMESTAMPS DO ARQUIVO ORIGINAL NO BACKUP
-        os.utime(caminho_backup, (stat_original.st_atime, stat_original.st_mtime))
-        
         # 🆕 VERIFICAÇÃO DE TIMEZONE E RELATÓRIO DETALHADO
-        stat_backup = os.stat(caminho_backup)
+        stat_backup = os.stat(backup['caminho_backup'])
         mtime_backup = datetime.fromtimestamp(stat_backup.st_mtime)
         diferenca_horas = abs((agora - mtime_original).total_seconds() / 3600)
         
@@ -1623,15 +4400,241 @@ def criar_backup_antes_paste(caminho_arquivo):
         return False
 
 # ═══════════════════════════════════════════════════════════════════════════════
-# 🆕 MODO BUSCA ATUALIZADO (v2.1.6)
+# 🆕 PASTE EM LOTE: TODOS OS RESULTADOS DA SESSÃO, TUDO OU NADA (v2.2.0)
 # ═══════════════════════════════════════════════════════════════════════════════
 
-def modo_busca():
-    """Modo busca com consolidação global de resultados e CORREÇÃO COMPLETA v2.1.6"""
-    print("🚀 CTRLCSEARCH.PY v2.1.6 - CORREÇÃO COMPLETA QUEBRAS DE LINHA")
+OPCOES_PASTE_LOTE = ('--all', '--lote')
+
+@dataclass
+class ColagemArquivo:
+    """🆕 Um arquivo do PASTE em lote: regiões da sessão, bytes originais e conteúdo novo (v2.2.0)"""
+    caminho: str
+    nome: str
+    regioes: List[Tuple[int, int, str]] = field(default_factory=list)  # (inicio, fim, texto esperado)
+    sobrepostas: int = 0                    # Regiões descartadas por cruzar uma de score maior
+    dados_originais: Optional[bytes] = None  # Para desfazer a gravação
+    stat_original: Optional[os.stat_result] = None
+    novo_conteudo: Optional[str] = None
+    backup: Optional[str] = None
+    gravado: bool = False
+    erro: Optional[str] = None
+
+def extrair_opcoes_paste_lote(argumentos: List[str]) -> Optional[Tuple[Optional[float], Optional[set]]]:
+    """🆕 Filtros de "paste --all": --score-minimo N e --tipo 1,3 ("--opcao valor" ou "--opcao=valor") (v2.2.0)"""
+    score_minimo = None
+    tipos = None
+    
+    i = 0
+    while i < len(argumentos):
+        opcao, separador, valor = argumentos[i].partition('=')
+        if not separador:
+            i += 1
+            valor = argumentos[i] if i < len(argumentos) else ''
+        i += 1
+        
+        try:
+            if opcao in ('--score-minimo', '--min-score'):
+                score_minimo = float(valor)
+            elif opcao in ('--tipo', '--type'):
+                tipos = {int(tipo) for tipo in valor.split(',')}
+                if not tipos <= set(TIPOS_ORDEM_EXECUCAO):
+                    raise ValueError(f"TIPOS válidos: {sorted(TIPOS_ORDEM_EXECUCAO)}")
+            else:
+                print(f"❌ Opção desconhecida para paste --all: {opcao}")
+                return None
+        except ValueError as e:
+            print(f"❌ Valor inválido para {opcao}: {valor!r} ({e})")
+            return None
+    return score_minimo, tipos
+
+def carregar_alvos_paste_lote(score_minimo: Optional[float], tipos: Optional[set]) -> Optional[List[ColagemArquivo]]:
+    """🆕 Resultados da última sessão agrupados por arquivo, na ordem do ranking (v2.2.0)
+    
+    Num mesmo arquivo, uma região que cruza outra de score maior é descartada
+    (ex.: o mesmo trecho achado por dois TIPOS).
+    """
+    if not os.path.exists(ARQUIVO_SESSAO_DB):
+        print(f"❌ ERRO: Sessão {ARQUIVO_SESSAO_DB} não encontrada!")
+        print("   Execute primeiro: python pythonsearch.py (sem parâmetros)")
+        return None
+    
+    try:
+        sessao = SessaoSQLite()
+        try:
+            linha_sessao = sessao.ultima_sessao()
+            if linha_sessao is None:
+                print("❌ ERRO: Nenhuma sessão salva!")
+                return None
+            print(f"📋 Sessão {linha_sessao['id']} de {linha_sessao['timestamp']} "
+                  f"({linha_sessao['total_resultados']} resultado(s))")
+            textos = sessao.textos(linha_sessao['id'])
+            linhas = sessao.resultados_filtrados(linha_sessao['id'], score_minimo, tipos)
+        finally:
+            sessao.fechar()
+    except sqlite3.Error as e:
+        print(f"❌ ERRO ao ler a sessão {ARQUIVO_SESSAO_DB}: {e}")
+        return None
+    
+    alvos: Dict[str, ColagemArquivo] = {}
+    for linha in linhas:
+        alvo = alvos.setdefault(linha['caminho'], ColagemArquivo(linha['caminho'], linha['nome']))
+        if any(linha['inicio'] < fim and inicio < linha['fim'] for inicio, fim, _ in alvo.regioes):
+            alvo.sobrepostas += 1
+            continue
+        # TIPO 5 guarda o trecho achado; os outros TIPOS acham o próprio texto copiado
+        esperado = textos[linha['hash_encontrado'] or linha['hash_original']]
+        alvo.regioes.append((linha['inicio'], linha['fim'], esperado))
+    return list(alvos.values())
+
+def trecho_confere(atual: str, esperado: str) -> bool:
+    """🆕 O trecho do arquivo ainda é o da sessão? (mesmas tolerâncias dos TIPOS 3, 4 e 6) (v2.2.0)"""
+    if atual == esperado:
+        return True
+    normalizar = lambda texto: texto.replace('\r\n', '\n').replace('\r', '\n').strip()
+    if normalizar(atual) == normalizar(esperado):
+        return True
+    return limpar_carriage_returns(atual).strip() == limpar_carriage_returns(esperado).strip()
+
+def preparar_colagem(alvo: ColagemArquivo, texto_novo: str) -> ColagemArquivo:
+    """🆕 Lê o arquivo uma vez, valida cada região e monta o conteúdo novo (não grava nada) (v2.2.0)"""
+    try:
+        with open(alvo.caminho, 'rb') as f:
+            alvo.stat_original = os.fstat(f.fileno())
+            alvo.dados_originais = f.read()
+    except OSError as e:
+        alvo.erro = f"não foi possível ler ({e})"
+        return alvo
+    
+    snapshot = snapshot_de_bytes(alvo.caminho, alvo.stat_original, alvo.dados_originais)
+    conteudo = snapshot.conteudo
+    info_encoding = snapshot.info_encoding
+    offset_bom = info_encoding['bom_size'] if info_encoding['has_bom'] else 0
+    
+    partes = []
+    cursor = 0
+    for inicio, fim, esperado in sorted(alvo.regioes):
+        inicio_ajustado = inicio - offset_bom
+        fim_ajustado = fim - offset_bom
+        if inicio_ajustado < 0 or fim_ajustado > len(conteudo) or inicio_ajustado >= fim_ajustado:
+            alvo.erro = f"coordenadas {inicio}-{fim} fora do arquivo ({len(conteudo)} caracteres)"
+            return alvo
+        if not trecho_confere(conteudo[inicio_ajustado:fim_ajustado], esperado):
+            alvo.erro = f"o texto em {inicio}-{fim} não é mais o da sessão (arquivo alterado?)"
+            return alvo
+        partes.append(conteudo[cursor:inicio_ajustado])
+        partes.append(texto_novo)
+        cursor = fim_ajustado
+    partes.append(conteudo[cursor:])
+    alvo.novo_conteudo = "".join(partes)
+    return alvo
+
+def aplicar_colagem(alvo: ColagemArquivo) -> ColagemArquivo:
+    """🆕 Backup + gravação atômica (conferida por hash) de um arquivo já preparado (v2.2.0)"""
+    try:
+        alvo.backup = copiar_para_backup(alvo.caminho, alvo.dados_originais, alvo.stat_original)['nome_backup']
+        gravar_arquivo_atomico(alvo.caminho, codificar_conteudo_colado(alvo.novo_conteudo), alvo.stat_original)
+        alvo.gravado = True  # Gravação atômica: antes disso o arquivo continua o original
+    except OSError as e:
+        alvo.erro = f"falha ao gravar ({e})"
+    return alvo
+
+def desfazer_colagem(alvo: ColagemArquivo) -> Optional[str]:
+    """🆕 Devolve ao arquivo os bytes lidos antes do PASTE; retorna o erro, se houver (v2.2.0)"""
+    try:
+        gravar_arquivo_atomico(alvo.caminho, alvo.dados_originais, alvo.stat_original)
+        return None
+    except OSError as e:
+        return str(e)
+
+def colar_em_todos_resultados(score_minimo: Optional[float] = None, tipos: Optional[set] = None,
+                              texto_novo: Optional[str] = None) -> bool:
+    """🆕 "paste --all": cola o Ctrl+C em todos os resultados da sessão, em paralelo (v2.2.0)
+    
+    1) Prepara todos os arquivos (leitura + validação das regiões); se algum falhar,
+       nada é gravado. 2) Backup e gravação em paralelo; se algum arquivo falhar,
+       todos os já gravados voltam ao conteúdo original.
+    """
+    print("📋 MODO PASTE EM LOTE: Colando em todos os resultados da sessão")
+    filtros = []
+    if score_minimo is not None:
+        filtros.append(f"score >= {score_minimo:.1f}")
+    if tipos:
+        filtros.append(f"TIPO {','.join(str(tipo) for tipo in sorted(tipos))}")
+    if filtros:
+        print(f"   🎯 Filtros: {' e '.join(filtros)}")
     print("=" * 80)
     
-    texto_copiado = obter_texto_copiado()
+    alvos = carregar_alvos_paste_lote(score_minimo, tipos)
+    if alvos is None:
+        return False
+    if not alvos:
+        print("⚠️ Nenhum resultado da sessão atende aos filtros")
+        return False
+    
+    if texto_novo is None:
+        texto_novo = obter_texto_copiado()
+    if not texto_novo:
+        print("❌ ERRO: Nenhum texto na área de transferência para colar!")
+        return False
+    mostrar_debug_texto(texto_novo, "NOVO CONTEÚDO")
+    
+    total_regioes = sum(len(alvo.regioes) for alvo in alvos)
+    total_sobrepostas = sum(alvo.sobrepostas for alvo in alvos)
+    print(f"\n🔍 VALIDANDO {total_regioes} região(ões) em {len(alvos)} arquivo(s)...")
+    if total_sobrepostas:
+        print(f"   ⏭️ {total_sobrepostas} resultado(s) ignorado(s): cruzam outro de score maior no mesmo arquivo")
+    
+    with ThreadPoolExecutor(max_workers=max(1, THREADS_PASTE_LOTE)) as executor:
+        alvos = list(executor.map(lambda alvo: preparar_colagem(alvo, texto_novo), alvos))
+        
+        falhas = [alvo for alvo in alvos if alvo.erro]
+        if falhas:
+            print(f"\n❌ PASTE EM LOTE CANCELADO: {len(falhas)} arquivo(s) não passaram na validação")
+            for alvo in falhas:
+                print(f"   ❌ {alvo.nome}: {alvo.erro}")
+            print("   📂 Nenhum arquivo foi alterado")
+            return False
+        
+        print(f"✅ Todas as regiões conferem. Criando backups e gravando...")
+        sys.stdout.flush()
+        alvos = list(executor.map(aplicar_colagem, alvos))
+        
+        falhas = [alvo for alvo in alvos if alvo.erro]
+        if falhas:
+            print(f"\n❌ PASTE EM LOTE FALHOU em {len(falhas)} arquivo(s):")
+            for alvo in falhas:
+                print(f"   ❌ {alvo.nome}: {alvo.erro}")
+            gravados = [alvo for alvo in alvos if alvo.gravado]
+            print(f"🔄 DESFAZENDO: restaurando {len(gravados)} arquivo(s) ao conteúdo original...")
+            erros_restauracao = list(executor.map(desfazer_colagem, gravados))
+            for alvo, erro in zip(gravados, erros_restauracao):
+                if erro:
+                    print(f"   🚨 {alvo.nome}: não foi possível restaurar ({erro}) - use o backup {alvo.backup}")
+            if not any(erros_restauracao):
+                print("   ✅ Todos os arquivos voltaram ao conteúdo original (backups mantidos na pasta Backup)")
+            return False
+    
+    print(f"\n✅ PASTE EM LOTE REALIZADO COM SUCESSO!")
+    for alvo in alvos:
+        log_detalhe(f"   📁 {alvo.nome}: {len(alvo.regioes)} região(ões), backup {alvo.backup}")
+    print(f"   📊 {len(alvos)} arquivo(s), {total_regioes} região(ões) substituída(s), {len(alvos)} backup(s) na pasta Backup")
+    return True
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# 🆕 MODO BUSCA ATUALIZADO (v2.1.6)
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def modo_busca(texto_copiado=None):
+    """Modo busca com consolidação global de resultados e CORREÇÃO COMPLETA v2.1.6
+    
+    🆕 texto_copiado: texto a procurar no lugar da área de transferência (benchmark, v2.2.0)
+    """
+    global metricas_ativas
+    log_detalhe("🚀 CTRLCSEARCH.PY v2.1.6 - CORREÇÃO COMPLETA QUEBRAS DE LINHA")
+    log_detalhe("=" * 80)
+    
+    if texto_copiado is None:
+        texto_copiado = obter_texto_copiado()
     
     if not texto_copiado:
         print("❌ ERRO: Nenhum texto na área de transferência!")
@@ -1643,37 +4646,37 @@ def modo_busca():
     # 🆕 ANÁLISE INICIAL DE CARRIAGE RETURNS (v2.1.2)
     tem_problemas_cr = detectar_problemas_carriage_return(texto_copiado)
     if tem_problemas_cr:
-        print("🔧 HOTFIX U+000D: Detectados carriage returns isolados!")
-        print("   TIPO6 será executado para tratamento específico")
-    
-    print("\n" + "=" * 80)
-    tipo1_comparacao_literal(texto_copiado)
-    
-    print("\n" + "=" * 80)
-    tipo2_comparacao_arquivo_completo(texto_copiado)
-    
-    print("\n" + "=" * 80)
-    tipo3_comparacao_quebras_normalizadas(texto_copiado)
+        log_detalhe("🔧 HOTFIX U+000D: Detectados carriage returns isolados!")
+        log_detalhe("   TIPO6 será executado para tratamento específico")
     
-    print("\n" + "=" * 80)
-    tipo4_comparacao_strip_aplicado(texto_copiado)
+    # 🆕 Métricas: um coletor novo por busca (v2.2.0)
+    metricas_ativas = MetricasBusca() if COLETAR_METRICAS else None
+    inicio_parede, inicio_cpu = time.perf_counter(), time.process_time()
     
-    print("\n" + "=" * 80)
-    tipo5_busca_por_probabilidade(texto_copiado, limite_similaridade=LIMITE_SIMILARIDADE_TIPO5)
+    # 🆕 VARREDURA ÚNICA: uma passada pela pasta para os 6 TIPOS (v2.2.0)
+    consulta = preparar_consulta(texto_copiado, limite_similaridade=LIMITE_SIMILARIDADE_TIPO5)
+    if USAR_PLANEJADOR_BUSCA and not BUSCA_EXAUSTIVA:
+        # 🆕 Planejador: TIPOS baratos primeiro, para cedo com resultados confiáveis (v2.2.0)
+        executar_busca_planejada(consulta, workers=NUMERO_WORKERS)
+    else:
+        executar_varredura_unica(consulta, workers=NUMERO_WORKERS)
     
-    # 🆕 TIPO 6: HOTFIX PARA U+000D (v2.1.2)
-    print("\n" + "=" * 80)
-    tipo6_ignorar_carriage_returns(texto_copiado)
+    if metricas_ativas is not None:
+        metricas_ativas.tempo_parede = time.perf_counter() - inicio_parede
+        metricas_ativas.tempo_cpu = time.process_time() - inicio_cpu
     
-    print("\n" + "=" * 80)
-    print("🏁 ANÁLISE COMPLETA FINALIZADA (v2.1.6 - CORREÇÃO COMPLETA)")
+    log_info("\n" + "=" * 80)
+    log_info("🏁 ANÁLISE COMPLETA FINALIZADA (v2.1.6 - CORREÇÃO COMPLETA)")
     
     if resultados_globais:
-        print(f"\n📊 TOTAL DE RESULTADOS COLETADOS: {len(resultados_globais)}")
-        print("🔄 Iniciando consolidação e ordenação...")
-        salvar_xml_consolidado(resultados_globais)
+        log_info(f"\n📊 TOTAL DE RESULTADOS COLETADOS: {len(resultados_globais)}")
+        log_detalhe("🔄 Iniciando consolidação e ordenação...")
+        salvar_sessao_consolidada(resultados_globais)
     else:
-        print("\nℹ️ Nenhuma posição foi encontrada (nenhum match em qualquer tipo)")
+        log_info("\nℹ️ Nenhuma posição foi encontrada (nenhum match em qualquer tipo)")
+    
+    if metricas_ativas is not None:
+        metricas_ativas.imprimir()
 
 # ═══════════════════════════════════════════════════════════════════════════════
 # 🆕 DIAGNÓSTICO MELHORADO v2.1.6
@@ -1758,19 +4761,8 @@ def diagnosticar_caso_especifico():
     if pos_norm != -1:
         print(f"\n📐 CÁLCULO DE COORDENADAS CORRETAS:")
         
-        # Mapeia posição normalizada para original
-        contador = 0
-        pos_real = 0
-        for i, char in enumerate(conteudo):
-            if contador >= pos_norm:
-                pos_real = i
-                break
-            if char == '\r' and i + 1 < len(conteudo) and conteudo[i + 1] == '\n':
-                continue
-            contador += 1
-        
-        # Calcula fim
-        fim_real = pos_real + len(texto_copiado)
+        # Mapeia posição normalizada para original (início e fim)
+        pos_real, fim_real = MapaOffsetsQuebras(conteudo).trecho_original(pos_norm, len(texto_norm))
         
         # Ajusta para BOM se necessário
         pos_final = pos_real + info_encoding['bom_size']
@@ -1778,7 +4770,7 @@ def diagnosticar_caso_especifico():
         
         print(f"   📍 Posição real (sem BOM): {pos_real} até {fim_real}")
         print(f"   📍 Posição final (com BOM): {pos_final} até {fim_final}")
-        print(f"   📏 Tamanho: {len(texto_copiado)} chars")
+        print(f"   📏 Tamanho: {fim_real - pos_real} chars")
         
         # Validação
         texto_extraido = conteudo[pos_real:fim_real]
@@ -1790,27 +4782,30 @@ def diagnosticar_caso_especifico():
             print(f"      Extraído: {repr(texto_extraido[:50])}")
             print(f"      Esperado: {repr(texto_copiado[:50])}")
     
-    # 5. Comparação com XML
-    if os.path.exists("sessionlinner.xml"):
-        print(f"\n📋 COMPARAÇÃO COM XML ATUAL:")
+    # 5. Comparação com a sessão
+    if os.path.exists(ARQUIVO_SESSAO_DB):
+        print(f"\n📋 COMPARAÇÃO COM A SESSÃO ATUAL:")
         try:
-            tree = ET.parse("sessionlinner.xml")
-            root = tree.getroot()
-            arquivo1 = root.find('arquivo1')
-            if arquivo1:
-                inicio_xml = int(arquivo1.find('posicoes/inicio').text)
-                fim_xml = int(arquivo1.find('posicoes/fim').text)
-                print(f"   📍 Coordenadas no XML: {inicio_xml} até {fim_xml}")
+            sessao = SessaoSQLite()
+            try:
+                linha_sessao = sessao.ultima_sessao()
+                melhor = sessao.melhor_resultado(linha_sessao['id']) if linha_sessao else None
+            finally:
+                sessao.fechar()
+            if melhor:
+                inicio_sessao = melhor['inicio']
+                fim_sessao = melhor['fim']
+                print(f"   📍 Coordenadas na sessão: {inicio_sessao} até {fim_sessao}")
                 
                 if pos_norm != -1:
-                    diferenca_inicio = inicio_xml - (pos_real + info_encoding['bom_size'])
-                    diferenca_fim = fim_xml - (fim_real + info_encoding['bom_size'])
+                    diferenca_inicio = inicio_sessao - (pos_real + info_encoding['bom_size'])
+                    diferenca_fim = fim_sessao - (fim_real + info_encoding['bom_size'])
                     print(f"   📊 Diferença início: {diferenca_inicio:+d} chars")
                     print(f"   📊 Diferença fim: {diferenca_fim:+d} chars")
                     
                     if diferenca_inicio != 0:
-                        print(f"   🚨 COORDENADAS INCORRETAS NO XML!")
-        except:
+                        print(f"   🚨 COORDENADAS INCORRETAS NA SESSÃO!")
+        except sqlite3.Error:
             pass
     
     # 6. Teste da função corrigida
@@ -1877,19 +4872,13 @@ def testar_correcoes():
     pos_norm = conteudo_norm.find(texto_teste)
     
     # Mapeia de volta
-    contador = 0
-    pos_real = 0
-    for i, char in enumerate(conteudo_crlf):
-        if contador >= pos_norm:
-            pos_real = i
-            break
-        if char == '\r' and i + 1 < len(conteudo_crlf) and conteudo_crlf[i + 1] == '\n':
-            continue
-        contador += 1
+    mapa = MapaOffsetsQuebras(conteudo_crlf)
+    pos_real, fim_real = mapa.trecho_original(pos_norm, len(texto_teste))
     
     print(f"   Posição normalizada: {pos_norm}")
     print(f"   Posição real mapeada: {pos_real}")
-    print(f"   Texto extraído: {repr(conteudo_crlf[pos_real:pos_real+len(texto_teste)])}")
+    print(f"   Texto extraído: {repr(conteudo_crlf[pos_real:fim_real])}")
+    print(f"   Ida e volta: {'✅ OK' if mapa.para_normalizado(pos_real) == pos_norm else '❌ FALHOU'}")
     
     # Teste 3: Com o arquivo real
     arquivo_path = r"C:\Users\arquivo.js"
@@ -1933,36 +4922,470 @@ def testar_correcoes():
     
     print("\n✅ Testes concluídos!")
 
-def main():
-    """Função principal v2.1.6"""
-    print("╔══════════════════════════════════════════════════════════════════════════════╗")
-    print("║                  PYTHON CTRL+C SEARCH & PASTE TOOL v2.1.6                  ║")
-    print("║                🚨 CORREÇÃO COMPLETA: Quebras de linha diferentes            ║")
-    print("║                🔧 CORREÇÃO: Mapeamento preciso de coordenadas               ║")
-    print("║                🆕 CORREÇÃO: Ajuste automático no PASTE                      ║")
-    print("╚══════════════════════════════════════════════════════════════════════════════╝")
-    
-    if len(sys.argv) > 1:
-        comando = sys.argv[1].lower()
-        
-        if comando == 'paste':
-            arquivo_especifico = sys.argv[2] if len(sys.argv) > 2 else None
-            posicoes = ler_xml_posicoes(arquivo_especifico)
-            
-            if posicoes:
-                print("🔄 CRIANDO BACKUP ANTES DA MODIFICAÇÃO...")
-                backup_sucesso = criar_backup_antes_paste(posicoes['caminho'])
+# ═══════════════════════════════════════════════════════════════════════════════
+# 🆕 BENCHMARK REPRODUZÍVEL COM CORPUS SINTÉTICO (v2.2.0)
+# ═══════════════════════════════════════════════════════════════════════════════
+
+ARQUIVO_BENCHMARK = "sessionlinner_benchmark.json"
+MARCADOR_CORPUS_BENCHMARK = ".pastesearch_benchmark"  # Só pastas com o marcador são apagadas e recriadas
+LIMITE_REGRESSAO_BENCHMARK = 1.20                     # --comparar: etapa 20% mais lenta = regressão
+
+# Tipos de arquivo do corpus (quebra de linha + encoding) e a proporção padrão de cada um
+TIPOS_ARQUIVO_BENCHMARK = ('lf', 'crlf', 'cr', 'bom', 'latin1')
+MISTURA_PADRAO_BENCHMARK = {'lf': 40, 'crlf': 30, 'cr': 5, 'bom': 15, 'latin1': 10}
+EXTENSOES_BENCHMARK = ('.py', '.js', '.txt', '.md')
+ARQUIVOS_POR_PASTA_BENCHMARK = 50
+
+# Texto procurado (e colado): acentos para exercitar latin-1 e BOM
+AGULHA_BENCHMARK = (
+    "def agulha_benchmark(valor):\n"
+    "    \"\"\"Ação de referência plantada pelo benchmark\"\"\"\n"
+    "    return valor * 42"
+)
+PALAVRAS_BENCHMARK = (
+    "return", "valor", "dados", "lista", "função", "índice", "configuração", "resultado", "arquivo",
+    "texto", "posição", "if", "for", "while", "self", "None", "True", "=", "+", "(", ")", ":", "#",
+    "ação", "busca", "linha", "coluna", "módulo", "classe", "método",
+)
+
+@dataclass
+class ConfiguracaoBenchmark:
+    """🆕 Parâmetros do corpus sintético e da medição; a mesma semente gera o mesmo corpus (v2.2.0)"""
+    numero_arquivos: int = 500
+    tamanho_medio: int = 16 * 1024
+    distribuicao: str = 'lognormal'  # 'lognormal' (muitos pequenos, poucos grandes) ou 'uniforme'
+    mistura: Dict[str, int] = field(default_factory=lambda: dict(MISTURA_PADRAO_BENCHMARK))
+    proporcao_agulha: float = 0.05   # Fração dos arquivos que recebem a agulha
+    semente: int = 1234
+    repeticoes: int = 3
+    pasta: str = os.path.join(tempfile.gettempdir(), "pastesearch_benchmark")
+    saida: str = ARQUIVO_BENCHMARK
+    comparar: Optional[str] = None
+
+def sortear_tamanho_benchmark(rng: random.Random, configuracao: ConfiguracaoBenchmark) -> int:
+    media = configuracao.tamanho_medio
+    if configuracao.distribuicao == 'uniforme':
+        return rng.randint(media // 2, media * 3 // 2)
+    # Lognormal com sigma = 1 e a mesma média: mu = ln(media) - sigma² / 2
+    return max(64, min(media * 50, int(rng.lognormvariate(math.log(media) - 0.5, 1.0))))
+
+def gerar_linhas_benchmark(rng: random.Random, tamanho: int) -> List[str]:
+    linhas = []
+    total = 0
+    while total < tamanho:
+        linha = "    " * rng.randint(0, 3) + " ".join(rng.choice(PALAVRAS_BENCHMARK) for _ in range(rng.randint(0, 12)))
+        linhas.append(linha)
+        total += len(linha) + 1
+    return linhas
+
+def codificar_arquivo_benchmark(texto: str, tipo_arquivo: str) -> bytes:
+    """Texto com \\n → bytes com a quebra de linha e o encoding do tipo de arquivo"""
+    if tipo_arquivo == 'crlf':
+        texto = texto.replace('\n', '\r\n')
+    elif tipo_arquivo == 'cr':
+        texto = texto.replace('\n', '\r')
+    if tipo_arquivo == 'latin1':
+        return texto.encode('latin-1')
+    dados = texto.encode('utf-8')
+    return codecs.BOM_UTF8 + dados if tipo_arquivo == 'bom' else dados
+
+def gerar_corpus_benchmark(configuracao: ConfiguracaoBenchmark) -> Dict[str, Any]:
+    """🆕 Cria a árvore sintética e devolve o manifesto com as agulhas plantadas (v2.2.0)
+    
+    plantadas: caminho -> (inicio, fim, offset_bom) nas coordenadas do XML, ou seja,
+    posição no texto lido em modo texto (quebras já traduzidas) + 3 com BOM UTF-8.
+    """
+    pasta = configuracao.pasta
+    if os.path.exists(pasta):
+        if os.listdir(pasta) and not os.path.exists(os.path.join(pasta, MARCADOR_CORPUS_BENCHMARK)):
+            raise ValueError(f"{pasta} já existe e não é um corpus de benchmark (falta {MARCADOR_CORPUS_BENCHMARK})")
+        shutil.rmtree(pasta)
+    os.makedirs(pasta)
+    with open(os.path.join(pasta, MARCADOR_CORPUS_BENCHMARK), 'w', encoding='utf-8') as f:
+        f.write(f"semente={configuracao.semente}\n")
+    
+    rng = random.Random(configuracao.semente)
+    tipos = [tipo for tipo in TIPOS_ARQUIVO_BENCHMARK if configuracao.mistura.get(tipo, 0) > 0]
+    pesos = [configuracao.mistura[tipo] for tipo in tipos]
+    
+    plantadas: Dict[str, Tuple[int, int, int]] = {}
+    por_tipo = {tipo: 0 for tipo in tipos}
+    total_bytes = 0
+    for i in range(configuracao.numero_arquivos):
+        tipo_arquivo = rng.choices(tipos, pesos)[0]
+        pasta_arquivo = os.path.join(pasta, f"pasta_{i // ARQUIVOS_POR_PASTA_BENCHMARK:03d}")
+        os.makedirs(pasta_arquivo, exist_ok=True)
+        caminho = os.path.join(pasta_arquivo, f"arquivo_{i:05d}{rng.choice(EXTENSOES_BENCHMARK)}")
+        linhas = gerar_linhas_benchmark(rng, sortear_tamanho_benchmark(rng, configuracao))
+        
+        plantar = rng.random() < configuracao.proporcao_agulha
+        if configuracao.proporcao_agulha > 0 and not plantadas and i == configuracao.numero_arquivos - 1:
+            plantar = True  # Pelo menos uma agulha, para as verificações terem o que checar
+        if plantar:
+            corte = rng.randint(0, len(linhas))
+            prefixo = "".join(linha + "\n" for linha in linhas[:corte])
+            texto = prefixo + AGULHA_BENCHMARK + "".join("\n" + linha for linha in linhas[corte:])
+            offset_bom = len(codecs.BOM_UTF8) if tipo_arquivo == 'bom' else 0
+            inicio = len(prefixo) + offset_bom
+            plantadas[caminho] = (inicio, inicio + len(AGULHA_BENCHMARK), offset_bom)
+        else:
+            texto = "\n".join(linhas)
+        
+        dados = codificar_arquivo_benchmark(texto, tipo_arquivo)
+        with open(caminho, 'wb') as f:
+            f.write(dados)
+        por_tipo[tipo_arquivo] += 1
+        total_bytes += len(dados)
+    
+    return {'arquivos': configuracao.numero_arquivos, 'bytes': total_bytes, 'por_tipo': por_tipo, 'plantadas': plantadas}
+
+def verificar_resultados_benchmark(resultados_por_etapa: Dict[str, List[ResultadoBusca]],
+                                   plantadas: Dict[str, Tuple[int, int, int]], pasta: str) -> List[Dict[str, Any]]:
+    """🆕 Compara os resultados com as agulhas plantadas; devolve a lista de erros (v2.2.0)
+    
+    TIPOS exatos (1-4, 6) precisam cair só em arquivos plantados, nas coordenadas
+    esperadas; TIPO 3 e TIPO 6 (que não param no primeiro arquivo) precisam achar
+    todas. O TIPO 5 é probabilístico e só entra na contagem do relatório.
+    """
+    erros = []
+    for etapa, resultados in resultados_por_etapa.items():
+        for resultado in resultados:
+            if resultado.tipo == 5:
+                continue
+            relativo = os.path.relpath(resultado.caminho_completo, pasta)
+            esperado = plantadas.get(resultado.caminho_completo)
+            if esperado is None:
+                erros.append({'etapa': etapa, 'tipo': resultado.tipo, 'arquivo': relativo, 'erro': 'falso positivo'})
+            elif (resultado.posicao_inicio, resultado.posicao_fim) != esperado[:2]:
+                erros.append({'etapa': etapa, 'tipo': resultado.tipo, 'arquivo': relativo,
+                              'erro': f"posição {resultado.posicao_inicio}-{resultado.posicao_fim}, "
+                                      f"esperada {esperado[0]}-{esperado[1]}"})
+    
+    for etapa in ('TIPO 3', 'TIPO 6'):
+        if etapa not in resultados_por_etapa:
+            continue
+        encontrados = {resultado.caminho_completo for resultado in resultados_por_etapa[etapa]}
+        for caminho in plantadas:
+            if caminho not in encontrados:
+                erros.append({'etapa': etapa, 'tipo': int(etapa[-1]), 'arquivo': os.path.relpath(caminho, pasta),
+                              'erro': 'agulha não encontrada'})
+    return erros
+
+def verificar_colagem_benchmark(caminho: str, plantadas: Dict[str, Tuple[int, int, int]]) -> bool:
+    """🆕 Depois do PASTE (salvo em UTF-8 sem BOM), a agulha continua na posição plantada (v2.2.0)"""
+    if caminho not in plantadas:
+        return False
+    inicio, fim, offset_bom = plantadas[caminho]
+    with open(caminho, 'r', encoding='utf-8', errors='replace') as f:
+        conteudo = f.read()
+    return conteudo[inicio - offset_bom:fim - offset_bom] == AGULHA_BENCHMARK
+
+def medir_execucao(funcao) -> float:
+    inicio = time.perf_counter()
+    funcao()
+    return time.perf_counter() - inicio
+
+def executar_benchmark(configuracao: ConfiguracaoBenchmark) -> Optional[Dict[str, Any]]:
+    """🆕 Gera o corpus, mede modo_busca, cada TIPO e colar_nas_coordenadas e salva o JSON (v2.2.0)
+    
+    Cache de conteúdo e índice de trigramas ficam desligados (toda repetição lê do
+    disco) e a sessão vai para um banco ao lado do corpus. Workers, --exaustiva e
+    --todas valem como na busca normal e ficam registrados no JSON.
+    """
+    global PASTA_BASE, ARQUIVO_SESSAO, ARQUIVO_SESSAO_DB, USAR_CACHE_CONTEUDO, USAR_INDICE_TRIGRAMAS, COLETAR_METRICAS, metricas_ativas
+    
+    print("⏱️ BENCHMARK COM CORPUS SINTÉTICO")
+    print("=" * 80)
+    try:
+        manifesto = gerar_corpus_benchmark(configuracao)
+    except (OSError, ValueError) as e:
+        print(f"❌ ERRO ao gerar o corpus: {e}")
+        return None
+    plantadas = manifesto['plantadas']
+    print(f"📂 Corpus: {manifesto['arquivos']} arquivo(s), {manifesto['bytes'] / 1024 / 1024:.1f} MB em {configuracao.pasta}")
+    print(f"   🧬 Tipos: {', '.join(f'{tipo}={total}' for tipo, total in manifesto['por_tipo'].items())}"
+          f" | 📍 Agulhas plantadas: {len(plantadas)} | 🎲 Semente: {configuracao.semente}")
+    
+    anteriores = (PASTA_BASE, ARQUIVO_SESSAO, ARQUIVO_SESSAO_DB, USAR_CACHE_CONTEUDO, USAR_INDICE_TRIGRAMAS, COLETAR_METRICAS)
+    PASTA_BASE = configuracao.pasta
+    ARQUIVO_SESSAO = configuracao.pasta.rstrip(os.sep) + "_sessao.xml"  # Fora do corpus: a sessão contém a agulha
+    ARQUIVO_SESSAO_DB = configuracao.pasta.rstrip(os.sep) + "_sessao.db"
+    USAR_CACHE_CONTEUDO = False
+    USAR_INDICE_TRIGRAMAS = False
+    
+    tempos: Dict[str, List[float]] = {}
+    resultados_por_etapa: Dict[str, List[ResultadoBusca]] = {}
+    colagens = []
+    metricas = None
+    try:
+        with open(os.devnull, 'w', encoding='utf-8') as saida_nula:
+            for repeticao in range(1, configuracao.repeticoes + 1):
+                print(f"🔁 Repetição {repeticao}/{configuracao.repeticoes}...")
                 
-                if backup_sucesso:
-                    print("✅ Backup criado! Prosseguindo com PASTE...\n")
-                    if arquivo_especifico:
-                        colar_nas_coordenadas(arquivo_especifico)
-                    else:
-                        colar_nas_coordenadas()
-                else:
-                    print("❌ ERRO: Não foi possível criar backup. PASTE cancelado por segurança!")
+                COLETAR_METRICAS = True
+                with contextlib.redirect_stdout(saida_nula):
+                    tempos.setdefault('modo_busca', []).append(medir_execucao(lambda: modo_busca(AGULHA_BENCHMARK)))
+                resultados_por_etapa['modo_busca'] = list(resultados_globais)
+                metricas, metricas_ativas = metricas_ativas, None
+                COLETAR_METRICAS = False
+                
+                consulta = preparar_consulta(AGULHA_BENCHMARK, limite_similaridade=LIMITE_SIMILARIDADE_TIPO5)
+                for tipo in TIPOS_ORDEM_EXECUCAO:
+                    with contextlib.redirect_stdout(saida_nula):
+                        limpar_resultados_globais()
+                        tempos.setdefault(f'TIPO {tipo}', []).append(medir_execucao(
+                            lambda: executar_varredura_unica(consulta, tipos=(tipo,), workers=NUMERO_WORKERS)
+                        ))
+                    resultados_por_etapa[f'TIPO {tipo}'] = list(resultados_globais)
+                
+                # PASTE no melhor resultado da sessão; o arquivo volta ao original para a próxima repetição
+                with contextlib.redirect_stdout(saida_nula):
+                    posicoes = ler_posicoes_sessao()
+                if posicoes:
+                    with open(posicoes['caminho'], 'rb') as f:
+                        dados_originais = f.read()
+                    try:
+                        with contextlib.redirect_stdout(saida_nula):
+                            tempos.setdefault('colar_nas_coordenadas', []).append(medir_execucao(
+                                lambda: colar_nas_coordenadas(texto_novo=AGULHA_BENCHMARK, fazer_backup=False)
+                            ))
+                        colagens.append({'arquivo': os.path.relpath(posicoes['caminho'], configuracao.pasta),
+                                         'ok': verificar_colagem_benchmark(posicoes['caminho'], plantadas)})
+                    finally:
+                        with open(posicoes['caminho'], 'wb') as f:
+                            f.write(dados_originais)
+    finally:
+        PASTA_BASE, ARQUIVO_SESSAO, ARQUIVO_SESSAO_DB, USAR_CACHE_CONTEUDO, USAR_INDICE_TRIGRAMAS, COLETAR_METRICAS = anteriores
+        metricas_ativas = None
+    
+    erros = verificar_resultados_benchmark(resultados_por_etapa, plantadas, configuracao.pasta)
+    if not colagens:
+        erros.append({'etapa': 'colar_nas_coordenadas', 'erro': 'nenhum resultado na sessão para colar'})
+    erros.extend({'etapa': 'colar_nas_coordenadas', 'arquivo': colagem['arquivo'], 'erro': 'agulha fora da posição após o PASTE'}
+                 for colagem in colagens if not colagem['ok'])
+    
+    etapas = {}
+    for etapa, execucoes in tempos.items():
+        minimo = min(execucoes)
+        por_arquivo = etapa == 'colar_nas_coordenadas'  # Só um arquivo: MB/s da pasta não se aplica
+        etapas[etapa] = {
+            'execucoes_s': [round(tempo, 6) for tempo in execucoes],
+            'minimo_s': round(minimo, 6),
+            'mediana_s': round(statistics.median(execucoes), 6),
+            'mb_por_s': None if por_arquivo or minimo <= 0 else round(manifesto['bytes'] / 1024 / 1024 / minimo, 2),
+        }
+    
+    relatorio = {
+        'versao': '2.2.0',
+        'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'configuracao': asdict(configuracao),
+        'opcoes_busca': {
+            'workers': NUMERO_WORKERS,
+            'exaustiva': BUSCA_EXAUSTIVA,
+            'planejador': USAR_PLANEJADOR_BUSCA,
+            'todas_ocorrencias': BUSCAR_TODAS_OCORRENCIAS,
+            'leitura_antecipada_threads': LEITURA_ANTECIPADA_THREADS,
+        },
+        'corpus': {
+            'arquivos': manifesto['arquivos'],
+            'bytes': manifesto['bytes'],
+            'por_tipo': manifesto['por_tipo'],
+            'agulhas': len(plantadas),
+        },
+        'etapas': etapas,
+        'metricas_modo_busca': None if metricas is None else {
+            'tempo_parede_s': round(metricas.tempo_parede, 6),
+            'tempo_cpu_s': round(metricas.tempo_cpu, 6),
+            'contadores': metricas.contadores(),
+            'etapas': {etapa: {'parede_s': round(parede, 6), 'cpu_s': round(cpu, 6), 'chamadas': chamadas}
+                       for etapa, (parede, cpu, chamadas) in sorted(metricas.etapas.items())},
+        },
+        'correcao': {
+            'ok': not erros,
+            'agulhas_tipo5': len({r.caminho_completo for r in resultados_por_etapa.get('TIPO 5', [])} & set(plantadas)),
+            'colagens': colagens,
+            'erros': erros,
+        },
+    }
+    
+    imprimir_relatorio_benchmark(relatorio)
+    if configuracao.comparar:
+        comparar_benchmark(relatorio, configuracao.comparar)
+    
+    try:
+        with open(configuracao.saida, 'w', encoding='utf-8') as f:
+            json.dump(relatorio, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 Relatório salvo em {configuracao.saida}")
+    except OSError as e:
+        print(f"❌ ERRO ao salvar o relatório: {e}")
+    return relatorio
+
+def imprimir_relatorio_benchmark(relatorio: Dict[str, Any]):
+    print(f"\n📊 RESULTADO DO BENCHMARK:")
+    print(f"   {'Etapa':<24} {'Mínimo (s)':>11} {'Mediana (s)':>12} {'MB/s':>9}")
+    for etapa, dados in relatorio['etapas'].items():
+        mb_por_s = f"{dados['mb_por_s']:.1f}" if dados['mb_por_s'] is not None else "-"
+        print(f"   {etapa:<24} {dados['minimo_s']:>11.3f} {dados['mediana_s']:>12.3f} {mb_por_s:>9}")
+    
+    correcao = relatorio['correcao']
+    if correcao['ok']:
+        print(f"✅ Correção: todas as {relatorio['corpus']['agulhas']} agulha(s) nas posições plantadas "
+              f"(TIPO 5 achou {correcao['agulhas_tipo5']}), PASTE verificado")
+    else:
+        print(f"❌ Correção: {len(correcao['erros'])} erro(s)")
+        for erro in correcao['erros'][:20]:
+            print(f"   - {erro['etapa']}: {erro.get('arquivo', '')} {erro['erro']}")
+
+def comparar_benchmark(relatorio: Dict[str, Any], caminho_anterior: str) -> List[str]:
+    """🆕 Compara o tempo mínimo de cada etapa com um JSON anterior; devolve as regressões (v2.2.0)"""
+    try:
+        with open(caminho_anterior, 'r', encoding='utf-8') as f:
+            anterior = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Não foi possível ler {caminho_anterior} para comparar: {e}")
+        return []
+    
+    print(f"\n🔍 COMPARAÇÃO COM {caminho_anterior} ({anterior.get('timestamp', '?')}):")
+    campos_corpus = ('numero_arquivos', 'tamanho_medio', 'distribuicao', 'mistura', 'proporcao_agulha', 'semente')
+    if any(anterior.get('configuracao', {}).get(campo) != relatorio['configuracao'][campo] for campo in campos_corpus):
+        print("   ⚠️ Corpus gerado com outra configuração: a comparação não é direta")
+    if anterior.get('opcoes_busca') != relatorio['opcoes_busca']:
+        print("   ⚠️ Opções de busca diferentes (workers, --exaustiva, ...): a comparação não é direta")
+    
+    regressoes = []
+    for etapa, dados in relatorio['etapas'].items():
+        dados_anteriores = anterior.get('etapas', {}).get(etapa)
+        if not dados_anteriores or not dados_anteriores.get('minimo_s'):
+            continue
+        razao = dados['minimo_s'] / dados_anteriores['minimo_s']
+        marcador = "🐢 REGRESSÃO" if razao > LIMITE_REGRESSAO_BENCHMARK else "✅"
+        if razao > LIMITE_REGRESSAO_BENCHMARK:
+            regressoes.append(etapa)
+        print(f"   {etapa:<24} {dados_anteriores['minimo_s']:>9.3f}s → {dados['minimo_s']:>9.3f}s ({razao:.2f}x) {marcador}")
+    return regressoes
+
+def extrair_opcoes_benchmark(argumentos: List[str]) -> Optional[ConfiguracaoBenchmark]:
+    """🆕 Lê as opções de "benchmark" ("--opcao valor" ou "--opcao=valor") (v2.2.0)"""
+    configuracao = ConfiguracaoBenchmark()
+    conversores = {
+        '--arquivos': ('numero_arquivos', int),
+        '--tamanho-medio': ('tamanho_medio', int),
+        '--distribuicao': ('distribuicao', str),
+        '--agulhas': ('proporcao_agulha', float),
+        '--semente': ('semente', int),
+        '--repeticoes': ('repeticoes', int),
+        '--pasta': ('pasta', os.path.abspath),
+        '--saida': ('saida', str),
+        '--comparar': ('comparar', str),
+    }
+    
+    i = 0
+    while i < len(argumentos):
+        opcao, separador, valor = argumentos[i].partition('=')
+        if not separador:
+            i += 1
+            valor = argumentos[i] if i < len(argumentos) else ''
+        i += 1
+        
+        try:
+            if opcao == '--mistura':
+                # Ex.: --mistura lf=40,crlf=30,cr=5,bom=15,latin1=10 (tipos omitidos = 0)
+                mistura = {}
+                for parte in valor.split(','):
+                    tipo, _, peso = parte.partition('=')
+                    if tipo.strip() not in TIPOS_ARQUIVO_BENCHMARK:
+                        raise ValueError(f"tipo de arquivo desconhecido {tipo!r}")
+                    mistura[tipo.strip()] = int(peso)
+                if not any(peso > 0 for peso in mistura.values()):
+                    raise ValueError("nenhum tipo de arquivo com peso > 0")
+                configuracao.mistura = mistura
+            elif opcao in conversores:
+                atributo, conversor = conversores[opcao]
+                setattr(configuracao, atributo, conversor(valor))
+            else:
+                print(f"❌ Opção desconhecida para benchmark: {opcao}")
+                return None
+        except ValueError as e:
+            print(f"❌ Valor inválido para {opcao}: {valor!r} ({e})")
+            return None
+    
+    if configuracao.distribuicao not in ('lognormal', 'uniforme'):
+        print(f"❌ Distribuição desconhecida: {configuracao.distribuicao!r} (use lognormal ou uniforme)")
+        return None
+    configuracao.numero_arquivos = max(1, configuracao.numero_arquivos)
+    configuracao.tamanho_medio = max(64, configuracao.tamanho_medio)
+    configuracao.repeticoes = max(1, configuracao.repeticoes)
+    return configuracao
+
+def extrair_opcoes_linha_comando(argumentos: List[str]) -> List[str]:
+    """🆕 Aplica as opções "--xxx" às configurações globais e devolve os argumentos restantes (v2.2.0)"""
+    global NUMERO_WORKERS, BUSCAR_TODAS_OCORRENCIAS, BUSCA_EXAUSTIVA, NIVEL_LOG, COLETAR_METRICAS
+    
+    restantes = []
+    i = 0
+    while i < len(argumentos):
+        argumento = argumentos[i]
+        
+        if argumento == '--workers' or argumento.startswith('--workers='):
+            if '=' in argumento:
+                valor = argumento.split('=', 1)[1]
             else:
-                print("❌ ERRO: Não foi possível obter informações do arquivo. PASTE cancelado!")
+                i += 1
+                valor = argumentos[i] if i < len(argumentos) else ''
+            try:
+                NUMERO_WORKERS = max(1, int(valor))
+            except ValueError:
+                print(f"⚠️ Valor inválido para --workers: {valor!r} (usando {NUMERO_WORKERS})")
+        elif argumento == '--todas':
+            BUSCAR_TODAS_OCORRENCIAS = True
+        elif argumento in ('--exaustiva', '--exhaustive'):
+            BUSCA_EXAUSTIVA = True
+        elif argumento in ('--metricas', '--metrics'):
+            COLETAR_METRICAS = True
+        elif argumento in ('-q', '--quiet', '--silencioso'):
+            NIVEL_LOG = NIVEL_LOG_SILENCIOSO
+        elif argumento in ('-v', '--verbose'):
+            NIVEL_LOG = max(NIVEL_LOG, NIVEL_LOG_DETALHADO)
+        elif argumento in ('-vv', '--debug'):
+            NIVEL_LOG = NIVEL_LOG_DEBUG
+        else:
+            restantes.append(argumento)
+        
+        i += 1
+    
+    return restantes
+
+def main():
+    """Função principal v2.1.6"""
+    argumentos = extrair_opcoes_linha_comando(sys.argv[1:])
+    configurar_saida_bufferizada()
+    try:
+        executar_comando(argumentos)
+    finally:
+        sys.stdout.flush()
+
+def executar_comando(argumentos: List[str]):
+    """🆕 Despacha o comando da linha de comando (v2.2.0)"""
+    log_detalhe("╔══════════════════════════════════════════════════════════════════════════════╗")
+    log_detalhe("║                  PYTHON CTRL+C SEARCH & PASTE TOOL v2.1.6                  ║")
+    log_detalhe("║                🚨 CORREÇÃO COMPLETA: Quebras de linha diferentes            ║")
+    log_detalhe("║                🔧 CORREÇÃO: Mapeamento preciso de coordenadas               ║")
+    log_detalhe("║                🆕 CORREÇÃO: Ajuste automático no PASTE                      ║")
+    log_detalhe("╚══════════════════════════════════════════════════════════════════════════════╝")
+    
+    if argumentos:
+        comando = argumentos[0].lower()
+        
+        if comando == 'paste' and len(argumentos) > 1 and argumentos[1].lower() in OPCOES_PASTE_LOTE:
+            opcoes = extrair_opcoes_paste_lote(argumentos[2:])
+            if opcoes is not None:
+                colar_em_todos_resultados(*opcoes)
+        
+        elif comando == 'paste':
+            arquivo_especifico = argumentos[1] if len(argumentos) > 1 else None
+            colar_nas_coordenadas(arquivo_especifico)  # 🆕 Backup dentro da transação (v2.2.0)
         
         elif comando == 'diagnostico':
             diagnosticar_caso_especifico()
@@ -1970,14 +5393,36 @@ def main():
         elif comando == 'teste':
             testar_correcoes()
         
+        elif comando == 'index':
+            comando_indice(argumentos[1:])
+        
+        elif comando == 'benchmark':
+            configuracao = extrair_opcoes_benchmark(argumentos[1:])
+            if configuracao is not None:
+                executar_benchmark(configuracao)
+        
+        elif comando == 'export':
+            exportar_sessao_xml(argumentos[1] if len(argumentos) > 1 else None)
+        
         else:
             print(f"❌ Comando desconhecido: {comando}")
             print("📋 Comandos disponíveis:")
             print("   python pythonsearch.py                    # Busca")
             print("   python pythonsearch.py paste              # Paste no melhor resultado")
             print("   python pythonsearch.py paste arquivo.ext  # Paste em arquivo específico")
+            print("   python pythonsearch.py paste --all        # Paste em todos os resultados (--score-minimo N, --tipo 1,3)")
+            print("   python pythonsearch.py export [saida.xml] # Exporta a última sessão para XML")
             print("   python pythonsearch.py diagnostico        # Diagnóstico completo")
             print("   python pythonsearch.py teste              # Testa correções")
+            print("   python pythonsearch.py --workers 4        # Busca usando 4 processos")
+            print("   python pythonsearch.py --todas            # Todas as ocorrências de cada arquivo")
+            print("   python pythonsearch.py --exaustiva        # Roda todos os TIPOS (sem parada antecipada)")
+            print("   python pythonsearch.py -q | -v | -vv      # Só ranking / detalhes / diagnóstico por arquivo")
+            print("   python pythonsearch.py --metricas         # Tempo por TIPO e contadores de leitura")
+            print("   python pythonsearch.py index build        # Cria índice de trigramas")
+            print("   python pythonsearch.py index watch        # Mantém o índice atualizado")
+            print("   python pythonsearch.py index stats|drop   # Estatísticas / remove o índice")
+            print("   python pythonsearch.py benchmark          # Corpus sintético + tempos + correção (JSON)")
     else:
         modo_busca()
 
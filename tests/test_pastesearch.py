@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""Testes de regressão do pastesearch (python -m pytest ou python -m unittest)"""
+
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import pastesearch as ps
+
+
+class PastaTemporariaMixin:
+    """Cria uma PASTA_BASE temporária, sem cache de conteúdo nem índice de trigramas"""
+
+    def setUp(self):
+        self.pasta = tempfile.TemporaryDirectory()
+        self.base = self.pasta.name
+        self.configuracao_original = (ps.PASTA_BASE, ps.USAR_CACHE_CONTEUDO, ps.USAR_INDICE_TRIGRAMAS)
+        ps.PASTA_BASE = self.base
+        ps.USAR_CACHE_CONTEUDO = False
+        ps.USAR_INDICE_TRIGRAMAS = False
+
+    def tearDown(self):
+        ps.PASTA_BASE, ps.USAR_CACHE_CONTEUDO, ps.USAR_INDICE_TRIGRAMAS = self.configuracao_original
+        self.pasta.cleanup()
+
+    def gravar(self, relativo: str, dados: bytes) -> str:
+        caminho = os.path.join(self.base, *relativo.split('/'))
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        with open(caminho, 'wb') as f:
+            f.write(dados)
+        return caminho
+
+    def buscar(self, texto: str, tipos=ps.TIPOS_ORDEM_EXECUCAO):
+        ps.resultados_globais.clear()
+        with contextlib.redirect_stdout(io.StringIO()):
+            ps.executar_varredura_unica(ps.preparar_consulta(texto), tipos=tipos)
+        return [(r.tipo, os.path.relpath(r.caminho_completo, self.base).replace(os.sep, '/'))
+                for r in ps.resultados_globais]
+
+
+class TestDeteccaoEncoding(PastaTemporariaMixin, unittest.TestCase):
+
+    def test_arquivo_pequeno_latin1_com_byte_invalido_no_fim(self):
+        caminho = self.gravar('pequeno.py', b'return \xe7')
+        self.assertEqual(ps.detectar_bom_e_encoding_em_bytes(b'return \xe7')['encoding'], 'latin-1')
+        self.assertEqual(ps.detectar_bom_e_encoding(caminho)['encoding'], 'latin-1')
+        self.assertEqual(ps.ler_arquivo(caminho), 'return ç')
+        for tipo in (1, 2, 3, 4, 6):
+            self.assertEqual(self.buscar('return ç', tipos=(tipo,)), [(tipo, 'pequeno.py')])
+
+    def test_caractere_cortado_no_fim_da_amostra_continua_utf8(self):
+        dados = b'a' * (ps.TAMANHO_AMOSTRA_ENCODING - 1) + 'ç'.encode('utf-8') + b'fim'
+        caminho = self.gravar('grande.py', dados)
+        self.assertEqual(ps.detectar_bom_e_encoding(caminho)['encoding'], 'utf-8')
+        self.assertEqual(ps.detectar_encoding_arquivo_completo(dados)['encoding'], 'utf-8')
+
+    def test_arquivo_do_tamanho_exato_da_amostra(self):
+        dados = b'a' * (ps.TAMANHO_AMOSTRA_ENCODING - 1) + b'\xe7'
+        caminho = self.gravar('exato.py', dados)
+        self.assertEqual(ps.detectar_bom_e_encoding(caminho)['encoding'], 'latin-1')
+
+    def test_arquivo_completo_valida_arquivos_pequenos(self):
+        self.assertEqual(ps.detectar_encoding_arquivo_completo(b'return \xe7')['encoding'], 'latin-1')
+        self.assertEqual(ps.detectar_encoding_arquivo_completo('return ç'.encode('utf-8'))['encoding'], 'utf-8')
+
+    def test_busca_em_bytes_arquivo_pequeno_latin1(self):
+        self.gravar('a.py', b'x = 1\nreturn \xe7')
+        consulta = ps.preparar_consulta('return ç')
+        with open(os.path.join(self.base, 'a.py'), 'rb') as f:
+            dados = f.read()
+        acertos = ps.buscar_tipos_em_bytes(consulta, [1], 'a.py', os.path.join(self.base, 'a.py'), dados, len(dados))
+        self.assertEqual([(tipo, info['inicio'], info['fim']) for tipo, info in acertos], [(1, 6, 14)])
+
+
+class TestArquivosIgnore(PastaTemporariaMixin, unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.usar_ignore_original = ps.USAR_ARQUIVOS_IGNORE
+        ps.USAR_ARQUIVOS_IGNORE = True
+        for relativo in ('gerado/m.py', 'src/gerado/m.py', 'out/m.py', 'src/out/m.py', 'src/lib/m.py', 'lib/m.py'):
+            self.gravar(relativo, b'x = 1\n')
+
+    def tearDown(self):
+        ps.USAR_ARQUIVOS_IGNORE = self.usar_ignore_original
+        super().tearDown()
+
+    def arquivos_percorridos(self):
+        return sorted(os.path.relpath(caminho, self.base).replace(os.sep, '/')
+                      for _, caminho in ps.iterar_arquivos_pasta_base())
+
+    def test_pastas_ancoradas_e_nao_ancoradas(self):
+        # "/gerado/" só na raiz, "out/" em qualquer nível, "src/lib/" ancorado pela "/" do meio
+        self.gravar('.gitignore', b'/gerado/\nout/\nsrc/lib/\n')
+        self.assertEqual(self.arquivos_percorridos(), ['.gitignore', 'lib/m.py', 'src/gerado/m.py'])
+
+    def test_pasta_ancorada_em_subpasta(self):
+        self.gravar('src/.pastesearchignore', b'/gerado/\n')
+        self.assertEqual(self.arquivos_percorridos(), ['gerado/m.py', 'lib/m.py', 'out/m.py', 'src/.pastesearchignore',
+                                                       'src/lib/m.py', 'src/out/m.py'])
+
+
+class TestPlanejador(PastaTemporariaMixin, unittest.TestCase):
+
+    def planejar(self, texto: str, exaustiva: bool = False):
+        ps.resultados_globais.clear()
+        with contextlib.redirect_stdout(io.StringIO()):
+            ps.executar_busca_planejada(ps.preparar_consulta(texto), exaustiva=exaustiva)
+        return [(r.tipo, os.path.relpath(r.caminho_completo, self.base).replace(os.sep, '/'))
+                for r in ps.resultados_globais]
+
+    def test_variantes_de_quebra_de_linha_nao_sao_puladas(self):
+        bloco = 'def soma(a, b):\n    return a + b\n'
+        self.gravar('a.py', bloco.encode('utf-8'))
+        self.gravar('b.py', b'\xef\xbb\xbf' + bloco.replace('\n', '\r\n').encode('utf-8'))
+        encontrados = self.planejar(bloco)
+        self.assertIn((1, 'a.py'), encontrados)
+        self.assertIn((3, 'b.py'), encontrados)
+        # TIPO 6 e TIPO 5 continuam pulados pela parada antecipada
+        self.assertFalse([tipo for tipo, _ in encontrados if tipo in (5, 6)])
+        exaustivos = self.planejar(bloco, exaustiva=True)
+        self.assertEqual([r for r in exaustivos if r[0] in (1, 2, 3, 4)], encontrados)
+
+
+class TestIndiceTrigramas(PastaTemporariaMixin, unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.trabalho = tempfile.TemporaryDirectory()
+        self.cwd_original = os.getcwd()
+        os.chdir(self.trabalho.name)  # O índice fica no diretório atual
+        ps.USAR_INDICE_TRIGRAMAS = True
+
+    def tearDown(self):
+        os.chdir(self.cwd_original)
+        self.trabalho.cleanup()
+        super().tearDown()
+
+    def test_arquivo_alterado_no_lugar_continua_sendo_buscado(self):
+        self.gravar('a.py', b'alpha_unique = 1\n')
+        caminho_b = self.gravar('b.py', b'beta_unique = 2\n')
+        with contextlib.redirect_stdout(io.StringIO()):
+            ps.comando_indice(['build'])
+        self.assertEqual(self.buscar('alpha_unique = 1', tipos=(1,)), [(1, 'a.py')])
+
+        with open(caminho_b, 'ab') as f:
+            f.write(b'gamma_unique = 3\n')
+        self.assertEqual(self.buscar('gamma_unique = 3', tipos=(1,)), [(1, 'b.py')])
+
+        self.gravar('c.py', b'delta_unique = 4\n')
+        self.assertEqual(self.buscar('delta_unique = 4', tipos=(1,)), [(1, 'c.py')])
+
+
+class TestSimilaridade(unittest.TestCase):
+
+    def test_perfil_da_consulta_nao_muda_o_resultado(self):
+        consulta = '  def soma(a, b):\n\n      return a + b\n'
+        perfil = ps.perfil_similaridade(consulta)
+        for trecho in ('def soma(a, b):\n    return a + b', 'def soma(x):\n    return x', '', consulta, 'RETURN A + B'):
+            self.assertEqual(ps.calcular_similaridade_melhorada(consulta, trecho, perfil),
+                             ps.calcular_similaridade_melhorada(consulta, trecho))
+
+
+if __name__ == '__main__':
+    unittest.main()